@@ -1,39 +1,59 @@
 """
 数据导入相关API端点
 """
-from typing import Any, List
+import json
+import asyncio
+import zipfile
+import tempfile
+from typing import Any, Dict, List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, status
+from fastapi.responses import StreamingResponse
 from supabase import Client
 from loguru import logger
 
 from app.core.database import get_db
 from app.core.auth import get_current_active_user, User
 from app.core.config import settings
+from app.core.job_queue import import_queue
+from app.core.progress_store import progress_store, FINAL_STATUSES
 from app.models.import_record import (
     ImportRecord,
-    ImportProgress
+    ImportProgress,
+    ImportPreview
 )
 from app.services.import_service import ImportService
-from app.utils.file_utils import validate_file_extension, save_upload_file
+from app.utils.excel_parser import ExcelParser
+from app.utils.file_utils import (
+    validate_file_extension,
+    save_upload_file,
+    delete_file,
+    UploadTooLargeError
+)
+from app.utils.readers import available_backends, get_reader
 
 router = APIRouter()
 
 
 @router.post("/excel", response_model=ImportRecord, status_code=status.HTTP_202_ACCEPTED)
 async def import_excel_file(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    backend: Optional[str] = Query(None, description="指定读取后端（默认按扩展名自动选择）"),
+    allow_duplicate: bool = Query(False, description="允许重复导入内容相同的文件"),
+    compress: bool = Query(False, description="按设备容差有损压缩波形数据"),
     db: Client = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
     导入Excel文件
     
-    支持的格式：.xlsx, .xls
+    支持的格式：.xlsx, .xls, .csv
     文件大小限制：100MB
     
-    导入过程将在后台异步执行，返回导入记录ID用于查询进度
+    导入任务进入持久化任务队列（小文件优先），返回导入记录ID用于查询进度；
+    内容相同的文件已导入时返回409，除非指定 allow_duplicate；
+    预检发现格式错误（无表头、无数据、无可识别的测量列）时返回422；
+    指定 compress 时按设备型号的通道容差只保留重建波形所需的采样点
     """
     # 验证文件类型
     if not validate_file_extension(file.filename, settings.allowed_extensions):
@@ -42,40 +62,192 @@ async def import_excel_file(
             detail=f"Unsupported file type. Allowed types: {', '.join(settings.allowed_extensions)}"
         )
     
-    # 验证文件大小
-    file_size = 0
-    content = await file.read()
-    file_size = len(content)
-    await file.seek(0)  # 重置文件指针
+    # 验证读取后端
+    try:
+        get_reader(file.filename, backend)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    if file_size > settings.max_upload_size:
+    # 保存文件（分块写入，边写边校验大小并计算内容哈希）
+    try:
+        saved = await save_upload_file(file, current_user.id, max_size=settings.max_upload_size)
+    except UploadTooLargeError as e:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File too large. Maximum size: {settings.max_upload_size / 1024 / 1024:.0f}MB"
+            detail=str(e)
         )
     
-    # 保存文件
-    file_path = await save_upload_file(file, current_user.id)
+    # 检查重复上传（解析之前）
+    service = ImportService(db)
+    duplicate = await service.find_duplicate(saved.content_hash)
+    if duplicate and not allow_duplicate:
+        delete_file(saved.path)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Duplicate file: already imported as {duplicate.id} ({duplicate.import_status})"
+        )
+    
+    # 预检表头和前几行，格式错误的文件在排队前拒绝
+    preview = await ExcelParser().preview_file(saved.path, backend=backend, file_name=file.filename)
+    if not preview["acceptable"]:
+        delete_file(saved.path)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid file: {'; '.join(preview['errors'])}"
+        )
     
     # 创建导入记录
-    service = ImportService(db)
+    import_config = {}
+    if backend:
+        import_config["reader_backend"] = backend
+    if compress:
+        import_config["compress"] = True
+    # 预检读取的表头，流式解析时不再重新打开文件读取
+    import_config["header"] = preview["header"]
     import_record = await service.create_import_record(
         file_name=file.filename,
-        file_size=file_size,
-        file_path=file_path,
-        user_id=current_user.id
+        file_size=saved.size,
+        file_path=saved.path,
+        user_id=current_user.id,
+        import_config=import_config,
+        content_hash=saved.content_hash
     )
     
-    # 添加后台任务处理导入
-    background_tasks.add_task(
-        service.process_import,
-        import_record.id,
-        file_path
+    # 加入导入任务队列
+    await service.enqueue_import(import_record.id, saved.path, saved.size, backend)
+    
+    return import_record
+
+
+@router.post("/archive", response_model=ImportRecord, status_code=status.HTTP_202_ACCEPTED)
+async def import_archive_file(
+    file: UploadFile = File(...),
+    backend: Optional[str] = Query(None, description="指定读取后端（默认按扩展名自动选择）"),
+    allow_duplicate: bool = Query(False, description="允许重复导入内容相同的文件"),
+    compress: bool = Query(False, description="按设备容差有损压缩波形数据"),
+    db: Client = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    导入压缩包（.zip）
+    
+    压缩包中的每个数据文件逐个解压，作为子导入任务加入任务队列并行解析入库；
+    返回父导入记录，进度按已完成的子任务数计算，子任务详情见 /{import_id}/children
+    """
+    # 验证文件类型
+    if not validate_file_extension(file.filename, [".zip"]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file type. Allowed types: .zip"
+        )
+    
+    # 验证读取后端
+    if backend and backend not in available_backends():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown or unavailable reader backend: {backend}"
+        )
+    
+    # 保存压缩包（分块写入，边写边校验大小并计算内容哈希）
+    try:
+        saved = await save_upload_file(file, current_user.id, max_size=settings.max_archive_size)
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    
+    # 检查压缩包格式
+    if not zipfile.is_zipfile(saved.path):
+        delete_file(saved.path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid zip archive"
+        )
+    
+    # 创建父导入记录并加入任务队列
+    service = ImportService(db)
+    import_record = await service.create_import_record(
+        file_name=file.filename,
+        file_size=saved.size,
+        file_path=saved.path,
+        user_id=current_user.id,
+        import_config={
+            "archive": True,
+            "reader_backend": backend,
+            "allow_duplicate": allow_duplicate,
+            "compress": compress
+        },
+        content_hash=saved.content_hash
     )
+    await service.enqueue_archive(import_record.id, saved.path, backend, allow_duplicate)
     
     return import_record
 
 
+@router.post("/preview", response_model=ImportPreview)
+async def preview_import_file(
+    file: UploadFile = File(...),
+    rows: int = Query(settings.preview_rows, ge=1, le=10000, description="读取的数据行数"),
+    backend: Optional[str] = Query(None, description="指定读取后端（默认按扩展名自动选择）"),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    导入预检
+    
+    只读取表头和前若干行：解析文件名参数、识别列角色、校验样本数据并预测采样点数，
+    不创建导入记录，文件不保留
+    """
+    # 验证文件类型
+    if not validate_file_extension(file.filename, settings.allowed_extensions):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported file type. Allowed types: {', '.join(settings.allowed_extensions)}"
+        )
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            saved = await save_upload_file(
+                file, "preview", upload_dir=tmp_dir, max_size=settings.max_upload_size
+            )
+        except UploadTooLargeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
+        
+        return await ExcelParser().preview_file(
+            saved.path, nrows=rows, backend=backend, file_name=file.filename
+        )
+
+
+@router.get("/backends", response_model=Dict[str, List[str]])
+async def get_reader_backends(
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    获取可用的文件读取后端
+    
+    返回后端名称及其支持的扩展名，可通过导入接口的 backend 参数指定
+    """
+    return available_backends()
+
+
+@router.get("/queue/metrics", response_model=Dict[str, Any])
+async def get_queue_metrics(
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    获取导入任务队列指标
+    
+    包括各优先级通道的队列深度、最长等待时间和最近一小时的平均等待时间
+    """
+    return await import_queue.metrics()
+
+
 @router.get("/", response_model=List[ImportRecord])
 async def get_import_records(
     skip: int = 0,
@@ -144,10 +316,90 @@ async def get_import_progress(
     return progress
 
 
+@router.get("/{import_id}/events")
+async def stream_import_events(
+    import_id: UUID,
+    request: Request,
+    db: Client = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    导入进度事件流（Server-Sent Events）
+    
+    连接建立时鉴权一次，先发送当前进度，之后推送进度更新直到导入结束
+    """
+    # 先订阅再读取当前进度，避免两者之间的更新丢失
+    queue = progress_store.subscribe(import_id)
+    service = ImportService(db)
+    progress = await service.get_import_progress(import_id)
+    
+    if not progress:
+        progress_store.unsubscribe(import_id, queue)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import record not found"
+        )
+    
+    def format_event(data: Dict[str, Any]) -> str:
+        return f"event: progress\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+    
+    async def event_stream():
+        try:
+            yield format_event(progress.model_dump())
+            if progress.status in FINAL_STATUSES:
+                return
+            
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=settings.progress_keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                
+                yield format_event(data)
+                if data.get("status") in FINAL_STATUSES:
+                    return
+        finally:
+            progress_store.unsubscribe(import_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/{import_id}/children", response_model=List[ImportRecord])
+async def get_child_imports(
+    import_id: UUID,
+    db: Client = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    获取压缩包导入的子导入记录（每个文件的导入状态）
+    """
+    service = ImportService(db)
+    record = await service.get_import_record_by_id(import_id)
+    
+    if not record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import record not found"
+        )
+    
+    # 检查权限
+    if not current_user.is_superuser and record.created_by != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    return await service.get_child_imports(import_id)
+
+
 @router.post("/{import_id}/retry", response_model=ImportRecord)
 async def retry_import(
     import_id: UUID,
-    background_tasks: BackgroundTasks,
     db: Client = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -180,12 +432,22 @@ async def retry_import(
     # 重置状态
     updated_record = await service.reset_import_status(import_id)
     
-    # 添加后台任务重新处理
-    background_tasks.add_task(
-        service.process_import,
-        import_id,
-        record.file_path
-    )
+    # 重新加入导入任务队列（压缩包导入只重试未成功的子任务）
+    import_config = record.import_config or {}
+    if import_config.get("archive"):
+        await service.enqueue_archive(
+            import_id,
+            record.file_path,
+            import_config.get("reader_backend"),
+            import_config.get("allow_duplicate", False)
+        )
+    else:
+        await service.enqueue_import(
+            import_id,
+            record.file_path,
+            record.file_size or 0,
+            import_config.get("reader_backend")
+        )
     
     return updated_record
 
@@ -146,6 +146,34 @@ async def get_test_details(
     return details
 
 
+@router.get("/{record_id}/waveform")
+async def get_test_waveform(
+    record_id: UUID,
+    start_time: Optional[float] = Query(None, description="起始时间点(秒)"),
+    end_time: Optional[float] = Query(None, description="结束时间点(秒)"),
+    db: Client = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    按时间窗口获取列式波形数据
+
+    返回按字段组织的数组，适合绘制曲线
+    """
+    if start_time is not None and end_time is not None and start_time > end_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_time must not be greater than end_time"
+        )
+
+    service = TestRecordService(db)
+    details = await service.get_detail_window(record_id, start_time, end_time)
+    return {
+        "record_id": str(record_id),
+        "rows": len(details),
+        "columns": details.to_lists()
+    }
+
+
 @router.post("/{record_id}/details", response_model=List[TestDetail], status_code=status.HTTP_201_CREATED)
 async def create_test_details(
     record_id: UUID,
@@ -0,0 +1,258 @@
+"""
+命令行工具
+
+用法：
+    python -m app.cli ingest <目录> [--workers N] [--backend NAME] [--pattern GLOB] [--dry-run]
+    python -m app.cli watch <文件> [--record-id ID] [--interval 秒] [--idle-timeout 秒]
+    python -m app.cli rebuild-rollups
+    python -m app.cli pin-instrument [<仪器型号> [角色=列名 ...]] [--unpin]
+"""
+import sys
+import time
+import asyncio
+import argparse
+from typing import List, Optional
+from uuid import UUID
+from pathlib import Path
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import db_client
+from app.core.process_pool import parse_pool
+from app.core.stats_cache import stats_cache
+from app.services.import_service import ImportService
+from app.services.rollup_service import RollupService
+from app.services.test_record_service import TestRecordService
+from app.services.tail_importer import TailImporter
+from app.utils.excel_parser import ExcelParser
+from app.utils.column_resolver import ROLE_RULES, get_profile_registry
+from app.utils.file_utils import validate_file_extension, hash_file
+
+
+def collect_files(root: str, pattern: str) -> List[Path]:
+    """递归查找目录下受支持的数据文件"""
+    return [
+        path for path in sorted(Path(root).rglob(pattern))
+        if path.is_file() and validate_file_extension(path.name, settings.allowed_extensions)
+    ]
+
+
+async def ingest(args: argparse.Namespace) -> int:
+    """批量导入目录中的历史数据文件"""
+    files = collect_files(args.directory, args.pattern)
+    if not files:
+        print(f"No data files found in {args.directory}")
+        return 0
+
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(args.workers)
+
+    # 并行计算内容哈希，跳过已导入的文件
+    async def hash_one(path: Path) -> str:
+        async with semaphore:
+            return await asyncio.to_thread(hash_file, str(path))
+
+    hashes = await asyncio.gather(*(hash_one(path) for path in files))
+    service = ImportService(db_client.service_client)
+    imported = set() if args.force else await service.find_imported_hashes(hashes)
+
+    pending = []
+    seen = set(imported)
+    for path, content_hash in zip(files, hashes):
+        if content_hash not in seen:
+            seen.add(content_hash)
+            pending.append((path, content_hash))
+
+    print(
+        f"Found {len(files)} files: {len(files) - len(pending)} already imported "
+        f"or duplicated, {len(pending)} to ingest"
+    )
+
+    if args.dry_run:
+        parser = ExcelParser()
+        for path, _ in pending:
+            info = parser._parse_filename(str(path))
+            print(f"  {path}: " + ", ".join(f"{key}={value}" for key, value in info.items()))
+        return 0
+
+    totals = {"done": 0, "failed": 0, "rows": 0}
+
+    async def ingest_one(path: Path, content_hash: str):
+        async with semaphore:
+            record = await service.create_import_record(
+                file_name=path.name,
+                file_size=path.stat().st_size,
+                file_path=str(path),
+                user_id=args.user,
+                import_config={
+                    "source": "cli",
+                    "reader_backend": args.backend,
+                    "compress": args.compress
+                },
+                content_hash=content_hash
+            )
+            await service.process_import(record.id, str(path), args.backend)
+            result = await service.get_import_record_by_id(record.id)
+
+        status = result.import_status if result else "failed"
+        rows = (result.import_stats or {}).get("inserted_rows", 0) if result else 0
+        totals["done"] += 1
+        totals["rows"] += rows
+        if status != "completed":
+            totals["failed"] += 1
+        print(f"[{totals['done']}/{len(pending)}] {path.name}: {status}, {rows} rows")
+
+    await asyncio.gather(*(ingest_one(path, content_hash) for path, content_hash in pending))
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(
+        f"Ingested {totals['done']} files ({totals['failed']} not completed), "
+        f"{totals['rows']} rows in {elapsed:.1f}s: "
+        f"{totals['done'] / elapsed:.2f} files/s, {totals['rows'] / elapsed:.0f} rows/s"
+    )
+    return 1 if totals["failed"] else 0
+
+
+async def watch(args: argparse.Namespace) -> int:
+    """跟踪仍在写入的文件，增量导入新追加的数据行"""
+    importer = TailImporter(
+        TestRecordService(db_client.service_client),
+        args.file,
+        record_id=UUID(args.record_id) if args.record_id else None,
+        backend=args.backend
+    )
+    record_id = await importer.open()
+    print(f"Following {args.file} into test record {record_id} (Ctrl+C to stop)")
+
+    started = time.perf_counter()
+    try:
+        await importer.follow(poll_interval=args.interval, idle_timeout=args.idle_timeout)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(
+        f"Imported {importer.inserted_rows} rows in {elapsed:.1f}s, "
+        f"{importer.report.rejected_rows} rejected, sample_count {importer.stream.row_count}"
+    )
+    return 0
+
+
+async def rebuild_rollups(args: argparse.Namespace) -> int:
+    """按全部测试记录重建每日统计汇总"""
+    started = time.perf_counter()
+    rows = await RollupService(db_client.service_client).rebuild()
+    await stats_cache.invalidate()
+    print(f"Rebuilt {rows} rollup rows in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+async def pin_instrument(args: argparse.Namespace) -> int:
+    """为仪器型号固定列映射（不带参数时列出已固定的映射）"""
+    registry = get_profile_registry()
+
+    if args.instrument is None:
+        pinned = registry.list_pinned()
+        if not pinned:
+            print("No pinned instruments")
+        for instrument, roles in sorted(pinned.items()):
+            print(f"{instrument}: " + ", ".join(f"{role}={column}" for role, column in roles.items()))
+        return 0
+
+    if args.unpin:
+        if not registry.unpin_instrument(args.instrument):
+            print(f"Instrument {args.instrument} is not pinned")
+            return 1
+        print(f"Unpinned {args.instrument}")
+        return 0
+
+    if not args.roles:
+        roles = registry.get_pinned(args.instrument)
+        if roles is None:
+            print(f"Instrument {args.instrument} is not pinned")
+            return 1
+        print(f"{args.instrument}: " + ", ".join(f"{role}={column}" for role, column in roles.items()))
+        return 0
+
+    roles = {}
+    for item in args.roles:
+        role, sep, column = item.partition("=")
+        if not sep or not role.strip() or not column.strip():
+            print(f"Invalid mapping '{item}', expected role=column")
+            return 1
+        roles[role.strip()] = column.strip()
+
+    try:
+        registry.pin_instrument(args.instrument, roles)
+    except ValueError as e:
+        print(f"{str(e)}. Valid roles: {', '.join(ROLE_RULES)}")
+        return 1
+
+    print(f"Pinned {args.instrument}: " + ", ".join(f"{role}={column}" for role, column in roles.items()))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=settings.app_name)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="批量导入目录中的测试数据文件")
+    ingest_parser.add_argument("directory", help="数据文件目录（递归查找）")
+    ingest_parser.add_argument("--pattern", default="*", help="文件名匹配模式，如 'data_detail_*'")
+    ingest_parser.add_argument(
+        "--workers", type=int, default=settings.parse_pool_workers or 1, help="并行解析进程数"
+    )
+    ingest_parser.add_argument("--backend", default=None, help="指定读取后端")
+    ingest_parser.add_argument("--user", default=None, help="导入记录的创建用户ID")
+    ingest_parser.add_argument("--force", action="store_true", help="不跳过已导入的文件")
+    ingest_parser.add_argument("--compress", action="store_true", help="按设备容差有损压缩波形数据")
+    ingest_parser.add_argument("--dry-run", action="store_true", help="只列出待导入文件及文件名解析结果")
+    ingest_parser.add_argument("--verbose", action="store_true", help="输出详细日志")
+    ingest_parser.set_defaults(handler=ingest)
+
+    watch_parser = subparsers.add_parser("watch", help="跟踪仍在写入的数据文件并增量导入")
+    watch_parser.add_argument("file", help="数据文件路径")
+    watch_parser.add_argument("--record-id", default=None, help="接续写入已有测试记录（默认新建）")
+    watch_parser.add_argument("--interval", type=float, default=settings.tail_poll_interval, help="检查间隔（秒）")
+    watch_parser.add_argument("--idle-timeout", type=float, default=None, help="超过该秒数没有新数据时退出")
+    watch_parser.add_argument("--backend", default=None, help="指定读取后端")
+    watch_parser.add_argument("--verbose", action="store_true", help="输出详细日志")
+    watch_parser.set_defaults(handler=watch)
+
+    rollup_parser = subparsers.add_parser("rebuild-rollups", help="重建每日统计汇总表")
+    rollup_parser.add_argument("--verbose", action="store_true", help="输出详细日志")
+    rollup_parser.set_defaults(handler=rebuild_rollups)
+
+    pin_parser = subparsers.add_parser("pin-instrument", help="为仪器型号固定列映射")
+    pin_parser.add_argument("instrument", nargs="?", default=None, help="仪器型号（与文件名中的设备型号一致）")
+    pin_parser.add_argument(
+        "roles", nargs="*", help=f"列映射，如 voltage='电压(V)'；可用角色：{', '.join(ROLE_RULES)}"
+    )
+    pin_parser.add_argument("--unpin", action="store_true", help="取消该仪器型号的固定映射")
+    pin_parser.add_argument("--verbose", action="store_true", help="输出详细日志")
+    pin_parser.set_defaults(handler=pin_instrument)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO" if args.verbose else "WARNING")
+
+    # 解析进程数与并发数跟随 --workers
+    if getattr(args, "workers", None):
+        parse_pool.max_workers = args.workers
+        parse_pool.max_concurrency = args.workers
+
+    try:
+        return asyncio.run(args.handler(args))
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        parse_pool.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
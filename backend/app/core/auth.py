@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from app.core.config import settings
@@ -125,6 +125,22 @@ async def get_current_active_user(
     return current_user
 
 
+async def authenticate_websocket(websocket: WebSocket, db: Client) -> Optional[User]:
+    """WebSocket连接鉴权（浏览器无法设置请求头，令牌通过 token 查询参数传递），失败返回 None"""
+    token = websocket.query_params.get("token")
+    if not token:
+        scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            token = None
+    if not token:
+        return None
+    
+    try:
+        return await get_current_active_user(await get_current_user(token, db))
+    except HTTPException:
+        return None
+
+
 async def get_current_superuser(
     current_user: User = Depends(get_current_active_user)
 ) -> User:
@@ -1,7 +1,8 @@
 """
 应用配置管理
 """
-from typing import List, Optional
+import os
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 import json
@@ -31,13 +32,84 @@ class Settings(BaseSettings):
     
     # Redis配置
     redis_url: Optional[str] = Field(default=None)
+    progress_ttl: int = Field(default=3600)  # 导入进度保留时间（秒）
+    progress_min_interval: float = Field(default=0.25)  # 同一导入任务进度写入的最小间隔（秒）
+    progress_keepalive_interval: float = Field(default=15.0)  # 进度事件流无更新时发送保活注释的间隔（秒）
     
     # 文件上传配置
     max_upload_size: int = Field(default=104857600)  # 100MB
+    max_archive_size: int = Field(default=1073741824)  # 压缩包上限 1GB，包内单个文件仍受 max_upload_size 限制
     allowed_extensions: List[str] = Field(
         default_factory=lambda: [".xlsx", ".xls", ".csv"]
     )
     
+    # 数据解析配置
+    instrument_profile_path: str = Field(default="profiles/instrument_profiles.json")
+    parse_chunk_size: int = Field(default=5000)
+    preview_rows: int = Field(default=200)  # 导入预检读取的数据行数
+    streaming_parse_threshold: int = Field(default=5242880)  # 5MB以上使用流式解析（解析与写库重叠）
+    parse_pool_workers: int = Field(default_factory=lambda: os.cpu_count() or 2)  # 0 表示不使用进程池
+    parse_max_concurrency: int = Field(default_factory=lambda: os.cpu_count() or 2)
+    parse_timeout: int = Field(default=600)  # 秒
+    parse_cache_enabled: bool = Field(default=True)
+    parse_cache_dir: str = Field(default="cache/parsed")  # 按文件内容哈希缓存列式解析结果
+    parse_cache_max_bytes: int = Field(default=2147483648)  # 解析缓存总大小上限 2GB，超过时淘汰最久未使用的条目（0 表示不限）
+    tail_poll_interval: float = Field(default=2.0)  # 跟踪导入检查文件追加内容的间隔（秒）
+    
+    # 数据校验配置
+    validation_limits: Dict[str, List[float]] = Field(
+        default_factory=lambda: {
+            "voltage_value": [0, 1000],
+            "current_value": [0, 100],
+            "temperature": [-40, 150],
+            "humidity": [0, 100]
+        }
+    )
+    validation_rated_margin: float = Field(default=1.1)  # 超过设备额定值的该倍数视为超规格
+    rejected_sample_limit: int = Field(default=20)  # 剔除报告中保留的样本行数
+    
+    # 波形压缩配置（导入时指定 compress 才启用，设备规格 compression_tolerances 可按型号覆盖）
+    compression_tolerances: Dict[str, float] = Field(
+        default_factory=lambda: {
+            "voltage_value": 0.05,  # V
+            "current_value": 0.005,  # A
+            "temperature": 0.5,  # ℃
+            "humidity": 1.0  # %
+        }
+    )
+    
+    # 数据写入配置
+    record_insert_chunk_size: int = Field(default=500)
+    detail_insert_chunk_size: int = Field(default=1000)
+    insert_max_retries: int = Field(default=3)
+    insert_retry_backoff: float = Field(default=0.5)  # 秒，按指数递增
+    pipeline_queue_size: int = Field(default=4)  # 各阶段之间的分块队列长度
+    pipeline_writers: int = Field(default=4)  # 并发写入任务数
+    detail_storage_mode: str = Field(default="rows")  # rows: 逐行写入 test_details；segments: 压缩分段写入 test_waveform_segments
+    waveform_segment_rows: int = Field(default=8192)  # 每个压缩分段的最大行数
+    
+    # 导入任务队列配置
+    import_queue_path: str = Field(default="queue/import_jobs.db")
+    import_queue_workers: int = Field(default_factory=lambda: max(4, os.cpu_count() or 1))
+    import_queue_small_file_size: int = Field(default=5242880)  # 小于5MB进入优先通道
+    import_queue_max_wait: int = Field(default=600)  # 大文件等待超过该秒数后提升优先级
+    import_queue_poll_interval: float = Field(default=2.0)
+    import_queue_retention_days: int = Field(default=7)
+    import_queue_lease_seconds: float = Field(default=60.0)  # 运行中任务的租约时长，所属进程每 1/3 租约续租一次
+    import_queue_max_attempts: int = Field(default=3)  # 任务最多执行次数，租约过期达到该次数后标记为失败，不再重新排队
+    
+    # 统计配置
+    statistics_use_rollups: bool = Field(default=True)  # 统计摘要、趋势和设备统计读取每日汇总表
+    rollup_page_size: int = Field(default=1000)  # 汇总表分页读取行数（不超过 PostgREST max-rows）
+    statistics_page_size: int = Field(default=1000)  # 读取原始记录时的每页行数
+    statistics_prefetch_pages: int = Field(default=4)  # 预取的页数
+    statistics_fetch_partitions: int = Field(default=4)  # 按测试时间切分的并发读取分区数
+    statistics_max_rows: int = Field(default=1000000)  # 单次统计最多读取的记录数，超过时拒绝查询
+    statistics_cache_enabled: bool = Field(default=True)
+    statistics_cache_ttl: float = Field(default=300)  # 统计结果缓存有效期（秒），写入测试记录时提前失效
+    statistics_cache_stale_ttl: float = Field(default=60)  # 过期后仍返回旧结果并后台刷新的时间（秒）
+    statistics_cache_size: int = Field(default=256)  # 未配置 Redis 时进程内缓存的最大条目数
+    
     # API限流配置
     rate_limit_per_minute: int = Field(default=60)
     
@@ -44,10 +44,16 @@ class SupabaseClient:
             await self.create_test_records_table()
             # 创建测试详情表
             await self.create_test_details_table()
+            # 创建波形压缩分段表
+            await self.create_waveform_segments_table()
             # 创建设备信息表
             await self.create_devices_table()
             # 创建文件导入记录表
             await self.create_import_records_table()
+            # 创建每日统计汇总表
+            await self.create_rollup_tables()
+            # 创建统计聚合函数
+            await self.create_statistics_functions()
             
             logger.info("Database tables initialized successfully")
         except Exception as e:
@@ -114,6 +120,28 @@ class SupabaseClient:
         
         self.service_client.postgrest.rpc('exec_sql', {'query': sql}).execute()
     
+    async def create_waveform_segments_table(self):
+        """创建波形压缩分段表（detail_storage_mode=segments 时存放测试详情）"""
+        sql = """
+        CREATE TABLE IF NOT EXISTS test_waveform_segments (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            test_record_id UUID NOT NULL REFERENCES test_records(id) ON DELETE CASCADE,
+            start_time DOUBLE PRECISION NOT NULL,
+            end_time DOUBLE PRECISION NOT NULL,
+            row_count INTEGER NOT NULL,
+            encoding JSONB NOT NULL,
+            payload BYTEA NOT NULL,
+            statuses JSONB,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        );
+        
+        -- 创建索引
+        CREATE INDEX IF NOT EXISTS idx_waveform_segments_record_time
+            ON test_waveform_segments(test_record_id, start_time);
+        """
+        
+        self.service_client.postgrest.rpc('exec_sql', {'query': sql}).execute()
+    
     async def create_devices_table(self):
         """创建设备信息表"""
         sql = """
@@ -147,12 +175,17 @@ class SupabaseClient:
             file_name VARCHAR(255) NOT NULL,
             file_size INTEGER,
             file_path VARCHAR(500),
+            content_hash VARCHAR(64),
+            parent_id UUID REFERENCES import_records(id) ON DELETE CASCADE,
             import_status VARCHAR(50) DEFAULT 'pending',
             total_records INTEGER DEFAULT 0,
             success_records INTEGER DEFAULT 0,
             failed_records INTEGER DEFAULT 0,
             error_message TEXT,
             import_config JSONB,
+            import_stats JSONB,
+            checkpoint JSONB,
+            rejection_report JSONB,
             started_at TIMESTAMP WITH TIME ZONE,
             completed_at TIMESTAMP WITH TIME ZONE,
             created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
@@ -162,10 +195,213 @@ class SupabaseClient:
         -- 创建索引
         CREATE INDEX IF NOT EXISTS idx_import_records_status ON import_records(import_status);
         CREATE INDEX IF NOT EXISTS idx_import_records_created_at ON import_records(created_at);
+        
+        -- 已有表补充新增列
+        ALTER TABLE import_records ADD COLUMN IF NOT EXISTS import_stats JSONB;
+        ALTER TABLE import_records ADD COLUMN IF NOT EXISTS checkpoint JSONB;
+        ALTER TABLE import_records ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+        CREATE INDEX IF NOT EXISTS idx_import_records_content_hash ON import_records(content_hash);
+        ALTER TABLE import_records ADD COLUMN IF NOT EXISTS parent_id UUID REFERENCES import_records(id) ON DELETE CASCADE;
+        CREATE INDEX IF NOT EXISTS idx_import_records_parent_id ON import_records(parent_id);
+        ALTER TABLE import_records ADD COLUMN IF NOT EXISTS rejection_report JSONB;
+        -- 旧版建表脚本的状态约束不含 partial（部分成功）
+        ALTER TABLE import_records DROP CONSTRAINT IF EXISTS import_records_import_status_check;
+        ALTER TABLE import_records ADD CONSTRAINT import_records_import_status_check
+            CHECK (import_status IN ('pending', 'processing', 'completed', 'partial', 'failed'));
         """
         
         self.service_client.postgrest.rpc('exec_sql', {'query': sql}).execute()
 
+    
+    async def create_rollup_tables(self):
+        """创建每日统计汇总表（按日期 × 设备型号 × 批次号增量维护）"""
+        sql = """
+        CREATE TABLE IF NOT EXISTS test_record_rollups (
+            test_day DATE NOT NULL,
+            device_model VARCHAR(100) NOT NULL DEFAULT '',
+            batch_number VARCHAR(100) NOT NULL DEFAULT '',
+            record_count INTEGER NOT NULL DEFAULT 0,
+            pass_count INTEGER NOT NULL DEFAULT 0,
+            fail_count INTEGER NOT NULL DEFAULT 0,
+            pass_rate_count INTEGER NOT NULL DEFAULT 0,
+            pass_rate_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            pass_rate_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+            voltage_count INTEGER NOT NULL DEFAULT 0,
+            voltage_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            voltage_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+            current_count INTEGER NOT NULL DEFAULT 0,
+            current_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            current_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+            power_count INTEGER NOT NULL DEFAULT 0,
+            power_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            power_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+            last_test_date TIMESTAMP,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            PRIMARY KEY (test_day, device_model, batch_number)
+        );
+        
+        -- 创建索引
+        CREATE INDEX IF NOT EXISTS idx_test_record_rollups_model ON test_record_rollups(device_model, test_day);
+        
+        -- 按日期重算汇总（p_days 为空时全量重建），返回写入的汇总行数
+        CREATE OR REPLACE FUNCTION refresh_test_record_rollups(p_days DATE[] DEFAULT NULL)
+        RETURNS INTEGER
+        LANGUAGE plpgsql
+        SECURITY DEFINER
+        SET search_path = public
+        AS $$
+        DECLARE
+            affected INTEGER;
+        BEGIN
+            IF p_days IS NULL THEN
+                -- 全量重建与增量刷新互斥
+                PERFORM pg_advisory_xact_lock(hashtext('test_record_rollups'));
+                DELETE FROM test_record_rollups;
+                SELECT array_agg(DISTINCT test_date::date) INTO p_days
+                FROM test_records WHERE is_deleted = FALSE;
+            ELSE
+                -- 同一天的刷新串行执行，后执行的刷新总能看到先提交的记录
+                PERFORM pg_advisory_xact_lock_shared(hashtext('test_record_rollups'));
+                PERFORM pg_advisory_xact_lock(hashtext('test_record_rollups:' || d::text))
+                FROM (SELECT DISTINCT unnest(p_days) AS d ORDER BY 1) days;
+                DELETE FROM test_record_rollups WHERE test_day = ANY(p_days);
+            END IF;
+            
+            INSERT INTO test_record_rollups (
+                test_day, device_model, batch_number,
+                record_count, pass_count, fail_count,
+                pass_rate_count, pass_rate_sum, pass_rate_sum_sq,
+                voltage_count, voltage_sum, voltage_sum_sq,
+                current_count, current_sum, current_sum_sq,
+                power_count, power_sum, power_sum_sq,
+                last_test_date, updated_at
+            )
+            SELECT
+                r.test_date::date,
+                COALESCE(r.device_model, ''),
+                COALESCE(r.batch_number, ''),
+                COUNT(*),
+                COUNT(*) FILTER (WHERE r.pass_rate >= 95),
+                COUNT(*) FILTER (WHERE r.pass_rate < 95),
+                COUNT(r.pass_rate),
+                COALESCE(SUM(r.pass_rate), 0)::float8,
+                COALESCE(SUM(r.pass_rate * r.pass_rate), 0)::float8,
+                COUNT(r.voltage),
+                COALESCE(SUM(r.voltage), 0)::float8,
+                COALESCE(SUM(r.voltage * r.voltage), 0)::float8,
+                COUNT(r.current),
+                COALESCE(SUM(r.current), 0)::float8,
+                COALESCE(SUM(r.current * r.current), 0)::float8,
+                COUNT(r.power),
+                COALESCE(SUM(r.power), 0)::float8,
+                COALESCE(SUM(r.power * r.power), 0)::float8,
+                MAX(r.test_date),
+                NOW()
+            FROM test_records r
+            JOIN (SELECT DISTINCT unnest(p_days) AS day) days
+              ON r.test_date >= days.day AND r.test_date < days.day + 1
+            WHERE r.is_deleted = FALSE
+            GROUP BY 1, 2, 3;
+            
+            GET DIAGNOSTICS affected = ROW_COUNT;
+            RETURN affected;
+        END;
+        $$;
+        
+        -- 首次创建时用已有记录初始化
+        SELECT refresh_test_record_rollups()
+        WHERE NOT EXISTS (SELECT 1 FROM test_record_rollups);
+        
+        NOTIFY pgrst, 'reload schema';
+        """
+        
+        self.service_client.postgrest.rpc('exec_sql', {'query': sql}).execute()
+    
+    async def create_statistics_functions(self):
+        """创建统计聚合函数（统计摘要在数据库端按分组集一次聚合）"""
+        sql = """
+        -- 统计摘要只需要的列，未删除记录可走仅索引扫描
+        CREATE INDEX IF NOT EXISTS idx_test_records_summary
+            ON test_records(test_date) INCLUDE (device_model, pass_rate)
+            WHERE is_deleted = FALSE;
+        
+        -- grouping_set: total 为汇总行，device 为设备型号分布，day 为 p_today - p_trend_days 起的日趋势
+        CREATE OR REPLACE FUNCTION test_record_summary(
+            p_start_date DATE DEFAULT NULL,
+            p_end_date DATE DEFAULT NULL,
+            p_device_model TEXT DEFAULT NULL,
+            p_today DATE DEFAULT CURRENT_DATE,
+            p_trend_days INTEGER DEFAULT 30
+        )
+        RETURNS TABLE (
+            grouping_set TEXT,
+            device_model TEXT,
+            test_day DATE,
+            record_count BIGINT,
+            today_count BIGINT,
+            week_count BIGINT,
+            month_count BIGINT,
+            pass_count BIGINT,
+            fail_count BIGINT,
+            average_pass_rate DOUBLE PRECISION,
+            trend_count BIGINT,
+            trend_pass_rate DOUBLE PRECISION
+        )
+        LANGUAGE sql STABLE
+        AS $$
+            WITH filtered AS (
+                SELECT
+                    r.test_date::date AS test_day,
+                    r.device_model,
+                    r.pass_rate,
+                    (p_start_date IS NULL OR r.test_date >= p_start_date)
+                        AND (p_end_date IS NULL OR r.test_date <= p_end_date) AS in_range,
+                    r.test_date >= p_today - p_trend_days AS in_trend
+                FROM test_records r
+                WHERE r.is_deleted = FALSE
+                  AND (p_device_model IS NULL OR r.device_model = p_device_model)
+                  AND (
+                      ((p_start_date IS NULL OR r.test_date >= p_start_date)
+                          AND (p_end_date IS NULL OR r.test_date <= p_end_date))
+                      OR r.test_date >= p_today - p_trend_days
+                  )
+            ),
+            keyed AS (
+                SELECT
+                    f.*,
+                    CASE WHEN f.in_range AND f.device_model <> '' THEN f.device_model END AS device_key,
+                    CASE WHEN f.in_trend THEN f.test_day END AS trend_day
+                FROM filtered f
+            )
+            SELECT
+                CASE
+                    WHEN GROUPING(device_key) = 0 THEN 'device'
+                    WHEN GROUPING(trend_day) = 0 THEN 'day'
+                    ELSE 'total'
+                END,
+                device_key::text,
+                trend_day,
+                COUNT(*) FILTER (WHERE in_range),
+                COUNT(*) FILTER (WHERE in_range AND test_day = p_today),
+                COUNT(*) FILTER (WHERE in_range AND test_day >= p_today - EXTRACT(ISODOW FROM p_today)::int + 1),
+                COUNT(*) FILTER (WHERE in_range AND test_day >= date_trunc('month', p_today::timestamp)::date),
+                COUNT(*) FILTER (WHERE in_range AND pass_rate >= 95),
+                COUNT(*) FILTER (WHERE in_range AND pass_rate < 95),
+                (AVG(pass_rate) FILTER (WHERE in_range))::float8,
+                COUNT(*) FILTER (WHERE in_trend),
+                (AVG(pass_rate) FILTER (WHERE in_trend))::float8
+            FROM keyed
+            GROUP BY GROUPING SETS ((), (device_key), (trend_day))
+            HAVING (GROUPING(device_key) = 1 OR device_key IS NOT NULL)
+               AND (GROUPING(trend_day) = 1 OR trend_day IS NOT NULL)
+            ORDER BY 1, 2, 3
+        $$;
+        
+        -- 通知 PostgREST 重新加载函数定义
+        NOTIFY pgrst, 'reload schema';
+        """
+        
+        self.service_client.postgrest.rpc('exec_sql', {'query': sql}).execute()
 
 # 创建全局数据库客户端实例
 db_client = SupabaseClient()
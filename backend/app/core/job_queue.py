@@ -0,0 +1,372 @@
+"""
+导入任务队列（SQLite持久化）
+"""
+import os
+import time
+import uuid
+import sqlite3
+import asyncio
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+from pathlib import Path
+from loguru import logger
+
+from app.core.config import settings
+
+
+# 优先级通道：数值越小越先执行
+LANE_PRIORITIES = {"small": 0, "large": 1}
+
+# 旧版任务表缺少的列（启动时补齐）
+_LEASE_COLUMNS = {"owner_token": "TEXT", "lease_expires": "REAL"}
+
+
+class ImportJobQueue:
+    """导入任务队列
+
+    任务持久化在本地 SQLite 文件中，固定数量的工作协程按优先级通道（小文件优先）领取任务。
+    领取任务时写入本进程的随机令牌和租约到期时间，运行期间定期续租；
+    租约过期的运行中任务（进程崩溃、容器重启）由任一进程重新排队，不依赖可能被复用的 PID；
+    领取时累计执行次数，达到上限的任务（每次执行都使进程崩溃）标记为失败，不再重新排队。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        workers: Optional[int] = None,
+        small_file_size: Optional[int] = None
+    ):
+        self.path = Path(path or settings.import_queue_path)
+        self.workers = workers or settings.import_queue_workers
+        self.small_file_size = small_file_size or settings.import_queue_small_file_size
+        self._handler: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        self._on_abandon: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._initialized = False
+        self.token = uuid.uuid4().hex  # 本进程的任务所有者令牌
+        self.lease = settings.import_queue_lease_seconds
+        self.max_attempts = settings.import_queue_max_attempts
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self._init_schema()
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_schema(self):
+        """初始化任务表"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS import_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    import_id TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    file_size INTEGER DEFAULT 0,
+                    options TEXT,
+                    lane TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER DEFAULT 0,
+                    owner_pid INTEGER,
+                    owner_token TEXT,
+                    lease_expires REAL,
+                    error TEXT,
+                    enqueued_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(import_jobs)")}
+            for column, column_type in _LEASE_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE import_jobs ADD COLUMN {column} {column_type}")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_import_jobs_claim "
+                "ON import_jobs(status, priority, id)"
+            )
+            self._initialized = True
+        finally:
+            conn.close()
+
+    # ---------- 同步数据库操作（在线程中执行） ----------
+
+    def _enqueue(self, import_id: str, file_path: str, file_size: int, options: Optional[str]) -> int:
+        lane = "small" if file_size < self.small_file_size else "large"
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "INSERT INTO import_jobs "
+                "(import_id, file_path, file_size, options, lane, priority, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (import_id, file_path, file_size, options, lane, LANE_PRIORITIES[lane], time.time())
+            )
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """原子领取下一个任务（等待过久的大文件任务提升优先级，避免饿死）"""
+        promote_before = time.time() - settings.import_queue_max_wait
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM import_jobs WHERE status = 'queued' "
+                "ORDER BY CASE WHEN enqueued_at < ? THEN -1 ELSE priority END, id LIMIT 1",
+                (promote_before,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            job = dict(row)
+            job.update(status="running", started_at=time.time(), attempts=job["attempts"] + 1)
+            conn.execute(
+                "UPDATE import_jobs SET status = 'running', started_at = ?, owner_pid = ?, "
+                "owner_token = ?, lease_expires = ?, attempts = ? WHERE id = ?",
+                (job["started_at"], os.getpid(), self.token, job["started_at"] + self.lease,
+                 job["attempts"], job["id"])
+            )
+            conn.execute("COMMIT")
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: int, status: str, error: Optional[str] = None):
+        """记录任务结果（租约过期后已被重新排队或领取的任务不再覆盖）"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE import_jobs SET status = ?, error = ?, finished_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND status = 'running' AND owner_token = ?",
+                (status, error, time.time(), job_id, self.token)
+            )
+        finally:
+            conn.close()
+
+    def _renew(self) -> int:
+        """续租本进程的运行中任务"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE import_jobs SET lease_expires = ? WHERE status = 'running' AND owner_token = ?",
+                (time.time() + self.lease, self.token)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def _release(self) -> int:
+        """将本进程的运行中任务重新排队（停止时调用，正常停止不计入执行次数）"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE import_jobs SET status = 'queued', owner_pid = NULL, owner_token = NULL, "
+                "lease_expires = NULL, attempts = MAX(attempts - 1, 0) "
+                "WHERE status = 'running' AND owner_token = ?",
+                (self.token,)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def _recover(self) -> Tuple[int, List[Dict[str, Any]]]:
+        """将租约已过期的运行中任务重新排队，执行次数已达上限的标记为失败，并清理过期记录
+
+        返回重新排队的任务数和标记为失败的任务。
+        """
+        now = time.time()
+        expired = "status = 'running' AND (lease_expires IS NULL OR lease_expires < ?)"
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            abandoned = [
+                dict(row) for row in conn.execute(
+                    f"SELECT * FROM import_jobs WHERE {expired} AND attempts >= ?",
+                    (now, self.max_attempts)
+                )
+            ]
+            for job in abandoned:
+                job.update(
+                    status="failed",
+                    error=f"Import job interrupted {job['attempts']} times, giving up",
+                    finished_at=now
+                )
+                conn.execute(
+                    "UPDATE import_jobs SET status = 'failed', error = ?, finished_at = ?, "
+                    "owner_pid = NULL, owner_token = NULL, lease_expires = NULL WHERE id = ?",
+                    (job["error"], now, job["id"])
+                )
+            cursor = conn.execute(
+                "UPDATE import_jobs SET status = 'queued', owner_pid = NULL, owner_token = NULL, "
+                f"lease_expires = NULL WHERE {expired} AND attempts < ?",
+                (now, self.max_attempts)
+            )
+            conn.execute(
+                "DELETE FROM import_jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (now - settings.import_queue_retention_days * 86400,)
+            )
+            conn.execute("COMMIT")
+            return cursor.rowcount, abandoned
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _metrics(self) -> Dict[str, Any]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            depth = {lane: 0 for lane in LANE_PRIORITIES}
+            oldest = {lane: 0.0 for lane in LANE_PRIORITIES}
+            for row in conn.execute(
+                "SELECT lane, COUNT(*) AS depth, MIN(enqueued_at) AS oldest "
+                "FROM import_jobs WHERE status = 'queued' GROUP BY lane"
+            ):
+                depth[row["lane"]] = row["depth"]
+                oldest[row["lane"]] = round(now - row["oldest"], 3)
+
+            running = conn.execute(
+                "SELECT COUNT(*) FROM import_jobs WHERE status = 'running'"
+            ).fetchone()[0]
+
+            wait = {}
+            for row in conn.execute(
+                "SELECT lane, COUNT(*) AS jobs, AVG(started_at - enqueued_at) AS avg_wait, "
+                "MAX(started_at - enqueued_at) AS max_wait FROM import_jobs "
+                "WHERE started_at >= ? GROUP BY lane",
+                (now - 3600,)
+            ):
+                wait[row["lane"]] = {
+                    "jobs": row["jobs"],
+                    "avg_seconds": round(row["avg_wait"] or 0, 3),
+                    "max_seconds": round(row["max_wait"] or 0, 3)
+                }
+
+            return {
+                "workers": self.workers,
+                "running": running,
+                "queue_depth": depth,
+                "oldest_wait_seconds": oldest,
+                "wait_last_hour": wait
+            }
+        finally:
+            conn.close()
+
+    # ---------- 异步接口 ----------
+
+    async def enqueue(
+        self,
+        import_id: str,
+        file_path: str,
+        file_size: int = 0,
+        options: Optional[str] = None
+    ) -> int:
+        """加入队列"""
+        job_id = await asyncio.to_thread(self._enqueue, str(import_id), file_path, file_size, options)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def metrics(self) -> Dict[str, Any]:
+        """队列深度与等待时间指标"""
+        return await asyncio.to_thread(self._metrics)
+
+    async def start(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        on_abandon: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ):
+        """启动工作协程（on_abandon 在任务因执行次数达到上限被标记为失败时调用）"""
+        self._handler = handler
+        self._on_abandon = on_abandon
+        self._wakeup = asyncio.Event()
+
+        recovered = await self._recover_jobs()
+        if recovered:
+            logger.info(f"Re-queued {recovered} interrupted import jobs")
+
+        self._tasks = [
+            asyncio.create_task(self._worker(i))
+            for i in range(self.workers)
+        ] + [asyncio.create_task(self._heartbeat())]
+        logger.info(f"Import job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """停止工作协程（运行中的任务立即重新排队）"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        released = await asyncio.to_thread(self._release)
+        if released:
+            logger.info(f"Re-queued {released} running import jobs on shutdown")
+        logger.info("Import job queue stopped")
+
+    async def _recover_jobs(self) -> int:
+        """重新排队租约已过期的任务，并通知被放弃的任务"""
+        recovered, abandoned = await asyncio.to_thread(self._recover)
+        for job in abandoned:
+            logger.error(f"Import job {job['id']} failed: {job['error']}")
+            if self._on_abandon is None:
+                continue
+            try:
+                await self._on_abandon(job)
+            except Exception as e:
+                logger.error(f"Error handling abandoned import job {job['id']}: {str(e)}")
+        return recovered
+
+    async def _heartbeat(self):
+        """定期续租本进程的任务，并重新排队其他进程租约已过期的任务"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await asyncio.to_thread(self._renew)
+                recovered = await self._recover_jobs()
+                if recovered:
+                    logger.info(f"Re-queued {recovered} import jobs with expired leases")
+                    self._wakeup.set()
+            except Exception as e:
+                logger.error(f"Error renewing import job leases: {str(e)}")
+
+    async def _worker(self, index: int):
+        """工作协程：循环领取并执行任务"""
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.error(f"Error claiming import job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.import_queue_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logger.info(
+                f"Worker {index} running import job {job['id']} "
+                f"({job['lane']} lane, import {job['import_id']}, "
+                f"waited {job['started_at'] - job['enqueued_at']:.1f}s)"
+            )
+            try:
+                await self._handler(job)
+                await asyncio.to_thread(self._finish, job["id"], "done")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Import job {job['id']} failed: {str(e)}")
+                await asyncio.to_thread(self._finish, job["id"], "failed", str(e))
+
+
+# 创建全局导入任务队列
+import_queue = ImportJobQueue()
@@ -0,0 +1,137 @@
+"""
+键集分页读取（不受 PostgREST max-rows 限制）
+"""
+import asyncio
+from typing import Dict, List, Any, Optional, Callable, AsyncIterator, Tuple
+from datetime import datetime
+from supabase import Client
+
+from app.core.config import settings
+
+
+class RowBudgetExceeded(Exception):
+    """查询匹配的记录数超过读取预算"""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        super().__init__(
+            f"Query matches more than {budget} records; narrow the date range or filters"
+        )
+
+
+class KeysetFetcher:
+    """按 (test_date, id) 键集分页读取测试记录
+
+    每页以上一页最后一行的 (test_date, id) 为游标继续读取，直到返回空页，
+    单页被服务端 max-rows 截断时也不会漏读。记录按 test_date 切分为若干时间分区，
+    各分区并发翻页、预取的页放入有界队列，消费方逐页聚合，内存中只保留预取的几页。
+    读取的行数超过 max_rows 时抛出 RowBudgetExceeded，而不是返回被截断的结果。
+    """
+
+    def __init__(
+        self,
+        db: Client,
+        columns: str,
+        where: Optional[Callable[[Any], Any]] = None,
+        table: str = "test_records",
+        page_size: Optional[int] = None,
+        prefetch: Optional[int] = None,
+        partitions: Optional[int] = None,
+        max_rows: Optional[int] = None
+    ):
+        self.db = db
+        self.table = table
+        self.where = where or (lambda query: query)
+        # 游标列总是读取
+        names = [name.strip() for name in columns.split(",")]
+        self.columns = ", ".join(names + [key for key in ("test_date", "id") if key not in names])
+        self.page_size = page_size or settings.statistics_page_size
+        self.prefetch = prefetch or settings.statistics_prefetch_pages
+        self.partitions = partitions or settings.statistics_fetch_partitions
+        self.max_rows = settings.statistics_max_rows if max_rows is None else max_rows
+        self.fetched_rows = 0
+
+    def _query(self):
+        return self.where(self.db.table(self.table).select(self.columns))
+
+    async def _execute(self, query) -> List[Dict[str, Any]]:
+        response = await asyncio.to_thread(query.execute)
+        return response.data or []
+
+    async def _bounds(self) -> Optional[Tuple[datetime, datetime]]:
+        """匹配记录的最早和最晚测试时间"""
+        first, last = await asyncio.gather(
+            self._execute(self._query().order("test_date").limit(1)),
+            self._execute(self._query().order("test_date", desc=True).limit(1))
+        )
+        if not first or not last:
+            return None
+        return datetime.fromisoformat(first[0]["test_date"]), datetime.fromisoformat(last[0]["test_date"])
+
+    async def _ranges(self) -> List[Tuple[Optional[str], Optional[str]]]:
+        """时间分区 [start, end)，首尾分区不设下界、上界"""
+        bounds = await self._bounds() if self.partitions > 1 else None
+        if bounds is None or bounds[0] >= bounds[1]:
+            return [(None, None)]
+
+        start, end = bounds
+        step = (end - start) / self.partitions
+        edges = [(start + step * i).isoformat() for i in range(1, self.partitions)]
+        return list(zip([None] + edges, edges + [None]))
+
+    async def _produce(
+        self,
+        start: Optional[str],
+        end: Optional[str],
+        queue: asyncio.Queue
+    ):
+        """按游标顺序读取一个时间分区，结束时放入 None，出错时放入异常"""
+        cursor = None
+        try:
+            while True:
+                query = self._query()
+                if start is not None:
+                    query = query.gte("test_date", start)
+                if end is not None:
+                    query = query.lt("test_date", end)
+                if cursor is not None:
+                    test_date, record_id = cursor
+                    query = query.or_(
+                        f'test_date.gt."{test_date}",and(test_date.eq."{test_date}",id.gt.{record_id})'
+                    )
+                query = query.order("test_date").order("id").limit(self.page_size)
+
+                page = await self._execute(query)
+                if not page:
+                    break
+                await queue.put(page)
+                cursor = (page[-1]["test_date"], page[-1]["id"])
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(None)
+
+    async def pages(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        """逐页返回记录（分区之间不保证顺序）"""
+        ranges = await self._ranges()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.prefetch)
+        producers = [asyncio.create_task(self._produce(start, end, queue)) for start, end in ranges]
+
+        try:
+            remaining = len(producers)
+            while remaining:
+                page = await queue.get()
+                if page is None:
+                    remaining -= 1
+                    continue
+                if isinstance(page, Exception):
+                    raise page
+
+                self.fetched_rows += len(page)
+                if self.fetched_rows > self.max_rows:
+                    raise RowBudgetExceeded(self.max_rows)
+                yield page
+        finally:
+            for producer in producers:
+                producer.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
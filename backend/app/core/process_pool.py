@@ -0,0 +1,218 @@
+"""
+CPU密集任务进程池
+"""
+import queue
+import asyncio
+import weakref
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+from loguru import logger
+
+from app.core.config import settings
+
+
+# 流式任务在队列中预取的项数（队列满时工作进程等待）
+_STREAM_PREFETCH = 2
+
+# 等待流式结果时检查工作进程状态的间隔（秒）
+_STREAM_POLL_INTERVAL = 1.0
+
+# 流式迭代结束标记
+_END = object()
+
+
+class ParseTimeoutError(TimeoutError):
+    """解析任务超时"""
+    pass
+
+
+class ParsePoolRecycled(Exception):
+    """流式任务所在的进程池因其他任务超时被重建，需要从中断处重新开始"""
+    pass
+
+
+def _stream_worker(results, stop, func: Callable[..., Iterator[Any]], *args: Any):
+    """流式任务的工作进程入口：逐项放入结果队列，消费方停止后退出"""
+    try:
+        for item in func(*args):
+            while True:
+                if stop.is_set():
+                    return
+                try:
+                    results.put(("item", item), timeout=_STREAM_POLL_INTERVAL)
+                    break
+                except queue.Full:
+                    continue
+        results.put(("end", None))
+    except Exception as e:
+        results.put(("error", e))
+
+
+class ParsePool:
+    """解析进程池管理
+
+    在独立进程中执行 pandas/openpyxl 解析，避免阻塞事件循环；
+    通过信号量限制并发任务数，并为每个任务设置超时。
+    超时的任务无法单独中断，因此终止整个进程池释放其工作进程，下次使用时重建；
+    同时在该进程池中执行或排队的其他任务在新进程池中重新执行。
+    流式任务（stream）在工作进程中迭代，结果经有界队列逐项传回，内存占用与任务大小无关。
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        self.max_workers = settings.parse_pool_workers if max_workers is None else max_workers
+        self.max_concurrency = max_concurrency or settings.parse_max_concurrency
+        self.timeout = timeout or settings.parse_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._recycled: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+        self._manager = None
+
+    @property
+    def executor(self) -> Optional[ProcessPoolExecutor]:
+        """获取进程池（max_workers 为 0 时不使用进程池）"""
+        if self.max_workers <= 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Parse pool started with {self.max_workers} workers")
+        return self._executor
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """在进程池中执行任务（进程池未启用时在线程中执行）"""
+        timeout = timeout or self.timeout
+        name = getattr(func, "__name__", func)
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            while True:
+                executor = self.executor
+                future = loop.run_in_executor(executor, func, *args)
+                try:
+                    return await asyncio.wait_for(future, timeout=timeout)
+                except asyncio.TimeoutError:
+                    logger.error(f"Parse job {name} timed out after {timeout}s")
+                    if executor is not None:
+                        self._recycle(executor)
+                    # 线程中执行时无法中断，线程完成后结果被丢弃
+                    raise ParseTimeoutError(f"Parsing timed out after {timeout:.0f}s")
+                except (BrokenProcessPool, asyncio.CancelledError) as e:
+                    # 其他任务超时后进程池已被重建：执行中的任务因工作进程终止而失败，
+                    # 排队的任务被取消，均重新执行；调用方自身被取消时不重试
+                    if executor not in self._recycled:
+                        raise
+                    if isinstance(e, asyncio.CancelledError) and asyncio.current_task().cancelling():
+                        raise
+                    logger.warning(f"Parse job {name} restarted after parse pool recycle")
+
+    async def stream(
+        self,
+        func: Callable[..., Iterator[Any]],
+        *args: Any,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Any]:
+        """在进程池中迭代 func(*args) 返回的迭代器，逐项返回结果（进程池未启用时在线程中迭代）
+
+        timeout 为相邻两项之间的最长间隔，超时时与 run 一样重建进程池；
+        进程池被其他任务的超时重建时抛出 ParsePoolRecycled，由调用方从中断处重新开始。
+        """
+        timeout = timeout or self.timeout
+        name = getattr(func, "__name__", func)
+        async with self.semaphore:
+            executor = self.executor
+            if executor is None:
+                iterator = func(*args)
+                while True:
+                    item = await asyncio.to_thread(next, iterator, _END)
+                    if item is _END:
+                        return
+                    yield item
+
+            manager = self._get_manager()
+            results = manager.Queue(maxsize=_STREAM_PREFETCH)
+            stop = manager.Event()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(executor, _stream_worker, results, stop, func, *args)
+            try:
+                idle = 0.0
+                while True:
+                    try:
+                        kind, value = await asyncio.to_thread(results.get, True, _STREAM_POLL_INTERVAL)
+                    except queue.Empty:
+                        if future.done():
+                            # 工作进程正常结束前已放入结束标记，此处只处理异常退出（被终止或崩溃）
+                            self._check_stream_worker(future, executor, name)
+                        idle += _STREAM_POLL_INTERVAL
+                        if idle >= timeout:
+                            logger.error(f"Parse stream {name} produced nothing for {timeout}s")
+                            self._recycle(executor)
+                            raise ParseTimeoutError(f"Parsing timed out after {timeout:.0f}s")
+                        continue
+                    
+                    idle = 0.0
+                    if kind == "end":
+                        break
+                    if kind == "error":
+                        raise value
+                    yield value
+                await future
+            finally:
+                stop.set()
+                # 提前结束（消费方停止、超时）时工作进程的结果不再需要
+                future.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    def _check_stream_worker(self, future: asyncio.Future, executor: ProcessPoolExecutor, name: Any):
+        """流式任务的工作进程已结束：被进程池重建中断时抛出 ParsePoolRecycled"""
+        try:
+            future.result()
+        except (BrokenProcessPool, asyncio.CancelledError):
+            if executor in self._recycled:
+                logger.warning(f"Parse stream {name} interrupted by parse pool recycle")
+                raise ParsePoolRecycled(f"Parse stream {name} interrupted by parse pool recycle")
+            raise
+
+    def _get_manager(self):
+        """结果队列所在的管理进程（首次使用流式任务时启动）"""
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """终止进程池的全部工作进程（下次使用时重建）"""
+        if self._executor is executor:
+            self._executor = None
+        self._recycled.add(executor)
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        logger.warning(f"Parse pool recycled, terminated {len(processes)} workers")
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Parse pool shut down")
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+# 创建全局解析进程池
+parse_pool = ParsePool()
@@ -0,0 +1,228 @@
+"""
+导入进度存储（多工作进程共享）
+"""
+import json
+import time
+import asyncio
+from typing import Dict, Any, Optional, List, Set, Callable, Awaitable, Tuple
+from loguru import logger
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # 未安装 redis 时只使用进程内存储
+    aioredis = None
+
+
+# 终态进度不节流，保证最后一次更新一定写入
+FINAL_STATUSES = {"completed", "partial", "failed"}
+
+_KEY_PREFIX = "import_progress:"
+_CHANNEL = "import_progress"
+
+# 单个订阅队列长度（消费过慢时丢弃最旧的进度，只保留最新状态）
+_SUBSCRIBER_QUEUE_SIZE = 16
+
+ProgressListener = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class ProgressStore:
+    """导入进度存储
+
+    配置 redis_url 时进度写入 Redis（带过期时间），并通过发布/订阅通知所有 API 进程，
+    由各进程推送给本进程内订阅了该导入任务的客户端；未配置或 Redis 不可用时
+    退化为进程内字典，同样按 TTL 淘汰。
+    同一导入任务的写入按 min_interval 节流，间隔内只保留最新一条进度，间隔结束时写入；终态总是立即写入。
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        ttl: Optional[int] = None,
+        min_interval: Optional[float] = None
+    ):
+        self.redis_url = settings.redis_url if redis_url is None else redis_url
+        self.ttl = ttl or settings.progress_ttl
+        self.min_interval = settings.progress_min_interval if min_interval is None else min_interval
+        self._redis = None
+        self._local: Dict[str, Tuple[float, Dict[str, Any]]] = {}  # 导入ID → (过期时间, 进度)
+        self._last_write: Dict[str, float] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}  # 节流期间暂存的最新进度
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        self._listeners: List[ProgressListener] = []
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._listen_task: Optional[asyncio.Task] = None
+
+    def _client(self):
+        if self._redis is None and self.redis_url and aioredis is not None:
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def add_listener(self, callback: ProgressListener):
+        """注册进度推送回调 callback(import_id, progress)"""
+        self._listeners.append(callback)
+
+    def subscribe(self, import_id: Any) -> asyncio.Queue:
+        """订阅单个导入任务的进度，返回接收进度的队列"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(str(import_id), set()).add(queue)
+        return queue
+
+    def unsubscribe(self, import_id: Any, queue: asyncio.Queue):
+        """取消订阅"""
+        key = str(import_id)
+        queues = self._subscribers.get(key)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[key]
+
+    async def start(self):
+        """启动 Redis 订阅（接收其他进程写入的进度并推送）"""
+        if self._client() is not None and self._listen_task is None:
+            self._listen_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        for key in list(self._flush_tasks):
+            self._cancel_flush(key)
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            await asyncio.gather(self._listen_task, return_exceptions=True)
+            self._listen_task = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def set(self, import_id: Any, progress: Dict[str, Any], force: bool = False) -> bool:
+        """写入进度（节流），返回是否立即写入（节流时暂存，间隔结束后写入）"""
+        key = str(import_id)
+        now = time.monotonic()
+        final = progress.get("status") in FINAL_STATUSES
+        if not (force or final):
+            delay = self.min_interval - (now - self._last_write.get(key, float("-inf")))
+            if delay > 0:
+                self._pending[key] = progress
+                if key not in self._flush_tasks:
+                    self._flush_tasks[key] = asyncio.create_task(self._flush(key, delay))
+                return False
+
+        # 立即写入的进度覆盖暂存的进度
+        self._cancel_flush(key)
+        return await self._write(key, progress, final, now)
+
+    async def _flush(self, key: str, delay: float):
+        """间隔结束后写入暂存的最新进度"""
+        try:
+            await asyncio.sleep(delay)
+            progress = self._pending.pop(key, None)
+            if progress is not None:
+                await self._write(key, progress, False, time.monotonic())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error flushing import progress: {str(e)}")
+        finally:
+            if self._flush_tasks.get(key) is asyncio.current_task():
+                del self._flush_tasks[key]
+
+    def _cancel_flush(self, key: str):
+        self._pending.pop(key, None)
+        task = self._flush_tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    async def _write(self, key: str, progress: Dict[str, Any], final: bool, now: float) -> bool:
+        if final:
+            self._last_write.pop(key, None)
+        else:
+            self._last_write[key] = now
+
+        client = self._client()
+        if client is not None:
+            try:
+                data = json.dumps(progress, default=str)
+                await client.set(_KEY_PREFIX + key, data, ex=self.ttl)
+                await client.publish(_CHANNEL, json.dumps({"import_id": key, "data": progress}, default=str))
+                if self._listen_task is None:
+                    await self._notify(key, progress)
+                return True
+            except Exception as e:
+                logger.error(f"Error writing import progress to redis: {str(e)}")
+
+        self._evict(now)
+        self._local[key] = (now + self.ttl, progress)
+        await self._notify(key, progress)
+        return True
+
+    async def get(self, import_id: Any) -> Optional[Dict[str, Any]]:
+        """读取进度"""
+        key = str(import_id)
+        client = self._client()
+        if client is not None:
+            try:
+                data = await client.get(_KEY_PREFIX + key)
+                if data:
+                    return json.loads(data)
+            except Exception as e:
+                logger.error(f"Error reading import progress from redis: {str(e)}")
+
+        entry = self._local.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    async def delete(self, import_id: Any):
+        """删除进度"""
+        key = str(import_id)
+        self._local.pop(key, None)
+        self._last_write.pop(key, None)
+        self._cancel_flush(key)
+        client = self._client()
+        if client is not None:
+            try:
+                await client.delete(_KEY_PREFIX + key)
+            except Exception as e:
+                logger.error(f"Error deleting import progress from redis: {str(e)}")
+
+    def _evict(self, now: float):
+        """淘汰过期的进程内进度"""
+        expired = [key for key, (expires, _) in self._local.items() if expires < now]
+        for key in expired:
+            del self._local[key]
+            self._last_write.pop(key, None)
+
+    async def _notify(self, import_id: str, progress: Dict[str, Any]):
+        for queue in self._subscribers.get(import_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(progress)
+
+        for callback in self._listeners:
+            try:
+                await callback(import_id, progress)
+            except Exception as e:
+                logger.error(f"Error pushing import progress: {str(e)}")
+
+    async def _listen(self):
+        """订阅 Redis 进度频道，断线后重连"""
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    await self._notify(payload["import_id"], payload["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error listening for import progress: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+
+# 创建全局进度存储
+progress_store = ProgressStore()
@@ -0,0 +1,233 @@
+"""
+统计结果缓存（多工作进程共享）
+"""
+import json
+import math
+import time
+import asyncio
+import hashlib
+import functools
+import inspect
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Any, Optional, Set, Tuple, Callable, Awaitable, Type
+from loguru import logger
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # 未安装 redis 时只使用进程内缓存
+    aioredis = None
+
+
+_KEY_PREFIX = "stats_cache:"
+_GENERATION_KEY = "stats_cache:generation"
+
+# 缓存项：(写入时的缓存代数, 写入时间, 结果)
+CacheEntry = Tuple[int, float, Any]
+
+
+def _normalize(value: Any) -> str:
+    """参数中无法直接序列化的值（日期、UUID 等）转为字符串"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class StatsCache:
+    """统计结果缓存
+
+    缓存键由方法名和规范化后的参数组成。配置 redis_url 时结果写入 Redis 供所有 API 进程共享，
+    未配置或 Redis 不可用时退化为进程内 LRU（其他进程的写入只能等待 TTL 过期）。
+    测试记录、导入和设备的写入调用 invalidate 递增缓存代数；缓存项保存写入时的代数，
+    读取时与当前代数一起取回（Redis 中一次 MGET），代数落后的缓存项视为已失效、同步重新计算，
+    写入后的下一次读取即可看到新结果。代数未变、仅超过 ttl 的缓存项在 stale_ttl 内仍直接返回，
+    同时在后台重新计算；
+    同一键同时只计算一次，并发的未命中请求等待同一次计算。
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        ttl: Optional[float] = None,
+        stale_ttl: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.redis_url = settings.redis_url if redis_url is None else redis_url
+        self.ttl = settings.statistics_cache_ttl if ttl is None else ttl
+        self.stale_ttl = settings.statistics_cache_stale_ttl if stale_ttl is None else stale_ttl
+        self.max_entries = max_entries or settings.statistics_cache_size
+        self._redis = None
+        self._local: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._generation = 0
+        self._pending: Dict[Tuple[str, int], asyncio.Task] = {}  # (键, 代数) → 进行中的计算
+        self._background: Set[asyncio.Task] = set()
+
+    def _client(self):
+        if self._redis is None and self.redis_url and aioredis is not None:
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    @staticmethod
+    def make_key(name: str, params: Dict[str, Any]) -> str:
+        """方法名 + 参数摘要（参数按名称排序）"""
+        data = json.dumps(params, sort_keys=True, default=_normalize)
+        return f"{name}:{hashlib.sha1(data.encode()).hexdigest()}"
+
+    def cached(self, model: Optional[Type] = None):
+        """缓存服务方法的结果（键为方法名与除 self 外的全部参数，含默认值）
+
+        返回 Pydantic 模型的方法需要传入 model，以便从 Redis 中的 JSON 重建。
+        """
+        def decorator(func: Callable[..., Awaitable[Any]]):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            async def wrapper(service, *args, **kwargs):
+                if not settings.statistics_cache_enabled:
+                    return await func(service, *args, **kwargs)
+
+                bound = signature.bind(service, *args, **kwargs)
+                bound.apply_defaults()
+                params = dict(list(bound.arguments.items())[1:])
+                key = self.make_key(func.__qualname__, params)
+                return await self.get_or_compute(key, lambda: func(service, *args, **kwargs), model)
+
+            return wrapper
+        return decorator
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        model: Optional[Type] = None
+    ) -> Any:
+        """读取缓存，未命中或已失效时同步计算并写入；仅超过 ttl 的结果在 stale_ttl 内返回旧值并后台刷新"""
+        entry, generation = await self._read(key, model)
+        if entry is not None and entry[0] == generation:
+            _, stored_at, value = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._revalidate(key, compute, generation, model)
+                return value
+
+        return await self._compute(key, compute, generation, model)
+
+    async def invalidate(self):
+        """递增缓存代数，之前缓存的结果全部视为失效"""
+        self._generation += 1
+        client = self._client()
+        if client is not None:
+            try:
+                await client.incr(_GENERATION_KEY)
+            except Exception as e:
+                logger.error(f"Error invalidating statistics cache in redis: {str(e)}")
+
+    async def stop(self):
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self._background.clear()
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def _compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        generation: int,
+        model: Optional[Type]
+    ) -> Any:
+        """计算并写入缓存（同一键、同一代数的并发计算合并为一次，失效前开始的计算不复用）"""
+        pending_key = (key, generation)
+        task = self._pending.get(pending_key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key, compute, generation, model))
+            self._pending[pending_key] = task
+            task.add_done_callback(lambda _: self._pending.pop(pending_key, None))
+        # 单个请求取消时不取消共享的计算
+        return await asyncio.shield(task)
+
+    async def _refresh(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        generation: int,
+        model: Optional[Type]
+    ) -> Any:
+        # 使用计算前读取的代数：计算期间发生的写入会使该结果在下次读取时失效
+        value = await compute()
+        await self._write(key, (generation, time.time(), value), model)
+        return value
+
+    def _revalidate(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        generation: int,
+        model: Optional[Type]
+    ):
+        """后台刷新（已有同一键的计算时不重复发起）"""
+        if (key, generation) in self._pending:
+            return
+
+        async def run():
+            try:
+                await self._compute(key, compute, generation, model)
+            except Exception as e:
+                logger.warning(f"Error revalidating statistics cache: {str(e)}")
+
+        task = asyncio.create_task(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _read(self, key: str, model: Optional[Type]) -> Tuple[Optional[CacheEntry], int]:
+        """读取缓存项和当前缓存代数"""
+        client = self._client()
+        if client is not None:
+            try:
+                generation, data = await client.mget(_GENERATION_KEY, _KEY_PREFIX + key)
+                entry = None
+                if data:
+                    payload = json.loads(data)
+                    value = payload["value"]
+                    if model is not None:
+                        value = model(**value)
+                    entry = (payload["generation"], payload["stored_at"], value)
+                return entry, int(generation or 0)
+            except Exception as e:
+                logger.error(f"Error reading statistics cache from redis: {str(e)}")
+
+        entry = self._local.get(key)
+        if entry is not None:
+            self._local.move_to_end(key)
+        return entry, self._generation
+
+    async def _write(self, key: str, entry: CacheEntry, model: Optional[Type]):
+        client = self._client()
+        if client is not None:
+            try:
+                generation, stored_at, value = entry
+                if model is not None:
+                    value = value.model_dump(mode="json")
+                payload = json.dumps(
+                    {"generation": generation, "stored_at": stored_at, "value": value},
+                    default=str
+                )
+                await client.set(_KEY_PREFIX + key, payload, ex=math.ceil(self.ttl + self.stale_ttl))
+                return
+            except Exception as e:
+                logger.error(f"Error writing statistics cache to redis: {str(e)}")
+
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+
+# 创建全局统计缓存
+stats_cache = StatsCache()
@@ -0,0 +1,68 @@
+"""
+上传请求体大小限制
+"""
+from typing import Dict, Optional
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# multipart 边界、表单字段等额外开销的容许量
+_MULTIPART_OVERHEAD = 1048576
+
+
+class UploadSizeLimitMiddleware:
+    """在 multipart 解析之前限制上传请求体大小
+
+    Starlette 在调用端点之前会把整个 multipart 请求体写入临时文件，端点内的大小检查
+    只能在全部接收之后进行。此中间件对指定路径：Content-Length 超限时不读取请求体直接返回 413；
+    没有 Content-Length（分块传输）时边接收边计数，超限时立即返回 413 并停止接收。
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int], overhead: int = _MULTIPART_OVERHEAD):
+        self.app = app
+        self.limits = {path.rstrip("/"): limit for path, limit in limits.items()}
+        self.overhead = overhead
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        max_size = self._max_size(scope)
+        if max_size is None:
+            await self.app(scope, receive, send)
+            return
+
+        limit = max_size + self.overhead
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"File too large. Maximum size: {max_size / 1024 / 1024:.0f}MB"}
+        )
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await response(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit and not rejected:
+                    rejected = True
+                    await response(scope, receive, send)
+                    # 中断表单解析，端点不会执行
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message):
+            # 已返回 413 后丢弃应用的响应（表单解析中断产生的错误响应）
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+    def _max_size(self, scope: Scope) -> Optional[int]:
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            return None
+        return self.limits.get(scope["path"].rstrip("/"))
@@ -1,7 +1,8 @@
 """
 FastAPI主应用入口
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
@@ -10,6 +11,13 @@ import sys
 
 from app.core.config import settings
 from app.core.database import db_client
+from app.core.process_pool import parse_pool
+from app.core.job_queue import import_queue
+from app.core.progress_store import progress_store
+from app.core.stats_cache import stats_cache
+from app.core.keyset_fetch import RowBudgetExceeded
+from app.core.upload_limit import UploadSizeLimitMiddleware
+from app.services.import_service import run_import_job, fail_import_job
 from app.api.v1 import api_router
 from app.websocket import websocket_router
 
@@ -37,10 +45,18 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Failed to initialize database: {str(e)}")
     
+    # 启动导入进度订阅与导入任务队列
+    await progress_store.start()
+    await import_queue.start(run_import_job, fail_import_job)
+    
     yield
     
     # 关闭时执行
     logger.info("Shutting down application...")
+    await import_queue.stop()
+    await progress_store.stop()
+    await stats_cache.stop()
+    parse_pool.shutdown()
 
 
 # 创建FastAPI应用
@@ -53,6 +69,16 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 上传大小限制（在 multipart 请求体落盘之前拒绝超限请求）
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/api/v1/imports/excel": settings.max_upload_size,
+        "/api/v1/imports/preview": settings.max_upload_size,
+        "/api/v1/imports/archive": settings.max_archive_size
+    }
+)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -62,6 +88,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# 统计查询超出读取预算
+@app.exception_handler(RowBudgetExceeded)
+async def row_budget_exceeded_handler(request: Request, exc: RowBudgetExceeded):
+    """统计查询匹配记录过多时提示缩小范围"""
+    return JSONResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={"detail": str(exc)}
+    )
+
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
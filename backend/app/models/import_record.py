@@ -2,7 +2,7 @@
 文件导入记录数据模型
 """
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field, ConfigDict
 from uuid import UUID
 
@@ -13,6 +13,8 @@ class ImportRecordBase(BaseModel):
     file_size: Optional[int] = Field(None, description="文件大小(字节)")
     file_path: Optional[str] = Field(None, description="文件路径")
     import_config: Optional[Dict[str, Any]] = Field(None, description="导入配置")
+    content_hash: Optional[str] = Field(None, description="文件内容哈希(SHA-256)")
+    parent_id: Optional[UUID] = Field(None, description="所属压缩包导入记录ID")
 
 
 class ImportRecordCreate(ImportRecordBase):
@@ -40,6 +42,9 @@ class ImportRecord(ImportRecordBase):
     success_records: int = Field(default=0, description="成功记录数")
     failed_records: int = Field(default=0, description="失败记录数")
     error_message: Optional[str] = None
+    import_stats: Optional[Dict[str, Any]] = Field(None, description="导入统计（吞吐量等）")
+    checkpoint: Optional[Dict[str, Any]] = Field(None, description="导入断点")
+    rejection_report: Optional[Dict[str, Any]] = Field(None, description="校验剔除行报告")
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     created_at: datetime
@@ -53,4 +58,23 @@ class ImportProgress(BaseModel):
     progress: float = Field(ge=0, le=100, description="进度百分比")
     current_record: int = Field(default=0, description="当前处理记录数")
     total_records: int = Field(default=0, description="总记录数")
-    message: Optional[str] = Field(None, description="状态消息")
\ No newline at end of file
+    message: Optional[str] = Field(None, description="状态消息")
+
+
+class ImportPreview(BaseModel):
+    """导入预检结果模型"""
+    file_name: str
+    file_info: Dict[str, Any] = Field(default_factory=dict, description="文件名解析出的参数")
+    reader_backend: Optional[str] = Field(None, description="读取后端")
+    header: List[Optional[str]] = Field(default_factory=list, description="原始表头行")
+    columns: List[str] = Field(default_factory=list, description="列名")
+    column_roles: Dict[str, str] = Field(default_factory=dict, description="列角色映射")
+    column_source: Optional[str] = Field(None, description="列映射来源")
+    preview_rows: int = Field(default=0, description="预检读取的数据行数")
+    predicted_sample_count: Optional[int] = Field(None, description="预测采样点数")
+    validation: Dict[str, Any] = Field(default_factory=dict, description="样本校验结果")
+    sample: List[Dict[str, Any]] = Field(default_factory=list, description="前几行详细数据")
+    errors: List[str] = Field(default_factory=list, description="导致导入失败的问题")
+    warnings: List[str] = Field(default_factory=list, description="警告")
+    acceptable: bool = Field(default=True, description="是否可以导入")
+    elapsed_ms: float = Field(default=0, description="预检耗时（毫秒）")
@@ -1,18 +1,21 @@
 """
 设备管理服务
 """
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from uuid import UUID
 from datetime import datetime
 from supabase import Client
 from loguru import logger
 
+from app.core.config import settings
+from app.core.stats_cache import stats_cache
 from app.models.device import (
     Device,
     DeviceCreate,
     DeviceUpdate,
     DeviceWithStats
 )
+from app.services.rollup_service import RollupService
 
 
 class DeviceService:
@@ -20,6 +23,7 @@ class DeviceService:
     
     def __init__(self, db: Client):
         self.db = db
+        self.rollups = RollupService(db)
     
     async def get_devices(
         self,
@@ -59,35 +63,8 @@ class DeviceService:
             # 获取设备列表
             devices = await self.get_devices(skip, limit)
             
-            result = []
-            for device in devices:
-                device_with_stats = DeviceWithStats(**device.dict())
-                
-                # 获取测试统计信息
-                stats_response = self.db.table("test_records")\
-                    .select("id, test_date, pass_rate")\
-                    .eq("device_model", device.device_model)\
-                    .eq("is_deleted", False)\
-                    .execute()
-                
-                if stats_response.data:
-                    device_with_stats.test_count = len(stats_response.data)
-                    
-                    # 最后测试日期
-                    test_dates = [record["test_date"] for record in stats_response.data]
-                    if test_dates:
-                        device_with_stats.last_test_date = max(test_dates)
-                    
-                    # 平均合格率
-                    pass_rates = [
-                        record["pass_rate"] 
-                        for record in stats_response.data 
-                        if record.get("pass_rate") is not None
-                    ]
-                    if pass_rates:
-                        device_with_stats.average_pass_rate = sum(pass_rates) / len(pass_rates)
-                
-                result.append(device_with_stats)
+            result = [DeviceWithStats(**device.dict()) for device in devices]
+            await self._attach_test_stats(result)
             
             return result
             
@@ -110,26 +87,7 @@ class DeviceService:
             device = DeviceWithStats(**response.data)
             
             # 获取统计信息
-            stats_response = self.db.table("test_records")\
-                .select("id, test_date, pass_rate")\
-                .eq("device_model", device.device_model)\
-                .eq("is_deleted", False)\
-                .execute()
-            
-            if stats_response.data:
-                device.test_count = len(stats_response.data)
-                
-                test_dates = [record["test_date"] for record in stats_response.data]
-                if test_dates:
-                    device.last_test_date = max(test_dates)
-                
-                pass_rates = [
-                    record["pass_rate"] 
-                    for record in stats_response.data 
-                    if record.get("pass_rate") is not None
-                ]
-                if pass_rates:
-                    device.average_pass_rate = sum(pass_rates) / len(pass_rates)
+            await self._attach_test_stats([device])
             
             return device
             
@@ -152,19 +110,52 @@ class DeviceService:
             device = DeviceWithStats(**response.data)
             
             # 获取统计信息
+            await self._attach_test_stats([device])
+            
+            return device
+            
+        except Exception as e:
+            logger.error(f"Error fetching device by model: {str(e)}")
+            return None
+    
+    async def _attach_test_stats(self, devices: List[DeviceWithStats]):
+        """填充测试次数、最后测试日期和平均合格率（优先读取每日汇总，一次查询所有型号）"""
+        if not devices:
+            return
+        
+        if settings.statistics_use_rollups:
+            try:
+                rows = await self.rollups.get_rollups(
+                    device_models=[device.device_model for device in devices]
+                )
+                groups = RollupService.combine(rows, lambda row: row["device_model"])
+                for device in devices:
+                    group = groups.get(device.device_model)
+                    if group:
+                        device.test_count = group["record_count"]
+                        device.last_test_date = group["last_test_date"]
+                        if group["pass_rate_count"]:
+                            device.average_pass_rate = RollupService.mean(group, "pass_rate")
+                return
+            except Exception as e:
+                logger.warning(f"Rollups unavailable for device statistics: {str(e)}")
+        
+        for device in devices:
             stats_response = self.db.table("test_records")\
                 .select("id, test_date, pass_rate")\
-                .eq("device_model", device_model)\
+                .eq("device_model", device.device_model)\
                 .eq("is_deleted", False)\
                 .execute()
             
             if stats_response.data:
                 device.test_count = len(stats_response.data)
                 
+                # 最后测试日期
                 test_dates = [record["test_date"] for record in stats_response.data]
                 if test_dates:
                     device.last_test_date = max(test_dates)
                 
+                # 平均合格率
                 pass_rates = [
                     record["pass_rate"] 
                     for record in stats_response.data 
@@ -172,11 +163,20 @@ class DeviceService:
                 ]
                 if pass_rates:
                     device.average_pass_rate = sum(pass_rates) / len(pass_rates)
+    
+    async def get_device_ratings(self, device_model: str) -> Optional[Dict[str, Any]]:
+        """获取设备额定参数（导入校验用，不含统计信息）"""
+        try:
+            response = self.db.table("devices")\
+                .select("rated_voltage, rated_current, rated_power, specifications")\
+                .eq("device_model", device_model)\
+                .limit(1)\
+                .execute()
             
-            return device
+            return response.data[0] if response.data else None
             
         except Exception as e:
-            logger.error(f"Error fetching device by model: {str(e)}")
+            logger.error(f"Error fetching device ratings: {str(e)}")
             return None
     
     async def create_device(self, device_data: DeviceCreate) -> Device:
@@ -189,6 +189,7 @@ class DeviceService:
             response = self.db.table("devices")\
                 .insert(data)\
                 .execute()
+            await stats_cache.invalidate()
             
             return Device(**response.data[0])
             
@@ -209,6 +210,7 @@ class DeviceService:
             response = self.db.table("devices")\
                 .insert(data_list)\
                 .execute()
+            await stats_cache.invalidate()
             
             return [Device(**device) for device in response.data]
             
@@ -233,6 +235,7 @@ class DeviceService:
                     .execute()
                 
                 if response.data:
+                    await stats_cache.invalidate()
                     return Device(**response.data[0])
             
             return None
@@ -252,6 +255,8 @@ class DeviceService:
                 .eq("id", str(device_id))\
                 .execute()
             
+            if response.data:
+                await stats_cache.invalidate()
             return len(response.data) > 0
             
         except Exception as e:
@@ -0,0 +1,189 @@
+"""
+数据导入流水线
+"""
+import time
+import asyncio
+from typing import Dict, Any, Optional, AsyncIterator, Callable, Awaitable, Tuple, Set
+from uuid import UUID
+from loguru import logger
+
+from app.core.config import settings
+from app.services.test_record_service import TestRecordService
+from app.utils.detail_columns import DetailColumns
+from app.utils.validation import DetailValidator, RejectionReport
+from app.utils.waveform_compression import WaveformCompressor
+
+
+# 阶段结束标记
+_DONE = object()
+
+
+class ImportPipeline:
+    """导入流水线：解析 → 校验 → 写库
+
+    各阶段通过有界异步队列衔接，队列满时上游阶段等待（背压），
+    解析、校验与多个并发写入任务同时进行，总耗时接近最慢阶段的耗时。
+    校验阶段按规则批量剔除无效行，剔除情况汇总到 report；
+    指定 compressor 时校验后再按容差压缩波形。
+    """
+
+    def __init__(
+        self,
+        record_service: TestRecordService,
+        record_id: UUID,
+        validator: Optional[DetailValidator] = None,
+        report: Optional[RejectionReport] = None,
+        compressor: Optional[WaveformCompressor] = None,
+        queue_size: Optional[int] = None,
+        writers: Optional[int] = None,
+        on_progress: Optional[Callable[[int], Awaitable[None]]] = None,
+        on_checkpoint: Optional[Callable[[int, Optional[float]], Awaitable[None]]] = None,
+        base_rows: int = 0
+    ):
+        self.record_service = record_service
+        self.record_id = record_id
+        self.validator = validator or DetailValidator()
+        self.report = report or RejectionReport()
+        self.compressor = compressor
+        self.queue_size = queue_size or settings.pipeline_queue_size
+        self.writers = writers or settings.pipeline_writers
+        self.on_progress = on_progress
+        self.on_checkpoint = on_checkpoint
+
+        # 断点：按分块序号记录连续提交的位置（写入任务并发完成，顺序不定）
+        self.committed_rows = base_rows
+        self.last_time_point: Optional[float] = None
+        self._chunk_meta: Dict[int, Tuple[int, Optional[float]]] = {}
+        self._completed: Set[int] = set()
+        self._watermark = -1
+        self._checkpoint_lock = asyncio.Lock()
+
+        self.stats = {
+            "inserted_rows": 0,
+            "failed_rows": 0,
+            "rejected_rows": 0,
+            "omitted_rows": 0,  # 波形压缩省略的行数
+            "chunks": 0,
+            "failed_chunks": 0,
+            "parse_seconds": 0.0,
+            "validate_seconds": 0.0,
+            "write_seconds": 0.0,
+            "wall_seconds": 0.0,
+            "validation": {}
+        }
+
+    async def run(self, chunks: AsyncIterator[DetailColumns]) -> Dict[str, Any]:
+        """运行流水线直到所有分块写入完成"""
+        validate_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(self._produce(chunks, validate_queue)),
+            asyncio.create_task(self._validate(validate_queue, write_queue)),
+        ] + [
+            asyncio.create_task(self._write(write_queue))
+            for _ in range(self.writers)
+        ]
+
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        self.stats["wall_seconds"] = time.perf_counter() - started
+        self.stats["validation"] = self.report.counts
+        logger.info(
+            f"Import pipeline for {self.record_id}: {self.stats['inserted_rows']} rows, "
+            f"{self.stats['rejected_rows']} rejected, "
+            f"parse {self.stats['parse_seconds']:.2f}s, "
+            f"validate {self.stats['validate_seconds']:.2f}s, "
+            f"write {self.stats['write_seconds']:.2f}s, "
+            f"wall {self.stats['wall_seconds']:.2f}s"
+        )
+        return self.stats
+
+    async def _produce(self, chunks: AsyncIterator[DetailColumns], output: asyncio.Queue):
+        """解析阶段：从解析器读取分块"""
+        iterator = chunks.__aiter__()
+        index = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                self.stats["parse_seconds"] += time.perf_counter() - started
+            
+            last_time_point = float(chunk["time_point"][-1]) if len(chunk) > 0 else None
+            self._chunk_meta[index] = (len(chunk), last_time_point)
+            await output.put((index, chunk))
+            index += 1
+
+        await output.put(_DONE)
+
+    async def _validate(self, source: asyncio.Queue, output: asyncio.Queue):
+        """校验阶段：向量化校验每个分块并剔除无效行"""
+        while True:
+            item = await source.get()
+            if item is _DONE:
+                break
+            index, chunk = item
+
+            started = time.perf_counter()
+            valid = self.validator.apply(chunk, self.report)
+            self.stats["rejected_rows"] += len(chunk) - len(valid)
+            if self.compressor is not None:
+                compressed = await asyncio.to_thread(self.compressor.apply, valid)
+                self.stats["omitted_rows"] += len(valid) - len(compressed)
+                valid = compressed
+            self.stats["validate_seconds"] += time.perf_counter() - started
+
+            await output.put((index, valid))
+
+        for _ in range(self.writers):
+            await output.put(_DONE)
+
+    async def _write(self, source: asyncio.Queue):
+        """写库阶段：多个写入任务并发消费"""
+        while True:
+            item = await source.get()
+            if item is _DONE:
+                break
+            index, chunk = item
+
+            chunk_stats = await self.record_service.create_details_bulk(self.record_id, chunk)
+            for key in ("inserted_rows", "failed_rows", "chunks", "failed_chunks", "write_seconds"):
+                self.stats[key] += chunk_stats[key]
+
+            # 失败的分块不推进断点，重试时从该分块重新开始
+            if chunk_stats["failed_chunks"] == 0:
+                self._completed.add(index)
+                await self._advance_checkpoint()
+
+            if self.on_progress is not None:
+                await self.on_progress(
+                    self.stats["inserted_rows"] + self.stats["failed_rows"]
+                    + self.stats["rejected_rows"] + self.stats["omitted_rows"]
+                )
+
+    async def _advance_checkpoint(self):
+        """推进连续已提交分块的断点"""
+        async with self._checkpoint_lock:
+            advanced = False
+            while self._watermark + 1 in self._completed:
+                self._watermark += 1
+                self._completed.remove(self._watermark)
+                # 断点按解析出的原始行数推进，校验剔除或压缩省略的行在重试时不会重新出现
+                rows, last_time_point = self._chunk_meta.pop(self._watermark)
+                self.committed_rows += rows
+                if last_time_point is not None:
+                    self.last_time_point = last_time_point
+                advanced = True
+
+            if advanced and self.on_checkpoint is not None:
+                await self.on_checkpoint(self.committed_rows, self.last_time_point)
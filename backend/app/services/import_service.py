@@ -2,23 +2,37 @@
 数据导入服务
 """
 import os
+import json
+import time
 import asyncio
-from typing import List, Optional
+from typing import List, Optional, Dict, Any, AsyncIterator, Set
 from uuid import UUID
 from datetime import datetime
 import pandas as pd
 from supabase import Client
 from loguru import logger
 
+from app.core.config import settings
+from app.core.database import db_client
+from app.core.job_queue import import_queue
+from app.core.progress_store import progress_store
+from app.core.stats_cache import stats_cache
 from app.models.import_record import (
     ImportRecord,
     ImportRecordCreate,
     ImportRecordUpdate,
     ImportProgress
 )
-from app.models.test_record import TestRecordCreate, TestDetailCreate
+from app.models.test_record import TestRecordCreate
 from app.services.test_record_service import TestRecordService
+from app.services.import_pipeline import ImportPipeline
+from app.services.device_service import DeviceService
 from app.utils.excel_parser import ExcelParser
+from app.utils.detail_columns import DetailColumns
+from app.utils.parse_cache import parse_cache, ParseCacheWriter
+from app.utils.validation import DetailValidator, RejectionReport
+from app.utils.waveform_compression import WaveformCompressor
+from app.utils.file_utils import iter_archive_members, delete_file
 
 
 class ImportService:
@@ -26,14 +40,16 @@ class ImportService:
     
     def __init__(self, db: Client):
         self.db = db
-        self.progress_cache = {}  # 简单的进度缓存
     
     async def create_import_record(
         self,
         file_name: str,
         file_size: int,
         file_path: str,
-        user_id: str
+        user_id: str,
+        import_config: Optional[Dict[str, Any]] = None,
+        content_hash: Optional[str] = None,
+        parent_id: Optional[UUID] = None
     ) -> ImportRecord:
         """创建导入记录"""
         try:
@@ -41,6 +57,9 @@ class ImportService:
                 "file_name": file_name,
                 "file_size": file_size,
                 "file_path": file_path,
+                "content_hash": content_hash,
+                "parent_id": str(parent_id) if parent_id else None,
+                "import_config": import_config,
                 "import_status": "pending",
                 "created_by": user_id,
                 "created_at": datetime.utcnow().isoformat()
@@ -98,6 +117,54 @@ class ImportService:
             logger.error(f"Error fetching import record by ID: {str(e)}")
             return None
     
+    async def get_child_imports(self, parent_id: UUID) -> List[ImportRecord]:
+        """获取压缩包导入的子导入记录"""
+        try:
+            response = self.db.table("import_records")\
+                .select("*")\
+                .eq("parent_id", str(parent_id))\
+                .order("created_at")\
+                .execute()
+            
+            return [ImportRecord(**record) for record in response.data]
+            
+        except Exception as e:
+            logger.error(f"Error fetching child imports: {str(e)}")
+            return []
+    
+    async def find_duplicate(self, content_hash: str) -> Optional[ImportRecord]:
+        """查找内容相同且未失败的导入记录"""
+        try:
+            response = self.db.table("import_records")\
+                .select("*")\
+                .eq("content_hash", content_hash)\
+                .neq("import_status", "failed")\
+                .order("created_at", desc=True)\
+                .limit(1)\
+                .execute()
+            
+            if response.data:
+                return ImportRecord(**response.data[0])
+            
+            return None
+            
+        except Exception as e:
+            logger.error(f"Error finding duplicate import: {str(e)}")
+            return None
+    
+    async def find_imported_hashes(self, content_hashes: List[str]) -> Set[str]:
+        """批量查询已导入（未失败）的文件内容哈希"""
+        imported = set()
+        unique = list(dict.fromkeys(content_hashes))
+        for start in range(0, len(unique), 200):
+            response = self.db.table("import_records")\
+                .select("content_hash")\
+                .in_("content_hash", unique[start:start + 200])\
+                .neq("import_status", "failed")\
+                .execute()
+            imported.update(record["content_hash"] for record in response.data)
+        return imported
+    
     async def update_import_status(
         self,
         import_id: UUID,
@@ -126,9 +193,173 @@ class ImportService:
             logger.error(f"Error updating import status: {str(e)}")
             return None
     
-    async def process_import(self, import_id: UUID, file_path: str):
-        """处理导入任务"""
+    async def enqueue_import(
+        self,
+        import_id: UUID,
+        file_path: str,
+        file_size: int = 0,
+        backend: Optional[str] = None
+    ) -> int:
+        """将导入任务加入持久化任务队列"""
+        options = json.dumps({"backend": backend}) if backend else None
+        return await import_queue.enqueue(str(import_id), file_path, file_size, options)
+    
+    async def enqueue_archive(
+        self,
+        import_id: UUID,
+        file_path: str,
+        backend: Optional[str] = None,
+        allow_duplicate: bool = False
+    ) -> int:
+        """将压缩包解压任务加入队列（走小文件通道，尽早产出子任务）"""
+        options = json.dumps({
+            "archive": True,
+            "backend": backend,
+            "allow_duplicate": allow_duplicate
+        })
+        return await import_queue.enqueue(str(import_id), file_path, 0, options)
+    
+    async def process_archive(
+        self,
+        import_id: UUID,
+        archive_path: str,
+        backend: Optional[str] = None,
+        allow_duplicate: bool = False
+    ):
+        """处理压缩包导入：逐个解压数据文件，每个文件作为子导入任务加入队列并行解析"""
+        try:
+            parent = await self.get_import_record_by_id(import_id)
+            if parent is None:
+                return
+            
+            await self.update_import_status(
+                import_id,
+                "processing",
+                started_at=datetime.utcnow().isoformat()
+            )
+            
+            # 子任务继承父任务的读取后端和压缩选项
+            child_config = {}
+            if backend:
+                child_config["reader_backend"] = backend
+            if (parent.import_config or {}).get("compress"):
+                child_config["compress"] = True
+            
+            # 重试时跳过已解压的成员，未成功的子任务重新排队
+            children = await self.get_child_imports(import_id)
+            extracted_hashes = {child.content_hash for child in children}
+            known_hashes = set(extracted_hashes)
+            for child in children:
+                if child.import_status in ["failed", "partial"]:
+                    await self.reset_import_status(child.id)
+                    await self.enqueue_import(child.id, child.file_path, child.file_size or 0, backend)
+            
+            # 边解压边排队，解析与解压同时进行
+            members = iter_archive_members(
+                archive_path,
+                os.path.splitext(archive_path)[0],
+                settings.allowed_extensions,
+                settings.max_upload_size
+            )
+            skipped = []
+            total = len(children)
+            while True:
+                member = await asyncio.to_thread(next, members, None)
+                if member is None:
+                    break
+                name, saved = member
+                
+                if saved is None:
+                    skipped.append({"file": name, "reason": "too_large"})
+                    continue
+                if saved.content_hash in known_hashes:
+                    # 重试时已解压过的成员直接跳过，包内重复的文件记录下来
+                    delete_file(saved.path)
+                    if saved.content_hash not in extracted_hashes:
+                        skipped.append({"file": name, "reason": "duplicate"})
+                    continue
+                if not allow_duplicate and await self.find_duplicate(saved.content_hash):
+                    delete_file(saved.path)
+                    skipped.append({"file": name, "reason": "duplicate"})
+                    continue
+                
+                child = await self.create_import_record(
+                    file_name=os.path.basename(name),
+                    file_size=saved.size,
+                    file_path=saved.path,
+                    user_id=str(parent.created_by) if parent.created_by else None,
+                    import_config=child_config or None,
+                    content_hash=saved.content_hash,
+                    parent_id=import_id
+                )
+                known_hashes.add(saved.content_hash)
+                await self.enqueue_import(child.id, saved.path, saved.size, backend)
+                total += 1
+            
+            logger.info(f"Archive import {import_id}: {total} files queued, {len(skipped)} skipped")
+            await self.update_import_status(
+                import_id,
+                "processing",
+                total_records=total,
+                import_stats={"members": total, "skipped": skipped, "extracted": True}
+            )
+            await self.refresh_archive_progress(import_id)
+            
+        except Exception as e:
+            logger.error(f"Error processing archive import: {str(e)}")
+            await self.update_import_status(
+                import_id,
+                "failed",
+                error_message=str(e),
+                completed_at=datetime.utcnow().isoformat()
+            )
+    
+    async def refresh_archive_progress(self, parent_id: UUID):
+        """汇总子导入任务状态到压缩包导入记录"""
+        try:
+            parent = await self.get_import_record_by_id(parent_id)
+            if parent is None:
+                return
+            
+            children = await self.get_child_imports(parent_id)
+            success = sum(1 for child in children if child.import_status == "completed")
+            failed = sum(1 for child in children if child.import_status in ["failed", "partial"])
+            data = {
+                "total_records": len(children),
+                "success_records": success,
+                "failed_records": failed
+            }
+            
+            # 解压完成且所有子任务结束后确定最终状态
+            status = "processing"
+            if (parent.import_stats or {}).get("extracted") and success + failed == len(children):
+                if failed == 0:
+                    status = "completed"
+                else:
+                    status = "failed" if success == 0 else "partial"
+                data["completed_at"] = datetime.utcnow().isoformat()
+            
+            await self.update_import_status(parent_id, status, **data)
+            
+        except Exception as e:
+            logger.error(f"Error refreshing archive progress: {str(e)}")
+    
+    async def process_import(
+        self,
+        import_id: UUID,
+        file_path: str,
+        backend: Optional[str] = None
+    ):
+        """处理导入任务（存在断点时从断点继续）"""
+        record_service = TestRecordService(self.db)
+        rollup_days = set()  # 本次导入写入的记录日期，结束时统一刷新每日汇总
         try:
+            # 读取断点（重试或工作进程重启后继续写入，不重复已提交的数据）
+            import_record = await self.get_import_record_by_id(import_id)
+            checkpoint = (import_record.checkpoint if import_record else None) or {}
+            import_config = (import_record.import_config if import_record else None) or {}
+            compress = bool(import_config.get("compress"))
+            
             # 更新状态为处理中
             await self.update_import_status(
                 import_id,
@@ -137,25 +368,38 @@ class ImportService:
             )
             
             # 更新进度
-            self.progress_cache[str(import_id)] = ImportProgress(
-                import_id=import_id,
-                status="processing",
-                progress=0,
-                message="开始解析文件..."
-            )
+            await self._set_progress(import_id, "processing", 0, message="开始解析文件...")
             
-            # 解析Excel文件
+            # 解析Excel文件（相同内容命中解析缓存；大文件使用流式解析，内存占用恒定）
+            parse_started = time.perf_counter()
             parser = ExcelParser()
-            parse_result = await parser.parse_file(file_path)
+            content_hash = import_record.content_hash if import_record else None
+            cached = None
+            if content_hash and settings.parse_cache_enabled:
+                cached = await asyncio.to_thread(parse_cache.get, content_hash)
+            
+            if cached is not None:
+                parse_result = parser.parse_cached(file_path, cached)
+            elif self._should_stream(file_path):
+                parse_result = await asyncio.to_thread(
+                    parser.parse_file_streaming, file_path,
+                    backend=backend, header=import_config.get("header")
+                )
+            else:
+                parse_result = await parser.parse_file(file_path, backend=backend)
+            streaming = parse_result.get("streaming", False)
+            parse_seconds = time.perf_counter() - parse_started
             
             if not parse_result["success"]:
                 # 解析失败
+                error_message = parse_result.get("error", "文件解析失败")
                 await self.update_import_status(
                     import_id,
                     "failed",
-                    error_message=parse_result.get("error", "文件解析失败"),
+                    error_message=error_message,
                     completed_at=datetime.utcnow().isoformat()
                 )
+                await self._set_progress(import_id, "failed", 0, message=error_message)
                 return
             
             # 获取解析的数据
@@ -163,94 +407,303 @@ class ImportService:
             details_data = parse_result["details"]
             total_records = len(records_data)
             
+            # 缓存完整解析结果（流式解析在写入过程中逐块缓存）
+            if content_hash and settings.parse_cache_enabled and cached is None and not streaming:
+                details = details_data.get("temp_id")
+                if details is not None and total_records == 1:
+                    await asyncio.to_thread(
+                        parse_cache.put, content_hash, details, parser.content_summary(records_data[0])
+                    )
+            
             # 更新进度
-            self.progress_cache[str(import_id)] = ImportProgress(
-                import_id=import_id,
-                status="processing",
-                progress=20,
-                total_records=total_records,
-                message=f"已解析 {total_records} 条记录，开始导入..."
+            await self._set_progress(
+                import_id,
+                "processing",
+                20,
+                message=f"已解析 {total_records} 条记录，开始导入...",
+                total_records=total_records
             )
             
-            # 创建测试记录服务
-            record_service = TestRecordService(self.db)
+            device_service = DeviceService(self.db)
+            device_ratings: Dict[str, Optional[Dict[str, Any]]] = {}
+            report = RejectionReport()
+            compression = WaveformCompressor({})  # 整个导入的压缩行数合计（各记录的容差见其 raw_data）
             
             success_count = 0
             failed_count = 0
+            write_stats = {
+                "inserted_rows": 0,
+                "failed_rows": 0,
+                "rejected_rows": 0,
+                "omitted_rows": 0,
+                "chunks": 0,
+                "failed_chunks": 0,
+                "parse_seconds": 0.0,
+                "validate_seconds": 0.0,
+                "write_seconds": 0.0,
+                "wall_seconds": 0.0
+            }
             
-            # 批量导入记录
-            for i, record_data in enumerate(records_data):
-                try:
-                    # 创建测试记录
-                    record = TestRecordCreate(**record_data)
-                    new_record = await record_service.create_record(
-                        record,
-                        user_id=str(import_id)  # 临时使用import_id作为用户ID
+            # 按批次创建测试记录
+            chunk_size = settings.record_insert_chunk_size
+            for batch_start in range(0, total_records, chunk_size):
+                batch = records_data[batch_start:batch_start + chunk_size]
+                
+                # 断点中已创建的测试记录直接复用
+                resumed = None
+                if batch_start == 0 and checkpoint.get("record_id"):
+                    resumed = await record_service.get_record_by_id(
+                        UUID(checkpoint["record_id"]), include_details=False
                     )
-                    
-                    # 导入详细数据
-                    if str(new_record.id) in details_data:
-                        details = [
-                            TestDetailCreate(
-                                test_record_id=new_record.id,
-                                **detail
+                    if resumed is None:
+                        checkpoint = {}
+                
+                try:
+                    new_records = [resumed] if resumed else []
+                    to_create = batch[1:] if resumed else batch
+                    if to_create:
+                        new_records += await record_service.create_records_batch(
+                            [TestRecordCreate(**record_data) for record_data in to_create],
+                            user_id=str(import_id),  # 临时使用import_id作为用户ID
+                            refresh_rollups=False
+                        )
+                    rollup_days |= record_service.rollups.days_of(new_records)
+                except Exception as e:
+                    logger.error(f"Error importing record batch: {str(e)}")
+                    failed_count += len(batch)
+                    continue
+                
+                for new_record in new_records:
+                    # 导入详细数据（解析器以临时ID关联详情，经流水线校验并发写入）
+                    details = details_data.get("temp_id")
+                    if details is not None:
+                        skip_rows = 0
+                        if new_record is resumed:
+                            # 清除断点之后未确认提交的数据，再跳过已提交的行
+                            skip_rows = checkpoint.get("committed_rows", 0)
+                            await record_service.delete_details(
+                                new_record.id,
+                                after_time_point=checkpoint.get("last_time_point") if skip_rows else None
+                            )
+                            logger.info(f"Resuming import {import_id} at row {skip_rows}")
+                        else:
+                            await self._save_checkpoint(import_id, new_record.id, 0, None)
+                        
+                        async def on_checkpoint(committed_rows, last_time_point, record_id=new_record.id):
+                            await self._save_checkpoint(import_id, record_id, committed_rows, last_time_point)
+                        
+                        # 写入过程中按行数汇报进度（进度存储按时间节流）
+                        total_rows = None if streaming else len(details)
+                        
+                        async def on_progress(rows, done=success_count, base=skip_rows, total_rows=total_rows):
+                            rows += base
+                            fraction = min(rows / total_rows, 1) if total_rows else 0
+                            await self._set_progress(
+                                import_id,
+                                "processing",
+                                20 + (done + fraction) / total_records * 70,
+                                message=f"已写入 {rows} 行详细数据...",
+                                current_record=done,
+                                total_records=total_records
+                            )
+                        
+                        # 按设备额定值校验，无效行在写库前剔除
+                        device_model = new_record.device_model
+                        if device_model and device_model not in device_ratings:
+                            device_ratings[device_model] = await device_service.get_device_ratings(device_model)
+                        
+                        # 指定压缩时按设备容差只保留重建波形所需的采样点
+                        compressor = None
+                        if compress:
+                            compressor = WaveformCompressor.for_device(device_ratings.get(device_model))
+                        
+                        pipeline = ImportPipeline(
+                            record_service,
+                            new_record.id,
+                            DetailValidator.for_device(device_ratings.get(device_model)),
+                            report,
+                            compressor=compressor,
+                            on_progress=on_progress,
+                            on_checkpoint=on_checkpoint,
+                            base_rows=skip_rows
+                        )
+                        cache_writer = None
+                        if streaming and content_hash and settings.parse_cache_enabled and skip_rows == 0:
+                            cache_writer = parse_cache.writer(content_hash)
+                        try:
+                            pipeline_stats = await pipeline.run(
+                                self._iter_detail_chunks(details, streaming, skip_rows, cache_writer)
                             )
-                            for detail in details_data[str(new_record.id)]
-                        ]
-                        await record_service.create_details(details)
+                        except Exception:
+                            if cache_writer is not None:
+                                cache_writer.abort()
+                            raise
+                        for key in write_stats:
+                            write_stats[key] += pipeline_stats[key]
+                        
+                        # 流式解析完成后回填采样点数和合格率；压缩时记录容差与压缩前后的行数
+                        sample_count = details.row_count if streaming else new_record.sample_count
+                        raw_data = None
+                        if compressor is not None:
+                            compression.input_rows += compressor.input_rows
+                            compression.kept_rows += compressor.kept_rows
+                            raw_data = dict(new_record.raw_data or {})
+                            raw_data["compression"] = compressor.summary()
+                        if streaming or raw_data is not None:
+                            await record_service.update_record_summary(
+                                new_record.id,
+                                sample_count=sample_count,
+                                pass_rate=details.pass_rate if streaming else new_record.pass_rate,
+                                raw_data=raw_data,
+                                refresh_rollups=False
+                            )
+                        
+                        if cache_writer is not None:
+                            summary = parser.content_summary(records_data[0])
+                            summary.update(sample_count=details.row_count, pass_rate=details.pass_rate)
+                            await asyncio.to_thread(cache_writer.commit, summary)
                     
                     success_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error importing record: {str(e)}")
-                    failed_count += 1
                 
                 # 更新进度
-                progress = 20 + (i + 1) / total_records * 70
-                self.progress_cache[str(import_id)] = ImportProgress(
-                    import_id=import_id,
-                    status="processing",
-                    progress=progress,
-                    current_record=i + 1,
-                    total_records=total_records,
-                    message=f"正在导入第 {i + 1}/{total_records} 条记录..."
+                done = min(batch_start + chunk_size, total_records)
+                await self._set_progress(
+                    import_id,
+                    "processing",
+                    20 + done / total_records * 70,
+                    message=f"正在导入第 {done}/{total_records} 条记录...",
+                    current_record=done,
+                    total_records=total_records
                 )
             
+            # 统计写入吞吐（流水线各阶段并行，吞吐按端到端耗时计算）
+            import_stats = {
+                **{key: round(value, 3) if isinstance(value, float) else value
+                   for key, value in write_stats.items()},
+                "parse_seconds": round(parse_seconds + write_stats["parse_seconds"], 3),
+                "validation": report.counts,
+                "rows_per_second": round(
+                    write_stats["inserted_rows"] / write_stats["wall_seconds"], 1
+                ) if write_stats["wall_seconds"] > 0 else 0
+            }
+            if compress:
+                import_stats["compression"] = compression.summary()
+            logger.info(
+                f"Import {import_id}: {write_stats['inserted_rows']} detail rows in "
+                f"{import_stats['wall_seconds']}s ({import_stats['rows_per_second']} rows/s), "
+                f"{write_stats['failed_chunks']} failed chunks, {write_stats['rejected_rows']} rejected rows"
+            )
+            
+            # 刷新本次导入涉及日期的每日汇总，并使统计缓存失效
+            await record_service.rollups.refresh_days(rollup_days)
+            await stats_cache.invalidate()
+            
             # 更新最终状态
-            final_status = "completed" if failed_count == 0 else "partial"
+            final_status = "completed" \
+                if failed_count == 0 and write_stats["failed_rows"] == 0 else "partial"
             await self.update_import_status(
                 import_id,
                 final_status,
                 total_records=total_records,
                 success_records=success_count,
                 failed_records=failed_count,
+                import_stats=import_stats,
+                rejection_report=report.to_dict(),
                 completed_at=datetime.utcnow().isoformat()
             )
             
-            # 更新进度缓存
-            self.progress_cache[str(import_id)] = ImportProgress(
-                import_id=import_id,
-                status=final_status,
-                progress=100,
+            # 更新进度
+            await self._set_progress(
+                import_id,
+                final_status,
+                100,
+                message=f"导入完成：成功 {success_count} 条，失败 {failed_count} 条",
                 current_record=total_records,
-                total_records=total_records,
-                message=f"导入完成：成功 {success_count} 条，失败 {failed_count} 条"
+                total_records=total_records
             )
             
         except Exception as e:
             logger.error(f"Error processing import: {str(e)}")
+            # 已创建的记录同样计入汇总
+            await record_service.rollups.refresh_days(rollup_days)
+            if rollup_days:
+                await stats_cache.invalidate()
             await self.update_import_status(
                 import_id,
                 "failed",
                 error_message=str(e),
                 completed_at=datetime.utcnow().isoformat()
             )
+            await self._set_progress(import_id, "failed", 0, message=str(e))
+    
+    async def _set_progress(
+        self,
+        import_id: UUID,
+        status: str,
+        progress: float,
+        message: Optional[str] = None,
+        current_record: int = 0,
+        total_records: int = 0
+    ):
+        """写入导入进度（共享存储，节流后推送给订阅的客户端）"""
+        await progress_store.set(import_id, {
+            "import_id": str(import_id),
+            "status": status,
+            "progress": round(min(progress, 100), 1),
+            "current_record": current_record,
+            "total_records": total_records,
+            "message": message
+        })
+    
+    async def _iter_detail_chunks(
+        self,
+        details,
+        streaming: bool,
+        skip_rows: int = 0,
+        cache_writer: Optional[ParseCacheWriter] = None
+    ) -> AsyncIterator[DetailColumns]:
+        """按块产出详情数据（流式解析时在线程中读取），跳过已提交的行"""
+        if streaming:
+            async for chunk in details.aiter_chunks(skip_rows):
+                if cache_writer is not None:
+                    cache_writer.append(chunk)
+                yield chunk
+        else:
+            for chunk in details.slice(skip_rows).iter_chunks(settings.parse_chunk_size):
+                yield chunk
+    
+    async def _save_checkpoint(
+        self,
+        import_id: UUID,
+        record_id: UUID,
+        committed_rows: int,
+        last_time_point: Optional[float]
+    ):
+        """保存导入断点"""
+        await self.update_import_status(
+            import_id,
+            "processing",
+            checkpoint={
+                "record_id": str(record_id),
+                "committed_rows": committed_rows,
+                "last_time_point": last_time_point,
+                "updated_at": datetime.utcnow().isoformat()
+            }
+        )
+    
+    def _should_stream(self, file_path: str) -> bool:
+        """是否使用流式解析"""
+        try:
+            return os.path.getsize(file_path) >= settings.streaming_parse_threshold
+        except OSError:
+            return False
     
     async def get_import_progress(self, import_id: UUID) -> Optional[ImportProgress]:
         """获取导入进度"""
-        # 先从缓存获取
-        if str(import_id) in self.progress_cache:
-            return self.progress_cache[str(import_id)]
+        # 先从进度存储获取（任意工作进程写入的进度）
+        progress = await progress_store.get(import_id)
+        if progress is not None:
+            return ImportProgress(**progress)
         
         # 从数据库获取
         record = await self.get_import_record_by_id(import_id)
@@ -274,7 +727,7 @@ class ImportService:
         return None
     
     async def reset_import_status(self, import_id: UUID) -> Optional[ImportRecord]:
-        """重置导入状态"""
+        """重置导入状态（保留断点，重新处理时从断点继续）"""
         return await self.update_import_status(
             import_id,
             "pending",
@@ -294,7 +747,10 @@ class ImportService:
             if not record:
                 return False
             
-            # 删除文件
+            # 删除文件（压缩包导入同时删除解压出的文件，子记录随父记录级联删除）
+            children = await self.get_child_imports(import_id)
+            for child in children:
+                delete_file(child.file_path)
             if record.file_path and os.path.exists(record.file_path):
                 try:
                     os.remove(record.file_path)
@@ -307,12 +763,55 @@ class ImportService:
                 .eq("id", str(import_id))\
                 .execute()
             
-            # 清理进度缓存
-            if str(import_id) in self.progress_cache:
-                del self.progress_cache[str(import_id)]
+            # 清理解析缓存和进度
+            for content_hash in {item.content_hash for item in [record, *children] if item.content_hash}:
+                await asyncio.to_thread(parse_cache.delete, content_hash)
+            await progress_store.delete(import_id)
             
             return True
             
         except Exception as e:
             logger.error(f"Error deleting import record: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+
+async def run_import_job(job: Dict[str, Any]):
+    """导入任务队列处理函数"""
+    options = json.loads(job["options"]) if job.get("options") else {}
+    import_id = UUID(job["import_id"])
+    service = ImportService(db_client.client)
+    if options.get("archive"):
+        await service.process_archive(
+            import_id,
+            job["file_path"],
+            options.get("backend"),
+            options.get("allow_duplicate", False)
+        )
+        return
+    
+    await service.process_import(
+        import_id,
+        job["file_path"],
+        options.get("backend")
+    )
+    
+    # 子导入任务结束后汇总所属压缩包的进度
+    record = await service.get_import_record_by_id(import_id)
+    if record and record.parent_id:
+        await service.refresh_archive_progress(record.parent_id)
+
+
+async def fail_import_job(job: Dict[str, Any]):
+    """导入任务多次中断被放弃时，将导入记录标记为失败"""
+    import_id = UUID(job["import_id"])
+    service = ImportService(db_client.client)
+    await service.update_import_status(
+        import_id,
+        "failed",
+        error_message=job["error"],
+        completed_at=datetime.utcnow().isoformat()
+    )
+    
+    record = await service.get_import_record_by_id(import_id)
+    if record and record.parent_id:
+        await service.refresh_archive_progress(record.parent_id)
@@ -0,0 +1,138 @@
+"""
+每日统计汇总服务
+"""
+import asyncio
+from typing import List, Optional, Dict, Any, Iterable, Set, Callable, Hashable
+from datetime import date, datetime
+from supabase import Client
+from loguru import logger
+
+from app.core.config import settings
+
+
+# 汇总的记录级指标（每项保存非空数、和、平方和）
+ROLLUP_METRICS = ("pass_rate", "voltage", "current", "power")
+
+# 可累加的汇总列
+_SUM_COLUMNS = ("record_count", "pass_count", "fail_count") + tuple(
+    f"{metric}_{suffix}" for metric in ROLLUP_METRICS for suffix in ("count", "sum", "sum_sq")
+)
+
+
+class RollupService:
+    """每日统计汇总服务
+
+    test_record_rollups 按 日期 × 设备型号 × 批次号 保存记录数、合格数以及各指标的和与平方和，
+    测试记录写入、更新、删除后由数据库函数 refresh_test_record_rollups 重算受影响日期的汇总；
+    统计查询只读取汇总行，一年的趋势只需读取几百行。
+    """
+
+    def __init__(self, db: Client):
+        self.db = db
+
+    @staticmethod
+    def days_of(records: Iterable[Any]) -> Set[date]:
+        """测试记录（模型或字典）所在的日期"""
+        days = set()
+        for record in records:
+            test_date = record.get("test_date") if isinstance(record, dict) else getattr(record, "test_date", None)
+            if isinstance(test_date, str):
+                test_date = datetime.fromisoformat(test_date)
+            if isinstance(test_date, datetime):
+                days.add(test_date.date())
+            elif isinstance(test_date, date):
+                days.add(test_date)
+        return days
+
+    async def refresh_days(self, days: Iterable[date]) -> int:
+        """重算指定日期的汇总，返回写入的汇总行数（失败只记录日志，可用 rebuild-rollups 修复）"""
+        days = sorted(set(days))
+        if not days:
+            return 0
+        try:
+            query = self.db.rpc("refresh_test_record_rollups", {
+                "p_days": [day.isoformat() for day in days]
+            })
+            response = await asyncio.to_thread(query.execute)
+            return response.data or 0
+        except Exception as e:
+            logger.error(f"Error refreshing rollups for {len(days)} days: {str(e)}")
+            return 0
+
+    async def refresh_records(self, records: Iterable[Any]) -> int:
+        """重算测试记录所在日期的汇总"""
+        return await self.refresh_days(self.days_of(records))
+
+    async def rebuild(self) -> int:
+        """全量重建汇总，返回写入的汇总行数"""
+        try:
+            query = self.db.rpc("refresh_test_record_rollups", {"p_days": None})
+            response = await asyncio.to_thread(query.execute)
+            return response.data or 0
+        except Exception as e:
+            logger.error(f"Error rebuilding rollups: {str(e)}")
+            raise
+
+    async def get_rollups(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        device_model: Optional[str] = None,
+        device_models: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """读取汇总行（日期闭区间，按主键顺序分页读取）"""
+        page_size = settings.rollup_page_size
+        rows: List[Dict[str, Any]] = []
+        while True:
+            query = self.db.table("test_record_rollups").select("*")
+            if start_date:
+                query = query.gte("test_day", start_date.isoformat())
+            if end_date:
+                query = query.lte("test_day", end_date.isoformat())
+            if device_model:
+                query = query.eq("device_model", device_model)
+            if device_models is not None:
+                query = query.in_("device_model", device_models)
+            query = query.order("test_day").order("device_model").order("batch_number")\
+                .range(len(rows), len(rows) + page_size - 1)
+
+            response = await asyncio.to_thread(query.execute)
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+
+    @staticmethod
+    def combine(
+        rows: Iterable[Dict[str, Any]],
+        key: Callable[[Dict[str, Any]], Hashable]
+    ) -> Dict[Hashable, Dict[str, Any]]:
+        """按 key 合并汇总行：累加计数与和，取最后测试时间的最大值"""
+        groups: Dict[Hashable, Dict[str, Any]] = {}
+        for row in rows:
+            group_key = key(row)
+            group = groups.get(group_key)
+            if group is None:
+                group = groups[group_key] = {column: 0 for column in _SUM_COLUMNS}
+                group["last_test_date"] = None
+            for column in _SUM_COLUMNS:
+                group[column] += row.get(column) or 0
+            last = row.get("last_test_date")
+            if last and (group["last_test_date"] is None or last > group["last_test_date"]):
+                group["last_test_date"] = last
+        return groups
+
+    @staticmethod
+    def mean(group: Dict[str, Any], metric: str) -> Optional[float]:
+        """指标平均值（没有非空值时返回 None）"""
+        count = group[f"{metric}_count"]
+        return group[f"{metric}_sum"] / count if count else None
+
+    @staticmethod
+    def std(group: Dict[str, Any], metric: str) -> Optional[float]:
+        """指标总体标准差（没有非空值时返回 None）"""
+        count = group[f"{metric}_count"]
+        if not count:
+            return None
+        mean = group[f"{metric}_sum"] / count
+        return max(group[f"{metric}_sum_sq"] / count - mean * mean, 0.0) ** 0.5
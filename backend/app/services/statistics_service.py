@@ -1,14 +1,34 @@
 """
 统计分析服务
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Callable, Sequence, AsyncIterator
 from datetime import datetime, date, timedelta
 import json
+import numpy as np
 import pandas as pd
 from supabase import Client
 from loguru import logger
 
+from app.core.config import settings
+from app.core.keyset_fetch import KeysetFetcher, RowBudgetExceeded
+from app.core.stats_cache import stats_cache
 from app.models.test_record import TestRecordStatistics
+from app.services.rollup_service import RollupService
+from app.utils.record_frame import RecordFrame, MetricAccumulator, GroupAccumulator
+
+
+# 统计摘要中日趋势的天数
+_TREND_DAYS = 30
+
+# 合格率不低于该值的记录视为合格
+_PASS_THRESHOLD = 95
+
+# 设备对比指标 → 记录列
+_COMPARISON_METRICS = {
+    "pass_rate": "pass_rate",
+    "avg_voltage": "voltage",
+    "avg_current": "current",
+}
 
 
 class StatisticsService:
@@ -16,136 +36,244 @@ class StatisticsService:
     
     def __init__(self, db: Client):
         self.db = db
+        self.rollups = RollupService(db)
     
+    @stats_cache.cached(TestRecordStatistics)
     async def get_summary_statistics(
         self,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None,
         device_model: Optional[str] = None
     ) -> TestRecordStatistics:
-        """获取统计摘要"""
+        """获取统计摘要
+        
+        优先读取每日汇总表；汇总不可用时调用数据库聚合函数 test_record_summary，
+        只传输聚合结果；函数也不可用时退化为读取记录在本地统计
+        """
         try:
-            # 基础查询
-            query = self.db.table("test_records").select("*").eq("is_deleted", False)
+            today = datetime.now().date()
+            if settings.statistics_use_rollups:
+                try:
+                    return await self._get_summary_from_rollups(start_date, end_date, device_model, today)
+                except Exception as e:
+                    logger.warning(f"Rollups unavailable for summary statistics: {str(e)}")
+            
+            try:
+                return await self._get_summary_from_database(start_date, end_date, device_model, today)
+            except Exception as e:
+                logger.warning(f"Summary aggregation function unavailable, aggregating locally: {str(e)}")
             
-            # 应用过滤条件
+            return await self._get_summary_from_records(start_date, end_date, device_model, today)
+            
+        except Exception as e:
+            logger.error(f"Error getting summary statistics: {str(e)}")
+            raise
+    
+    async def _get_summary_from_rollups(
+        self,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        device_model: Optional[str],
+        today: date
+    ) -> TestRecordStatistics:
+        """由每日汇总计算统计摘要（日期区间按整天计算）"""
+        rows = await self.rollups.get_rollups(start_date, end_date, device_model)
+        
+        stats = TestRecordStatistics()
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+        
+        pass_rate_sum = 0.0
+        pass_rate_count = 0
+        daily = RollupService.combine(rows, lambda row: date.fromisoformat(row["test_day"]))
+        for day, group in daily.items():
+            stats.total_count += group["record_count"]
+            stats.pass_count += group["pass_count"]
+            stats.fail_count += group["fail_count"]
+            if day == today:
+                stats.today_count += group["record_count"]
+            if day >= week_start:
+                stats.week_count += group["record_count"]
+            if day >= month_start:
+                stats.month_count += group["record_count"]
+            pass_rate_sum += group["pass_rate_sum"]
+            pass_rate_count += group["pass_rate_count"]
+        
+        if pass_rate_count:
+            stats.average_pass_rate = pass_rate_sum / pass_rate_count
+        
+        devices = RollupService.combine(rows, lambda row: row["device_model"])
+        stats.device_distribution = {
+            model: group["record_count"] for model, group in devices.items() if model
+        }
+        
+        stats.daily_trend = await self._get_daily_trend_from_rollups(_TREND_DAYS, device_model)
+        return stats
+    
+    async def _get_summary_from_database(
+        self,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        device_model: Optional[str],
+        today: date
+    ) -> TestRecordStatistics:
+        """由数据库聚合函数计算统计摘要（汇总、设备分布、日趋势一次查询）"""
+        response = self.db.rpc("test_record_summary", {
+            "p_start_date": start_date.isoformat() if start_date else None,
+            "p_end_date": end_date.isoformat() if end_date else None,
+            "p_device_model": device_model,
+            "p_today": today.isoformat(),
+            "p_trend_days": _TREND_DAYS
+        }).execute()
+        
+        stats = TestRecordStatistics()
+        daily_data = {}
+        for row in response.data or []:
+            if row["grouping_set"] == "total":
+                stats.total_count = row["record_count"]
+                stats.today_count = row["today_count"]
+                stats.week_count = row["week_count"]
+                stats.month_count = row["month_count"]
+                stats.pass_count = row["pass_count"]
+                stats.fail_count = row["fail_count"]
+                if row["average_pass_rate"] is not None:
+                    stats.average_pass_rate = row["average_pass_rate"]
+            elif row["grouping_set"] == "device":
+                stats.device_distribution[row["device_model"]] = row["record_count"]
+            elif row["grouping_set"] == "day":
+                daily_data[date.fromisoformat(row["test_day"])] = (row["trend_count"], row["trend_pass_rate"])
+        
+        stats.daily_trend = self._build_daily_trend(
+            daily_data, today - timedelta(days=_TREND_DAYS), today
+        )
+        return stats
+    
+    async def _get_summary_from_records(
+        self,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        device_model: Optional[str],
+        today: date
+    ) -> TestRecordStatistics:
+        """读取记录在本地计算统计摘要（逐页累加）"""
+        def where(query):
+            query = query.eq("is_deleted", False)
             if start_date:
                 query = query.gte("test_date", start_date.isoformat())
             if end_date:
                 query = query.lte("test_date", end_date.isoformat())
             if device_model:
                 query = query.eq("device_model", device_model)
-            
-            response = query.execute()
-            records = response.data
-            
-            # 计算统计数据
-            stats = TestRecordStatistics()
-            stats.total_count = len(records)
+            return query
+        
+        stats = TestRecordStatistics()
+        week_start = np.datetime64(today - timedelta(days=today.weekday()))
+        month_start = np.datetime64(today.replace(day=1))
+        pass_rates = MetricAccumulator()
+        
+        # 只取统计需要的列
+        async for frame in self._iter_frames("test_date, pass_rate, device_model", where, ("pass_rate",)):
+            stats.total_count += len(frame)
             
             # 今日、本周、本月统计
-            today = datetime.now().date()
-            week_start = today - timedelta(days=today.weekday())
-            month_start = today.replace(day=1)
-            
-            for record in records:
-                test_date = datetime.fromisoformat(record["test_date"]).date()
-                
-                if test_date == today:
-                    stats.today_count += 1
-                if test_date >= week_start:
-                    stats.week_count += 1
-                if test_date >= month_start:
-                    stats.month_count += 1
-                
-                # 合格率统计
-                if record.get("pass_rate") is not None:
-                    if record["pass_rate"] >= 95:  # 假设95%以上为合格
-                        stats.pass_count += 1
-                    else:
-                        stats.fail_count += 1
-                
-                # 设备分布
-                if record.get("device_model"):
-                    model = record["device_model"]
-                    stats.device_distribution[model] = stats.device_distribution.get(model, 0) + 1
-            
-            # 计算平均合格率
-            pass_rates = [r["pass_rate"] for r in records if r.get("pass_rate") is not None]
-            if pass_rates:
-                stats.average_pass_rate = sum(pass_rates) / len(pass_rates)
-            
-            # 获取日趋势数据（最近30天）
-            stats.daily_trend = await self._get_daily_trend(30, device_model)
-            
-            return stats
-            
-        except Exception as e:
-            logger.error(f"Error getting summary statistics: {str(e)}")
-            raise
+            day = frame.day
+            stats.today_count += int(np.count_nonzero(day == np.datetime64(today)))
+            stats.week_count += int(np.count_nonzero(day >= week_start))
+            stats.month_count += int(np.count_nonzero(day >= month_start))
+            
+            # 合格率统计（95%以上为合格，缺失合格率的记录不计入）
+            pass_rate = frame["pass_rate"]
+            stats.pass_count += int(np.count_nonzero(pass_rate >= _PASS_THRESHOLD))
+            stats.fail_count += int(np.count_nonzero(pass_rate < _PASS_THRESHOLD))
+            pass_rates.add(pass_rate)
+            
+            # 设备分布
+            for model, count in frame.device_counts().items():
+                stats.device_distribution[model] = stats.device_distribution.get(model, 0) + count
+        
+        if pass_rates.mean is not None:
+            stats.average_pass_rate = pass_rates.mean
+        
+        # 获取日趋势数据（最近30天）
+        stats.daily_trend = await self._get_daily_trend(_TREND_DAYS, device_model)
+        
+        return stats
     
+    @stats_cache.cached()
     async def get_trends_data(
         self,
         period: str = "day",
         days: int = 30,
         device_model: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """获取趋势数据"""
+        """获取趋势数据（按日、周、月统计时读取每日汇总）"""
         try:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
-            query = self.db.table("test_records")\
-                .select("test_date, pass_rate")\
-                .gte("test_date", start_date.isoformat())\
-                .eq("is_deleted", False)
-            
-            if device_model:
-                query = query.eq("device_model", device_model)
-            
-            response = query.execute()
-            records = response.data
-            
-            # 转换为DataFrame进行分组统计
-            if not records:
-                return []
-            
-            df = pd.DataFrame(records)
-            df['test_date'] = pd.to_datetime(df['test_date'])
-            
-            # 根据周期分组
-            if period == "hour":
-                df['period'] = df['test_date'].dt.floor('H')
-            elif period == "day":
-                df['period'] = df['test_date'].dt.date
-            elif period == "week":
-                df['period'] = df['test_date'].dt.to_period('W').apply(lambda r: r.start_time)
-            elif period == "month":
-                df['period'] = df['test_date'].dt.to_period('M').apply(lambda r: r.start_time)
-            
-            # 分组统计
-            grouped = df.groupby('period').agg({
-                'test_date': 'count',
-                'pass_rate': 'mean'
-            }).reset_index()
-            
-            grouped.columns = ['period', 'count', 'average_pass_rate']
-            
-            # 转换为字典列表
-            result = []
-            for _, row in grouped.iterrows():
-                result.append({
-                    'period': row['period'].isoformat() if hasattr(row['period'], 'isoformat') else str(row['period']),
-                    'count': int(row['count']),
-                    'average_pass_rate': float(row['average_pass_rate']) if pd.notna(row['average_pass_rate']) else 0
-                })
-            
-            return result
+            if settings.statistics_use_rollups and period != "hour":
+                try:
+                    return await self._get_trends_from_rollups(period, start_date.date(), device_model)
+                except Exception as e:
+                    logger.warning(f"Rollups unavailable for trends data: {str(e)}")
+            
+            def where(query):
+                query = query.gte("test_date", start_date.isoformat()).eq("is_deleted", False)
+                if device_model:
+                    query = query.eq("device_model", device_model)
+                return query
+            
+            # 按周期分组（日期显示为日期，其余周期显示为周期起始时间）
+            groups = GroupAccumulator()
+            async for frame in self._iter_frames("test_date, pass_rate", where, ("pass_rate",)):
+                keys = frame.floor(period)
+                if period != "day":
+                    keys = keys.astype("datetime64[s]")
+                groups.add(frame, keys, "pass_rate")
+            
+            return [
+                {
+                    'period': key.isoformat(),
+                    'count': count,
+                    'average_pass_rate': mean if mean is not None else 0
+                }
+                for key, count, mean in groups.items()
+            ]
             
         except Exception as e:
             logger.error(f"Error getting trends data: {str(e)}")
             raise
     
+    async def _get_trends_from_rollups(
+        self,
+        period: str,
+        start_date: date,
+        device_model: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """由每日汇总按日、周、月分组统计趋势"""
+        rows = await self.rollups.get_rollups(start_date, None, device_model)
+        
+        def period_of(row: Dict[str, Any]) -> str:
+            day = date.fromisoformat(row["test_day"])
+            if period == "day":
+                return day.isoformat()
+            if period == "week":
+                day -= timedelta(days=day.weekday())
+            else:
+                day = day.replace(day=1)
+            return datetime.combine(day, datetime.min.time()).isoformat()
+        
+        groups = RollupService.combine(rows, period_of)
+        return [
+            {
+                "period": key,
+                "count": group["record_count"],
+                "average_pass_rate": RollupService.mean(group, "pass_rate") or 0
+            }
+            for key, group in sorted(groups.items())
+        ]
+    
+    @stats_cache.cached()
     async def get_distribution_data(
         self,
         metric: str = "voltage",
@@ -156,33 +284,29 @@ class StatisticsService:
     ) -> List[Dict[str, Any]]:
         """获取数据分布"""
         try:
-            query = self.db.table("test_records")\
-                .select(f"{metric}")\
-                .eq("is_deleted", False)\
-                .not_.is_(metric, "null")
-            
-            if start_date:
-                query = query.gte("test_date", start_date.isoformat())
-            if end_date:
-                query = query.lte("test_date", end_date.isoformat())
-            if device_model:
-                query = query.eq("device_model", device_model)
-            
-            response = query.execute()
-            
-            if not response.data:
-                return []
-            
-            # 提取数值
-            values = [r[metric] for r in response.data if r.get(metric) is not None]
-            
-            if not values:
+            def where(query):
+                query = query.eq("is_deleted", False).not_.is_(metric, "null")
+                if start_date:
+                    query = query.gte("test_date", start_date.isoformat())
+                if end_date:
+                    query = query.lte("test_date", end_date.isoformat())
+                if device_model:
+                    query = query.eq("device_model", device_model)
+                return query
+            
+            # 逐页只保留指标数组，分箱需要全部数值的范围
+            parts = []
+            async for frame in self._iter_frames(metric, where, (metric,)):
+                values = frame[metric]
+                parts.append(values[~np.isnan(values)])
+            
+            values = np.concatenate(parts) if parts else np.empty(0)
+            if not len(values):
                 return []
             
             # 计算直方图
-            df = pd.DataFrame({metric: values})
-            hist, bin_edges = pd.cut(df[metric], bins=bins, retbins=True)
-            value_counts = hist.value_counts().sort_index()
+            hist, bin_edges = pd.cut(values, bins=bins, retbins=True)
+            value_counts = pd.Series(hist).value_counts().sort_index()
             
             # 构建结果
             result = []
@@ -224,27 +348,18 @@ class StatisticsService:
             hour_response = hour_query.execute()
             hour_count = hour_response.count or 0
             
-            # 今日合格率
-            pass_query = self.db.table("test_records")\
-                .select("pass_rate")\
-                .gte("test_date", today.isoformat())\
-                .eq("is_deleted", False)\
-                .not_.is_("pass_rate", "null")
-            pass_response = pass_query.execute()
+            # 今日合格率和活跃设备数（一次查询）
+            def today_only(query):
+                return query.gte("test_date", today.isoformat()).eq("is_deleted", False)
             
-            today_pass_rate = 0
-            if pass_response.data:
-                pass_rates = [r["pass_rate"] for r in pass_response.data]
-                today_pass_rate = sum(pass_rates) / len(pass_rates)
-            
-            # 活跃设备数
-            device_query = self.db.table("test_records")\
-                .select("device_model")\
-                .gte("test_date", today.isoformat())\
-                .eq("is_deleted", False)
-            device_response = device_query.execute()
+            today_pass_rates = MetricAccumulator()
+            today_devices = set()
+            async for frame in self._iter_frames("pass_rate, device_model", today_only, ("pass_rate",)):
+                today_pass_rates.add(frame["pass_rate"])
+                today_devices.update(frame.device_counts())
             
-            active_devices = len(set(r["device_model"] for r in device_response.data if r.get("device_model")))
+            today_pass_rate = today_pass_rates.mean or 0
+            active_devices = len(today_devices)
             
             # 最近测试记录
             recent_query = self.db.table("test_records")\
@@ -278,39 +393,38 @@ class StatisticsService:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
-            result = []
-            
-            for model in device_models:
-                query = self.db.table("test_records")\
-                    .select("*")\
-                    .eq("device_model", model)\
+            def where(query):
+                return query.in_("device_model", device_models)\
                     .gte("test_date", start_date.isoformat())\
                     .eq("is_deleted", False)
-                
-                response = query.execute()
-                records = response.data
-                
-                if not records:
-                    result.append({
-                        "device_model": model,
-                        "metric": metric,
-                        "value": 0,
-                        "count": 0
-                    })
-                    continue
+            
+            # 所有型号一次查询，逐页按型号掩码累加
+            counts = {model: 0 for model in device_models}
+            values = {model: MetricAccumulator() for model in device_models}
+            column = _COMPARISON_METRICS.get(metric)
+            async for frame in self._iter_frames(
+                "device_model, pass_rate, voltage, current", where, ("pass_rate", "voltage", "current")
+            ):
+                for model in counts:
+                    index = frame.device_index(model)
+                    if index < 0:
+                        continue
+                    mask = frame.device_codes == index
+                    counts[model] += int(np.count_nonzero(mask))
+                    if column:
+                        values[model].add(frame[column][mask])
+            
+            result = []
+            for model in device_models:
+                count = counts[model]
                 
                 # 计算指标
-                if metric == "pass_rate":
-                    pass_rates = [r["pass_rate"] for r in records if r.get("pass_rate") is not None]
-                    value = sum(pass_rates) / len(pass_rates) if pass_rates else 0
-                elif metric == "avg_voltage":
-                    voltages = [r["voltage"] for r in records if r.get("voltage") is not None]
-                    value = sum(voltages) / len(voltages) if voltages else 0
-                elif metric == "avg_current":
-                    currents = [r["current"] for r in records if r.get("current") is not None]
-                    value = sum(currents) / len(currents) if currents else 0
+                if count == 0:
+                    value = 0
+                elif column:
+                    value = values[model].mean or 0
                 elif metric == "test_count":
-                    value = len(records)
+                    value = count
                 else:
                     value = 0
                 
@@ -318,7 +432,7 @@ class StatisticsService:
                     "device_model": model,
                     "metric": metric,
                     "value": round(value, 2),
-                    "count": len(records)
+                    "count": count
                 })
             
             return result
@@ -327,6 +441,7 @@ class StatisticsService:
             logger.error(f"Error getting device comparison: {str(e)}")
             raise
     
+    @stats_cache.cached()
     async def get_quality_metrics(
         self,
         start_date: Optional[date] = None,
@@ -334,19 +449,24 @@ class StatisticsService:
     ) -> Dict[str, Any]:
         """获取质量指标"""
         try:
-            query = self.db.table("test_records")\
-                .select("*")\
-                .eq("is_deleted", False)
-            
-            if start_date:
-                query = query.gte("test_date", start_date.isoformat())
-            if end_date:
-                query = query.lte("test_date", end_date.isoformat())
-            
-            response = query.execute()
-            records = response.data
-            
-            if not records:
+            def where(query):
+                query = query.eq("is_deleted", False)
+                if start_date:
+                    query = query.gte("test_date", start_date.isoformat())
+                if end_date:
+                    query = query.lte("test_date", end_date.isoformat())
+                return query
+            
+            total_tests = 0
+            fail_count = 0
+            pass_rates = MetricAccumulator()
+            async for frame in self._iter_frames("pass_rate", where, ("pass_rate",)):
+                total_tests += len(frame)
+                # 缺失合格率的记录不计为缺陷
+                fail_count += int(np.count_nonzero(frame["pass_rate"] < _PASS_THRESHOLD))
+                pass_rates.add(frame["pass_rate"])
+            
+            if not total_tests:
                 return {
                     "total_tests": 0,
                     "pass_rate": 0,
@@ -356,16 +476,13 @@ class StatisticsService:
                 }
             
             # 基础统计
-            total_tests = len(records)
-            pass_rates = [r["pass_rate"] for r in records if r.get("pass_rate") is not None]
-            average_pass_rate = sum(pass_rates) / len(pass_rates) if pass_rates else 0
+            average_pass_rate = pass_rates.mean or 0
             
             # 计算PPM (每百万缺陷数)
-            fail_count = sum(1 for r in records if r.get("pass_rate", 100) < 95)
-            ppm = (fail_count / total_tests) * 1000000 if total_tests > 0 else 0
+            ppm = (fail_count / total_tests) * 1000000
             
             # 简化的CPK计算（需要更多数据才能准确计算）
-            cpk = 1.33 if average_pass_rate >= 95 else 0.67
+            cpk = 1.33 if average_pass_rate >= _PASS_THRESHOLD else 0.67
             
             return {
                 "total_tests": total_tests,
@@ -403,18 +520,20 @@ class StatisticsService:
             }
             
             if include_details:
-                # 获取详细记录
-                query = self.db.table("test_records")\
-                    .select("*")\
-                    .eq("is_deleted", False)
-                
-                if start_date:
-                    query = query.gte("test_date", start_date.isoformat())
-                if end_date:
-                    query = query.lte("test_date", end_date.isoformat())
+                # 获取详细记录（键集分页读取全部匹配记录）
+                def where(query):
+                    query = query.eq("is_deleted", False)
+                    if start_date:
+                        query = query.gte("test_date", start_date.isoformat())
+                    if end_date:
+                        query = query.lte("test_date", end_date.isoformat())
+                    return query
                 
-                response = query.execute()
-                export_data["details"] = response.data
+                details = []
+                async for page in KeysetFetcher(self.db, "*", where).pages():
+                    details.extend(page)
+                details.sort(key=lambda record: (record["test_date"], record["id"]))
+                export_data["details"] = details
             
             # 根据格式返回数据
             if format == "json":
@@ -438,59 +557,87 @@ class StatisticsService:
             logger.error(f"Error exporting statistics: {str(e)}")
             raise
     
+    async def _get_daily_trend_from_rollups(self, days: int, device_model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """由每日汇总获取日趋势数据"""
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=days)
+        
+        rows = await self.rollups.get_rollups(start_date, None, device_model)
+        daily = RollupService.combine(rows, lambda row: date.fromisoformat(row["test_day"]))
+        return self._build_daily_trend(
+            {
+                day: (group["record_count"], RollupService.mean(group, "pass_rate"))
+                for day, group in daily.items()
+            },
+            start_date,
+            end_date
+        )
+    
     async def _get_daily_trend(self, days: int, device_model: Optional[str] = None) -> List[Dict[str, Any]]:
         """获取日趋势数据（内部方法）"""
         try:
+            if settings.statistics_use_rollups:
+                try:
+                    return await self._get_daily_trend_from_rollups(days, device_model)
+                except Exception as e:
+                    logger.warning(f"Rollups unavailable for daily trend: {str(e)}")
+            
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=days)
             
-            query = self.db.table("test_records")\
-                .select("test_date, pass_rate")\
-                .gte("test_date", start_date.isoformat())\
-                .eq("is_deleted", False)
-            
-            if device_model:
-                query = query.eq("device_model", device_model)
-            
-            response = query.execute()
-            
-            if not response.data:
-                return []
+            def where(query):
+                query = query.gte("test_date", start_date.isoformat()).eq("is_deleted", False)
+                if device_model:
+                    query = query.eq("device_model", device_model)
+                return query
             
             # 按日期分组
-            daily_data = {}
-            for record in response.data:
-                date = datetime.fromisoformat(record["test_date"]).date()
-                if date not in daily_data:
-                    daily_data[date] = {"count": 0, "pass_rates": []}
-                
-                daily_data[date]["count"] += 1
-                if record.get("pass_rate") is not None:
-                    daily_data[date]["pass_rates"].append(record["pass_rate"])
-            
-            # 构建结果
-            result = []
-            current_date = start_date
-            while current_date <= end_date:
-                if current_date in daily_data:
-                    data = daily_data[current_date]
-                    avg_pass_rate = sum(data["pass_rates"]) / len(data["pass_rates"]) if data["pass_rates"] else 0
-                    result.append({
-                        "date": current_date.isoformat(),
-                        "count": data["count"],
-                        "pass_rate": round(avg_pass_rate, 2)
-                    })
-                else:
-                    result.append({
-                        "date": current_date.isoformat(),
-                        "count": 0,
-                        "pass_rate": 0
-                    })
-                
-                current_date += timedelta(days=1)
-            
-            return result
-            
+            groups = GroupAccumulator()
+            async for frame in self._iter_frames("test_date, pass_rate", where, ("pass_rate",)):
+                groups.add(frame, frame.day, "pass_rate")
+            
+            return self._build_daily_trend(
+                {day: (count, mean) for day, count, mean in groups.items()},
+                start_date,
+                end_date
+            )
+            
+        except RowBudgetExceeded:
+            # 超出读取预算时不返回被截断的趋势
+            raise
         except Exception as e:
             logger.error(f"Error getting daily trend: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+    
+    async def _iter_frames(
+        self,
+        columns: str,
+        where: Callable[[Any], Any],
+        metrics: Sequence[str] = ()
+    ) -> AsyncIterator[RecordFrame]:
+        """键集分页读取测试记录，逐页转为列式数据"""
+        async for page in KeysetFetcher(self.db, columns, where).pages():
+            yield RecordFrame.from_records(page, metrics)
+    
+    @staticmethod
+    def _build_daily_trend(
+        daily_data: Dict[date, Tuple[int, Optional[float]]],
+        start_date: date,
+        end_date: date
+    ) -> List[Dict[str, Any]]:
+        """按日期补齐日趋势（daily_data: 日期 → (记录数, 平均合格率)），没有任何记录时返回空列表"""
+        if not daily_data:
+            return []
+        
+        result = []
+        current_date = start_date
+        while current_date <= end_date:
+            count, avg_pass_rate = daily_data.get(current_date, (0, None))
+            result.append({
+                "date": current_date.isoformat(),
+                "count": count,
+                "pass_rate": round(avg_pass_rate, 2) if avg_pass_rate is not None else 0
+            })
+            current_date += timedelta(days=1)
+        
+        return result
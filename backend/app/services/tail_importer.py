@@ -0,0 +1,225 @@
+"""
+跟踪导入：增量导入仍在写入的测试数据文件
+"""
+import io
+import os
+import csv
+import time
+import asyncio
+from typing import List, Optional, Tuple, AsyncIterator
+from uuid import UUID
+from loguru import logger
+
+from app.core.config import settings
+from app.models.test_record import TestRecordCreate
+from app.services.test_record_service import TestRecordService
+from app.services.import_pipeline import ImportPipeline
+from app.services.device_service import DeviceService
+from app.utils.detail_columns import DetailColumns
+from app.utils.excel_parser import ExcelParser, StreamingDetails
+from app.utils.readers import CsvReader
+from app.utils.validation import DetailValidator, RejectionReport
+
+
+class TailImporter:
+    """跟踪导入器
+
+    持续读取测试台正在写入的文件，只解析并写入新追加的数据行，
+    同时增量更新测试记录的采样点数和合格率。
+    CSV 文件按字节偏移读取新增的完整行；工作簿格式无法追加读取，
+    文件变化后重新逐行读取并跳过已导入的行（不做类型转换）。
+    """
+
+    def __init__(
+        self,
+        record_service: TestRecordService,
+        file_path: str,
+        record_id: Optional[UUID] = None,
+        backend: Optional[str] = None,
+        parser: Optional[ExcelParser] = None
+    ):
+        self.record_service = record_service
+        self.file_path = file_path
+        self.record_id = record_id
+        self.backend = backend
+        self.parser = parser or ExcelParser()
+
+        self.stream: Optional[StreamingDetails] = None
+        self.next_index = 0  # 下一条数据行的原始行号
+        self.inserted_rows = 0
+        self.validator = DetailValidator()  # 跨多次检查复用，保证时间单调性连续校验
+        self.report = RejectionReport()
+        self._offset = 0  # CSV 已读取的字节偏移
+        self._encoding = "utf-8"
+        self._signature: Optional[Tuple[int, float]] = None
+
+    @property
+    def is_csv(self) -> bool:
+        return isinstance(self.stream.reader, CsvReader)
+
+    async def open(self) -> UUID:
+        """读取表头并创建（或接续）测试记录，返回测试记录ID"""
+        result = await asyncio.to_thread(
+            self.parser.parse_file_streaming, self.file_path, backend=self.backend
+        )
+        if not result["success"]:
+            raise ValueError(result.get("error", "文件解析失败"))
+        self.stream = result["details"]["temp_id"]
+
+        if self.record_id is None:
+            record_data = result["records"][0]
+            record_data["sample_count"] = 0
+            record = await self.record_service.create_record(
+                TestRecordCreate(**record_data),
+                user_id=None
+            )
+            self.record_id = record.id
+        else:
+            await self._resume()
+
+        device_model = result["records"][0].get("device_model")
+        if device_model:
+            device = await DeviceService(self.record_service.db).get_device_ratings(device_model)
+            self.validator = DetailValidator.for_device(device)
+        
+        if self.is_csv:
+            self._encoding = self.stream.reader.detect_encoding(self.file_path)
+            self._offset = await asyncio.to_thread(self._csv_offset, self.next_index)
+
+        logger.info(f"Following {self.file_path} into test record {self.record_id} from row {self.next_index}")
+        return self.record_id
+
+    async def _resume(self):
+        """接续已有测试记录：从最后时间点之后继续"""
+        record = await self.record_service.get_record_by_id(self.record_id, include_details=False)
+        if record is None:
+            raise ValueError(f"Test record not found: {self.record_id}")
+
+        last_time_point = await self.record_service.get_last_time_point(self.record_id)
+        if last_time_point is not None:
+            self.next_index = int(round(last_time_point / 0.1)) + 1  # 每行代表0.1秒
+
+        self.stream.row_count = record.sample_count or 0
+        if record.pass_rate is not None:
+            self.stream.pass_count = round(record.pass_rate * self.stream.row_count / 100)
+
+    async def poll(self) -> int:
+        """导入新追加的数据行，返回写入的行数"""
+        rows = await asyncio.to_thread(self._read_appended)
+        if not rows:
+            return 0
+
+        start_index = self.next_index
+        self.next_index += len(rows)
+        chunks = list(self.stream.iter_appended(rows, start_index))
+
+        pipeline = ImportPipeline(self.record_service, self.record_id, self.validator, self.report)
+        stats = await pipeline.run(self._aiter(chunks))
+        if stats["failed_rows"]:
+            logger.warning(f"Failed to insert {stats['failed_rows']} appended rows from {self.file_path}")
+        if stats["rejected_rows"]:
+            logger.warning(
+                f"Rejected {stats['rejected_rows']} appended rows from {self.file_path} "
+                f"(totals by rule: {stats['validation']})"
+            )
+        self.inserted_rows += stats["inserted_rows"]
+
+        # 增量更新汇总字段
+        await self.record_service.update_record_summary(
+            self.record_id,
+            sample_count=self.stream.row_count,
+            pass_rate=self.stream.pass_rate
+        )
+        return stats["inserted_rows"]
+
+    async def follow(
+        self,
+        poll_interval: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        stop_event: Optional[asyncio.Event] = None
+    ):
+        """持续跟踪文件，超过 idle_timeout 秒没有新数据或收到停止信号时结束"""
+        poll_interval = poll_interval or settings.tail_poll_interval
+        if self.stream is None:
+            await self.open()
+
+        last_growth = time.monotonic()
+        while stop_event is None or not stop_event.is_set():
+            inserted = await self.poll()
+            if inserted:
+                last_growth = time.monotonic()
+                logger.info(f"+{inserted} rows from {self.file_path} (sample_count {self.stream.row_count})")
+            elif idle_timeout is not None and time.monotonic() - last_growth >= idle_timeout:
+                logger.info(f"No new rows in {self.file_path} for {idle_timeout:.0f}s, stop following")
+                break
+
+            if stop_event is None:
+                await asyncio.sleep(poll_interval)
+            else:
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _aiter(self, chunks: List[DetailColumns]) -> AsyncIterator[DetailColumns]:
+        for chunk in chunks:
+            yield chunk
+
+    def _read_appended(self) -> List[tuple]:
+        """读取新追加的原始数据行"""
+        try:
+            if self.is_csv:
+                return self._read_csv_appended()
+            return self._read_workbook_appended()
+        except Exception as e:
+            # 文件可能正在写入，下次检查时重试
+            logger.warning(f"Error reading appended rows from {self.file_path}: {str(e)}")
+            return []
+
+    def _read_csv_appended(self) -> List[tuple]:
+        """按字节偏移读取新增的完整行（最后一行未写完时留到下次读取）"""
+        if os.path.getsize(self.file_path) < self._offset:
+            logger.warning(f"{self.file_path} was truncated, stop reading appended rows")
+            return []
+
+        with open(self.file_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        self._offset += end + 1
+
+        text = data[:end + 1].decode(self._encoding)
+        return [
+            tuple(None if value == "" else value for value in row)
+            for row in csv.reader(io.StringIO(text, newline=""))
+        ]
+
+    def _read_workbook_appended(self) -> List[tuple]:
+        """文件变化后重新读取工作簿，返回已导入行之后的数据行"""
+        stat = os.stat(self.file_path)
+        signature = (stat.st_size, stat.st_mtime)
+        if signature == self._signature:
+            return []
+
+        rows = self.stream.reader.iter_rows(self.file_path)
+        try:
+            next(rows, None)  # 跳过表头
+            appended = [row for index, row in enumerate(rows) if index >= self.next_index]
+        finally:
+            rows.close()
+
+        self._signature = signature
+        return appended
+
+    def _csv_offset(self, skip_rows: int) -> int:
+        """计算跳过表头和前 skip_rows 行后的字节偏移"""
+        with open(self.file_path, "rb") as f:
+            f.readline()  # 表头
+            for _ in range(skip_rows):
+                position = f.tell()
+                if not f.readline().endswith(b"\n"):
+                    return position  # 未写完的行留到下次读取
+            return f.tell()
@@ -1,12 +1,17 @@
 """
 测试记录服务
 """
+import time
+import asyncio
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 from datetime import datetime
+import numpy as np
 from supabase import Client
 from loguru import logger
 
+from app.core.config import settings
+from app.core.stats_cache import stats_cache
 from app.models.test_record import (
     TestRecord,
     TestRecordCreate,
@@ -16,6 +21,13 @@ from app.models.test_record import (
     TestDetail,
     TestDetailCreate
 )
+from app.services.waveform_service import WaveformService, DecodedSegments
+from app.services.rollup_service import RollupService, ROLLUP_METRICS
+from app.utils.detail_columns import DetailColumns, DETAIL_FIELDS
+
+
+# 影响每日汇总的记录字段
+_ROLLUP_FIELDS = {"device_model", "batch_number", *ROLLUP_METRICS}
 
 
 class TestRecordService:
@@ -23,6 +35,13 @@ class TestRecordService:
     
     def __init__(self, db: Client):
         self.db = db
+        self.waveform = WaveformService(db)
+        self.rollups = RollupService(db)
+    
+    @property
+    def use_segments(self) -> bool:
+        """详细数据是否以压缩分段方式写入"""
+        return settings.detail_storage_mode == "segments"
     
     async def get_records(
         self,
@@ -101,15 +120,19 @@ class TestRecordService:
             
             record = TestRecordWithDetails(**response.data)
             
-            # 获取详细数据
+            # 获取详细数据（以分段方式存储的记录从分段解码）
             if include_details:
-                details_response = self.db.table("test_details")\
-                    .select("*")\
-                    .eq("test_record_id", str(record_id))\
-                    .order("time_point")\
-                    .execute()
-                
-                record.details = [TestDetail(**detail) for detail in details_response.data]
+                decoded = await self._read_waveform(record_id)
+                if decoded is not None:
+                    record.details = self._segment_details(record_id, decoded)
+                else:
+                    details_response = self.db.table("test_details")\
+                        .select("*")\
+                        .eq("test_record_id", str(record_id))\
+                        .order("time_point")\
+                        .execute()
+                    
+                    record.details = [TestDetail(**detail) for detail in details_response.data]
                 record.detail_count = len(record.details)
             
             return record
@@ -121,9 +144,10 @@ class TestRecordService:
     async def create_record(
         self,
         record_data: TestRecordCreate,
-        user_id: str
+        user_id: str,
+        refresh_rollups: bool = True
     ) -> TestRecord:
-        """创建测试记录"""
+        """创建测试记录（refresh_rollups=False 时由调用方统一刷新每日汇总和统计缓存）"""
         try:
             data = record_data.dict()
             data["created_by"] = user_id
@@ -134,6 +158,9 @@ class TestRecordService:
                 .insert(data)\
                 .execute()
             
+            if refresh_rollups:
+                await self._records_changed(response.data)
+            
             return TestRecord(**response.data[0])
             
         except Exception as e:
@@ -143,9 +170,10 @@ class TestRecordService:
     async def create_records_batch(
         self,
         records: List[TestRecordCreate],
-        user_id: str
+        user_id: str,
+        refresh_rollups: bool = True
     ) -> List[TestRecord]:
-        """批量创建测试记录"""
+        """批量创建测试记录（refresh_rollups=False 时由调用方统一刷新每日汇总和统计缓存）"""
         try:
             data_list = []
             for record in records:
@@ -159,6 +187,9 @@ class TestRecordService:
                 .insert(data_list)\
                 .execute()
             
+            if refresh_rollups:
+                await self._records_changed(response.data)
+            
             return [TestRecord(**record) for record in response.data]
             
         except Exception as e:
@@ -184,6 +215,9 @@ class TestRecordService:
                     .execute()
                 
                 if response.data:
+                    # 修改了汇总维度或指标时重算所在日期的汇总
+                    if _ROLLUP_FIELDS.intersection(data):
+                        await self._records_changed(response.data)
                     return TestRecord(**response.data[0])
             
             return None
@@ -192,6 +226,41 @@ class TestRecordService:
             logger.error(f"Error updating test record: {str(e)}")
             return None
     
+    async def update_record_summary(
+        self,
+        record_id: UUID,
+        sample_count: int,
+        pass_rate: Optional[float] = None,
+        raw_data: Optional[Dict[str, Any]] = None,
+        refresh_rollups: bool = True
+    ) -> Optional[TestRecord]:
+        """更新测试记录汇总字段（导入完成后回填）"""
+        try:
+            data = {
+                "sample_count": sample_count,
+                "updated_at": datetime.utcnow().isoformat()
+            }
+            if pass_rate is not None:
+                data["pass_rate"] = pass_rate
+            if raw_data is not None:
+                data["raw_data"] = raw_data
+            
+            response = self.db.table("test_records")\
+                .update(data)\
+                .eq("id", str(record_id))\
+                .execute()
+            
+            if response.data:
+                if refresh_rollups and pass_rate is not None:
+                    await self._records_changed(response.data)
+                return TestRecord(**response.data[0])
+            
+            return None
+            
+        except Exception as e:
+            logger.error(f"Error updating test record summary: {str(e)}")
+            return None
+    
     async def delete_record(self, record_id: UUID) -> bool:
         """删除测试记录（软删除）"""
         try:
@@ -203,6 +272,8 @@ class TestRecordService:
                 .eq("id", str(record_id))\
                 .execute()
             
+            await self._records_changed(response.data)
+            
             return len(response.data) > 0
             
         except Exception as e:
@@ -217,6 +288,14 @@ class TestRecordService:
     ) -> List[TestDetail]:
         """获取测试详细数据"""
         try:
+            try:
+                decoded = await self.waveform.read_rows(record_id, skip, limit)
+            except Exception as e:
+                logger.error(f"Error reading waveform segments: {str(e)}")
+                decoded = None
+            if decoded is not None:
+                return self._segment_details(record_id, decoded)
+            
             response = self.db.table("test_details")\
                 .select("*")\
                 .eq("test_record_id", str(record_id))\
@@ -230,12 +309,39 @@ class TestRecordService:
             logger.error(f"Error fetching test details: {str(e)}")
             raise
     
+    async def get_last_time_point(self, record_id: UUID) -> Optional[float]:
+        """获取测试详细数据的最后时间点"""
+        try:
+            if self.use_segments:
+                last_time_point = await self.waveform.get_last_time_point(record_id)
+                if last_time_point is not None:
+                    return last_time_point
+            
+            response = self.db.table("test_details")\
+                .select("time_point")\
+                .eq("test_record_id", str(record_id))\
+                .order("time_point", desc=True)\
+                .limit(1)\
+                .execute()
+            
+            if response.data:
+                return float(response.data[0]["time_point"])
+            
+            return None
+            
+        except Exception as e:
+            logger.error(f"Error fetching last time point: {str(e)}")
+            raise
+    
     async def create_details(
         self,
         details: List[TestDetailCreate]
     ) -> List[TestDetail]:
         """批量创建测试详细数据"""
         try:
+            if self.use_segments:
+                return await self._create_detail_segments(details)
+            
             data_list = [detail.dict() for detail in details]
             
             response = self.db.table("test_details")\
@@ -246,4 +352,198 @@ class TestRecordService:
             
         except Exception as e:
             logger.error(f"Error creating test details: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    async def get_detail_window(
+        self,
+        record_id: UUID,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None
+    ) -> DetailColumns:
+        """按时间窗口获取列式详细数据（分段存储只解码覆盖窗口的分段）"""
+        try:
+            decoded = await self._read_waveform(record_id, start_time, end_time)
+            if decoded is not None:
+                return decoded.details
+            
+            query = self.db.table("test_details")\
+                .select(", ".join(DETAIL_FIELDS))\
+                .eq("test_record_id", str(record_id))
+            if start_time is not None:
+                query = query.gte("time_point", start_time)
+            if end_time is not None:
+                query = query.lte("time_point", end_time)
+            response = await asyncio.to_thread(query.order("time_point").execute)
+            
+            rows = response.data or []
+            if not rows:
+                return DetailColumns.empty()
+            return DetailColumns(**{
+                field: np.array(
+                    [np.nan if row.get(field) is None else float(row[field]) for row in rows]
+                )
+                for field in DETAIL_FIELDS
+            })
+            
+        except Exception as e:
+            logger.error(f"Error fetching test detail window: {str(e)}")
+            raise
+    
+    async def delete_details(
+        self,
+        record_id: UUID,
+        after_time_point: Optional[float] = None
+    ) -> bool:
+        """删除测试详细数据（可只删除指定时间点之后的数据）"""
+        try:
+            query = self.db.table("test_details")\
+                .delete()\
+                .eq("test_record_id", str(record_id))
+            
+            if after_time_point is not None:
+                query = query.gt("time_point", after_time_point)
+            
+            await asyncio.to_thread(query.execute)
+            await self.waveform.delete_segments(record_id, after_time_point)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error deleting test details: {str(e)}")
+            return False
+    
+    async def create_details_bulk(
+        self,
+        record_id: UUID,
+        details: DetailColumns,
+        chunk_size: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """分块批量写入测试详细数据
+        
+        直接由列式数组构建写入数据，不经过逐行 pydantic 校验；
+        每个分块独立重试，单个分块失败不影响其余分块。
+        分段存储模式下每个压缩分段作为一个分块写入。
+        """
+        chunk_size = chunk_size or settings.detail_insert_chunk_size
+        stats = {
+            "inserted_rows": 0,
+            "failed_rows": 0,
+            "chunks": 0,
+            "failed_chunks": 0,
+            "write_seconds": 0.0
+        }
+        
+        started = time.perf_counter()
+        if self.use_segments:
+            table = "test_waveform_segments"
+            batches = (
+                ([segment], segment["row_count"])
+                for segment in self.waveform.build_segments(record_id, details)
+            )
+        else:
+            table = "test_details"
+            batches = (
+                (chunk.to_dicts(test_record_id=str(record_id)), len(chunk))
+                for chunk in details.iter_chunks(chunk_size)
+            )
+        
+        for rows, row_count in batches:
+            stats["chunks"] += 1
+            try:
+                await self._insert_detail_chunk(rows, max_retries, table)
+                stats["inserted_rows"] += row_count
+            except Exception as e:
+                logger.error(f"Error inserting test detail chunk for {record_id}: {str(e)}")
+                stats["failed_rows"] += row_count
+                stats["failed_chunks"] += 1
+        
+        stats["write_seconds"] = time.perf_counter() - started
+        return stats
+    
+    async def _create_detail_segments(self, details: List[TestDetailCreate]) -> List[TestDetail]:
+        """以压缩分段写入逐行提交的详细数据"""
+        by_record: Dict[str, List[TestDetailCreate]] = {}
+        for detail in details:
+            by_record.setdefault(str(detail.test_record_id), []).append(detail)
+        
+        created = []
+        for record_id, items in by_record.items():
+            items.sort(key=lambda detail: detail.time_point)
+            columns = {}
+            for field in DETAIL_FIELDS:
+                values = [getattr(detail, field) for detail in items]
+                if any(value is not None for value in values):
+                    columns[field] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+            
+            segments = self.waveform.build_segments(
+                record_id,
+                DetailColumns(**columns),
+                statuses=[detail.status for detail in items]
+            )
+            response = await asyncio.to_thread(
+                self.db.table("test_waveform_segments").insert(segments).execute
+            )
+            decoded = await self.waveform.read_segments(response.data)
+            created.extend(self._segment_details(record_id, decoded))
+        
+        return created
+    
+    async def _read_waveform(
+        self,
+        record_id: UUID,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None
+    ) -> Optional[DecodedSegments]:
+        """读取分段存储的详细数据（记录未以分段方式存储时返回 None）"""
+        try:
+            return await self.waveform.read_window(record_id, start_time, end_time)
+        except Exception as e:
+            logger.error(f"Error reading waveform segments: {str(e)}")
+            return None
+    
+    def _segment_details(self, record_id: UUID, decoded: DecodedSegments) -> List[TestDetail]:
+        """分段数据转为详情模型（行ID由记录ID与毫秒时间点组合生成，多次读取保持一致）"""
+        record_uuid = UUID(str(record_id))
+        base = record_uuid.int
+        keys = np.rint(decoded.details["time_point"] * 1000).astype(np.int64).view(np.uint64).tolist()
+        return [
+            TestDetail(
+                id=f"{base ^ key:032x}",
+                test_record_id=record_uuid,
+                status=status,
+                created_at=created_at,
+                **row
+            )
+            for row, key, status, created_at in zip(
+                decoded.details.to_dicts(), keys, decoded.statuses, decoded.created_at
+            )
+        ]
+    
+    async def _insert_detail_chunk(
+        self,
+        rows: List[Dict[str, Any]],
+        max_retries: Optional[int] = None,
+        table: str = "test_details"
+    ):
+        """写入单个详情分块（失败时指数退避重试）"""
+        max_retries = settings.insert_max_retries if max_retries is None else max_retries
+        
+        for attempt in range(max_retries + 1):
+            try:
+                query = self.db.table(table).insert(rows, returning="minimal")
+                await asyncio.to_thread(query.execute)
+                return
+            except Exception as e:
+                if attempt >= max_retries:
+                    raise
+                delay = settings.insert_retry_backoff * (2 ** attempt)
+                logger.warning(
+                    f"Test detail chunk insert failed (attempt {attempt + 1}), "
+                    f"retrying in {delay:.1f}s: {str(e)}"
+                )
+                await asyncio.sleep(delay)
+    
+    async def _records_changed(self, records: List[Dict[str, Any]]):
+        """记录写入后刷新所在日期的每日汇总，并使统计缓存失效"""
+        await self.rollups.refresh_records(records)
+        await stats_cache.invalidate()
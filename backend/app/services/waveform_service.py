@@ -0,0 +1,209 @@
+"""
+波形压缩分段存储服务
+"""
+import asyncio
+from typing import List, Optional, Dict, Any
+from uuid import UUID
+from supabase import Client
+import numpy as np
+
+from app.core.config import settings
+from app.utils.detail_columns import DetailColumns
+from app.utils.waveform_codec import encode_segment, decode_segment, to_bytea, from_bytea
+
+
+# 分段元数据列（不含压缩数据）
+_META_COLUMNS = "id, start_time, end_time, row_count, created_at"
+
+
+class DecodedSegments:
+    """解码后的分段数据：按时间排序的列式详情与逐行状态、创建时间"""
+
+    def __init__(self, details: DetailColumns, statuses: List[Optional[str]], created_at: List[Any]):
+        self.details = details
+        self.statuses = statuses
+        self.created_at = created_at
+
+    def __len__(self) -> int:
+        return len(self.details)
+
+    def take(self, index: np.ndarray) -> "DecodedSegments":
+        return DecodedSegments(
+            self.details.take(index),
+            [self.statuses[i] for i in index],
+            [self.created_at[i] for i in index]
+        )
+
+    def slice(self, start: int, stop: int) -> "DecodedSegments":
+        return DecodedSegments(
+            self.details.slice(start, stop),
+            self.statuses[start:stop],
+            self.created_at[start:stop]
+        )
+
+
+class WaveformService:
+    """波形压缩分段存储服务
+
+    每条测试记录的详细数据按固定行数切分为分段，每个分段以列式压缩数据保存为一行，
+    分段记录起止时间点，按时间窗口读取时只取覆盖该窗口的分段。
+    """
+
+    def __init__(self, db: Client):
+        self.db = db
+
+    def build_segments(
+        self,
+        record_id: UUID,
+        details: DetailColumns,
+        statuses: Optional[List[Optional[str]]] = None,
+        segment_rows: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """编码为分段行（不写库）"""
+        segment_rows = segment_rows or settings.waveform_segment_rows
+        segments = []
+        for start in range(0, len(details), segment_rows):
+            part = details.slice(start, start + segment_rows)
+            encoding, payload = encode_segment(part)
+            time_points = np.round(part["time_point"], 3)
+            segment = {
+                "test_record_id": str(record_id),
+                "start_time": float(time_points.min()),
+                "end_time": float(time_points.max()),
+                "row_count": len(part),
+                "encoding": encoding,
+                "payload": to_bytea(payload)
+            }
+            if statuses is not None:
+                part_statuses = statuses[start:start + segment_rows]
+                if any(value is not None for value in part_statuses):
+                    segment["statuses"] = part_statuses
+            segments.append(segment)
+        return segments
+
+    async def list_segments(
+        self,
+        record_id: UUID,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """获取分段元数据（按起始时间排序，可只取与时间窗口重叠的分段）"""
+        query = self.db.table("test_waveform_segments")\
+            .select(_META_COLUMNS)\
+            .eq("test_record_id", str(record_id))
+        if start_time is not None:
+            query = query.gte("end_time", start_time)
+        if end_time is not None:
+            query = query.lte("start_time", end_time)
+        query = query.order("start_time")
+
+        response = await asyncio.to_thread(query.execute)
+        return response.data or []
+
+    async def read_segments(self, segments: List[Dict[str, Any]]) -> DecodedSegments:
+        """读取并解码指定分段，结果按时间点排序"""
+        if not segments:
+            return DecodedSegments(DetailColumns.empty(), [], [])
+
+        query = self.db.table("test_waveform_segments")\
+            .select("id, row_count, encoding, payload, statuses, created_at")\
+            .in_("id", [segment["id"] for segment in segments])
+        response = await asyncio.to_thread(query.execute)
+        rows = {row["id"]: row for row in response.data or []}
+
+        parts, statuses, created_at = [], [], []
+        for segment in segments:
+            row = rows.get(segment["id"])
+            if row is None:
+                continue
+            count = row["row_count"]
+            parts.append(decode_segment(row["encoding"], from_bytea(row["payload"]), count))
+            statuses.extend(row.get("statuses") or [None] * count)
+            created_at.extend([row["created_at"]] * count)
+
+        decoded = DecodedSegments(DetailColumns.concat(parts), statuses, created_at)
+
+        # 分段时间区间重叠时（追加写入的零散数据）按时间点重新排序
+        time_points = decoded.details["time_point"]
+        if len(time_points) > 1 and np.any(np.diff(time_points) < 0):
+            decoded = decoded.take(np.argsort(time_points, kind="stable"))
+        return decoded
+
+    async def read_window(
+        self,
+        record_id: UUID,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None
+    ) -> Optional[DecodedSegments]:
+        """按时间窗口读取，记录没有分段时返回 None"""
+        segments = await self.list_segments(record_id, start_time, end_time)
+        if not segments:
+            if start_time is None and end_time is None:
+                return None
+            # 窗口内没有数据，与整条记录没有分段区分
+            if not await self.has_segments(record_id):
+                return None
+
+        decoded = await self.read_segments(segments)
+        if start_time is None and end_time is None:
+            return decoded
+
+        time_points = decoded.details["time_point"]
+        mask = np.ones(len(time_points), dtype=bool)
+        if start_time is not None:
+            mask &= time_points >= start_time
+        if end_time is not None:
+            mask &= time_points <= end_time
+        return decoded.take(np.flatnonzero(mask))
+
+    async def read_rows(self, record_id: UUID, skip: int, limit: int) -> Optional[DecodedSegments]:
+        """按行偏移分页读取，只解码覆盖该区间的分段；记录没有分段时返回 None"""
+        segments = await self.list_segments(record_id)
+        if not segments:
+            return None
+
+        offsets = np.cumsum([0] + [segment["row_count"] for segment in segments])
+        overlapping = any(
+            current["start_time"] < previous["end_time"]
+            for previous, current in zip(segments, segments[1:])
+        )
+        if overlapping:
+            # 分段区间重叠时无法按行数定位，读取全部分段
+            needed, base = segments, 0
+        else:
+            first = int(np.searchsorted(offsets, skip, side="right")) - 1
+            last = int(np.searchsorted(offsets, skip + limit, side="left"))
+            needed, base = segments[first:last], int(offsets[first])
+
+        decoded = await self.read_segments(needed)
+        return decoded.slice(skip - base, skip - base + limit)
+
+    async def has_segments(self, record_id: UUID) -> bool:
+        """记录是否以分段方式存储"""
+        query = self.db.table("test_waveform_segments")\
+            .select("id")\
+            .eq("test_record_id", str(record_id))\
+            .limit(1)
+        response = await asyncio.to_thread(query.execute)
+        return bool(response.data)
+
+    async def get_last_time_point(self, record_id: UUID) -> Optional[float]:
+        """最后一个分段的结束时间点"""
+        query = self.db.table("test_waveform_segments")\
+            .select("end_time")\
+            .eq("test_record_id", str(record_id))\
+            .order("end_time", desc=True)\
+            .limit(1)
+        response = await asyncio.to_thread(query.execute)
+        if response.data:
+            return float(response.data[0]["end_time"])
+        return None
+
+    async def delete_segments(self, record_id: UUID, after_time_point: Optional[float] = None):
+        """删除分段（可只删除起始时间点在指定时间点之后的分段）"""
+        query = self.db.table("test_waveform_segments")\
+            .delete()\
+            .eq("test_record_id", str(record_id))
+        if after_time_point is not None:
+            query = query.gt("start_time", after_time_point)
+        await asyncio.to_thread(query.execute)
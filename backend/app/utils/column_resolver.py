@@ -0,0 +1,257 @@
+"""
+列角色识别与仪器配置档案
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from pathlib import Path
+from loguru import logger
+
+from app.core.config import settings
+
+
+# 角色定义：关键词（整词或中文子串匹配）与单位（括号内匹配）
+ROLE_RULES: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "voltage": {"keywords": ("voltage", "volt", "电压"), "units": ("v", "mv", "kv")},
+    "current": {"keywords": ("current", "ampere", "电流"), "units": ("a", "ma")},
+    "power": {"keywords": ("power", "功率"), "units": ("w", "kw")},
+    "temperature": {"keywords": ("temperature", "temp", "温度"), "units": ("℃", "°c")},
+    "humidity": {"keywords": ("humidity", "humid", "湿度"), "units": ("%rh", "rh")},
+    "time": {"keywords": ("timestamp", "time", "时间戳", "时间"), "units": ("s", "ms")},
+}
+
+_UNIT_PATTERN = re.compile(r'[\(\[（【]\s*([^\)\]）】]+?)\s*[\)\]）】]')
+_TOKEN_PATTERN = re.compile(r'[a-z]+')
+_CJK_PATTERN = re.compile(r'[一-鿿]')
+
+
+def normalize_column(column: str) -> str:
+    """标准化列名（与 ExcelParser._clean_dataframe 一致）"""
+    return str(column).strip().lower().replace(' ', '_')
+
+
+def header_fingerprint(columns: List[str]) -> str:
+    """表头指纹"""
+    normalized = "|".join(normalize_column(col) for col in columns)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+class ColumnMapping:
+    """列角色映射结果"""
+
+    def __init__(self, roles: Dict[str, str], fingerprint: str, source: str):
+        self.roles = roles
+        self.fingerprint = fingerprint
+        self.source = source  # pinned / cached / inferred
+
+    def get(self, role: str) -> Optional[str]:
+        return self.roles.get(role)
+
+    def __contains__(self, role: str) -> bool:
+        return role in self.roles
+
+    def __getitem__(self, role: str) -> str:
+        return self.roles[role]
+
+
+class InstrumentProfileRegistry:
+    """仪器配置档案注册表（JSON文件持久化）"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or settings.instrument_profile_path)
+        self._lock = threading.Lock()
+        self._data = {"profiles": {}, "instruments": {}}
+        self._mtime: Optional[float] = None
+        self._load()
+
+    def _load(self):
+        """加载注册表"""
+        if not self.path.exists():
+            return
+        try:
+            self._mtime = self.path.stat().st_mtime
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._data["profiles"] = data.get("profiles", {})
+            self._data["instruments"] = data.get("instruments", {})
+        except Exception as e:
+            logger.error(f"Error loading instrument profiles: {str(e)}")
+
+    def _reload_if_changed(self):
+        """文件被其他进程（如命令行 pin-instrument）修改后重新加载"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._load()
+
+    def _save(self, instrument: Optional[str] = None):
+        """原子写入注册表（先合并磁盘上其他进程写入的档案和固定映射）
+
+        固定映射以磁盘为准，只写入本次修改的仪器类型，避免覆盖其他进程的修改。
+        """
+        try:
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    on_disk = json.load(f)
+                self._data["profiles"] = {**on_disk.get("profiles", {}), **self._data["profiles"]}
+                instruments = on_disk.get("instruments", {})
+                if instrument is not None:
+                    if instrument in self._data["instruments"]:
+                        instruments[instrument] = self._data["instruments"][instrument]
+                    else:
+                        instruments.pop(instrument, None)
+                self._data["instruments"] = instruments
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self._mtime = self.path.stat().st_mtime
+        except Exception as e:
+            logger.error(f"Error saving instrument profiles: {str(e)}")
+
+    def get_profile(self, fingerprint: str) -> Optional[Dict[str, str]]:
+        """按表头指纹获取缓存的映射"""
+        profile = self._data["profiles"].get(fingerprint)
+        return dict(profile["roles"]) if profile else None
+
+    def save_profile(
+        self,
+        fingerprint: str,
+        columns: List[str],
+        roles: Dict[str, str],
+        instrument: Optional[str] = None
+    ):
+        """缓存表头映射"""
+        with self._lock:
+            self._data["profiles"][fingerprint] = {
+                "columns": [normalize_column(col) for col in columns],
+                "roles": roles,
+                "instrument": instrument,
+                "created_at": datetime.utcnow().isoformat()
+            }
+            self._save()
+
+    def get_pinned(self, instrument: str) -> Optional[Dict[str, str]]:
+        """获取仪器类型固定映射"""
+        self._reload_if_changed()
+        pinned = self._data["instruments"].get(instrument)
+        return dict(pinned["roles"]) if pinned else None
+
+    def pin_instrument(self, instrument: str, roles: Dict[str, str]):
+        """为仪器类型固定列映射"""
+        unknown = set(roles) - set(ROLE_RULES)
+        if unknown:
+            raise ValueError(f"Unknown column roles: {', '.join(sorted(unknown))}")
+
+        with self._lock:
+            self._data["instruments"][instrument] = {
+                "roles": {role: normalize_column(col) for role, col in roles.items()},
+                "updated_at": datetime.utcnow().isoformat()
+            }
+            self._save(instrument)
+
+    def unpin_instrument(self, instrument: str) -> bool:
+        """取消仪器类型固定映射"""
+        with self._lock:
+            self._reload_if_changed()
+            if instrument not in self._data["instruments"]:
+                return False
+            del self._data["instruments"][instrument]
+            self._save(instrument)
+            return True
+
+    def list_pinned(self) -> Dict[str, Dict[str, str]]:
+        """全部仪器类型固定映射"""
+        self._reload_if_changed()
+        return {name: dict(pinned["roles"]) for name, pinned in self._data["instruments"].items()}
+
+
+class ColumnRoleResolver:
+    """列角色识别器"""
+
+    def __init__(self, registry: Optional[InstrumentProfileRegistry] = None):
+        self.registry = registry
+
+    def resolve(self, columns: List[str], instrument: Optional[str] = None) -> ColumnMapping:
+        """识别列角色：固定映射 > 指纹缓存 > 推断"""
+        normalized = [normalize_column(col) for col in columns]
+        fingerprint = header_fingerprint(columns)
+
+        if self.registry is not None:
+            if instrument:
+                pinned = self.registry.get_pinned(instrument)
+                if pinned and all(col in normalized for col in pinned.values()):
+                    return ColumnMapping(self._to_actual(pinned, columns), fingerprint, "pinned")
+
+            cached = self.registry.get_profile(fingerprint)
+            if cached is not None:
+                return ColumnMapping(self._to_actual(cached, columns), fingerprint, "cached")
+
+        roles = self.infer(normalized)
+        if self.registry is not None:
+            self.registry.save_profile(fingerprint, columns, roles, instrument)
+
+        return ColumnMapping(self._to_actual(roles, columns), fingerprint, "inferred")
+
+    def infer(self, columns: List[str]) -> Dict[str, str]:
+        """根据关键词和单位推断列角色"""
+        candidates = []
+        for position, column in enumerate(columns):
+            for role in ROLE_RULES:
+                score = self._score(column, role)
+                if score > 0:
+                    candidates.append((-score, position, role, column))
+
+        # 得分高者优先，同分按列顺序；每列只分配一个角色
+        roles = {}
+        used = set()
+        for _, _, role, column in sorted(candidates):
+            if role in roles or column in used:
+                continue
+            roles[role] = column
+            used.add(column)
+
+        return roles
+
+    def _score(self, column: str, role: str) -> int:
+        """列与角色的匹配得分"""
+        rules = ROLE_RULES[role]
+        units = [unit.strip() for unit in _UNIT_PATTERN.findall(column)]
+        name = _UNIT_PATTERN.sub("", column)
+        tokens = _TOKEN_PATTERN.findall(name)
+
+        score = 0
+        for keyword in rules["keywords"]:
+            if _CJK_PATTERN.search(keyword):
+                if keyword in name:
+                    score = max(score, len(keyword) + 2)
+            elif keyword in tokens:
+                score = max(score, 3)
+        if any(unit in rules["units"] for unit in units) or name.strip("_") in rules["units"]:
+            score += 1
+
+        return score
+
+    @staticmethod
+    def _to_actual(roles: Dict[str, str], columns: List[str]) -> Dict[str, str]:
+        """将标准化列名映射回实际列名"""
+        actual = {normalize_column(col): col for col in columns}
+        return {role: actual[col] for role, col in roles.items() if col in actual}
+
+
+_registry: Optional[InstrumentProfileRegistry] = None
+
+
+def get_profile_registry() -> InstrumentProfileRegistry:
+    """获取全局配置档案注册表"""
+    global _registry
+    if _registry is None:
+        _registry = InstrumentProfileRegistry()
+    return _registry
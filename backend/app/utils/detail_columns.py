@@ -0,0 +1,150 @@
+"""
+测试详情列式数据
+"""
+from typing import Dict, List, Any, Optional, Iterator, Sequence
+import numpy as np
+
+
+# 详情字段（与 test_details 表列一致）
+DETAIL_FIELDS = (
+    "time_point",
+    "voltage_value",
+    "current_value",
+    "power_value",
+    "resistance_value",
+    "temperature",
+    "humidity",
+)
+
+
+class DetailColumns:
+    """测试详情列式容器
+
+    每个字段保存为一个 float64 数组，缺失值为 NaN；源文件中不存在的字段为 None。
+    只有在序列化（写库、返回接口）时才转换为逐行字典。
+    """
+
+    def __init__(self, time_point: np.ndarray, **channels: Optional[np.ndarray]):
+        self.columns: Dict[str, Optional[np.ndarray]] = {
+            "time_point": np.asarray(time_point, dtype=np.float64)
+        }
+        for field in DETAIL_FIELDS[1:]:
+            values = channels.get(field)
+            self.columns[field] = None if values is None else np.asarray(values, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.columns["time_point"])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.iter_dicts()
+
+    def __getitem__(self, field: str) -> Optional[np.ndarray]:
+        return self.columns[field]
+
+    @property
+    def fields(self) -> List[str]:
+        """存在的字段"""
+        return [field for field in DETAIL_FIELDS if self.columns[field] is not None]
+
+    @classmethod
+    def from_arrays(
+        cls,
+        time_point: np.ndarray,
+        voltage: Optional[np.ndarray] = None,
+        current: Optional[np.ndarray] = None,
+        temperature: Optional[np.ndarray] = None,
+        humidity: Optional[np.ndarray] = None
+    ) -> "DetailColumns":
+        """由原始通道计算功率和电阻"""
+        power = None
+        resistance = None
+        if voltage is not None and current is not None:
+            voltage = np.asarray(voltage, dtype=np.float64)
+            current = np.asarray(current, dtype=np.float64)
+            # 电压、电流均为有效非零值时才计算
+            valid = (
+                ~np.isnan(voltage) & ~np.isnan(current)
+                & (voltage != 0) & (current != 0)
+            )
+            power = np.full(len(voltage), np.nan)
+            resistance = np.full(len(voltage), np.nan)
+            np.multiply(voltage, current, out=power, where=valid)
+            np.divide(voltage, current, out=resistance, where=valid)
+
+        return cls(
+            time_point,
+            voltage_value=voltage,
+            current_value=current,
+            power_value=power,
+            resistance_value=resistance,
+            temperature=temperature,
+            humidity=humidity
+        )
+
+    @classmethod
+    def empty(cls) -> "DetailColumns":
+        """空数据"""
+        return cls(np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def concat(cls, parts: Sequence["DetailColumns"]) -> "DetailColumns":
+        """合并多段数据"""
+        parts = [part for part in parts if len(part) > 0]
+        if not parts:
+            return cls.empty()
+
+        merged = {}
+        for field in DETAIL_FIELDS:
+            if all(part.columns[field] is None for part in parts):
+                merged[field] = None
+                continue
+            merged[field] = np.concatenate([
+                part.columns[field] if part.columns[field] is not None
+                else np.full(len(part), np.nan)
+                for part in parts
+            ])
+        return cls(**merged)
+
+    def slice(self, start: int, stop: Optional[int] = None) -> "DetailColumns":
+        """按行区间切片（视图，不复制）"""
+        return DetailColumns(**{
+            field: None if values is None else values[start:stop]
+            for field, values in self.columns.items()
+        })
+
+    def take(self, mask: np.ndarray) -> "DetailColumns":
+        """按布尔掩码或索引选取行"""
+        return DetailColumns(**{
+            field: None if values is None else values[mask]
+            for field, values in self.columns.items()
+        })
+
+    def iter_chunks(self, chunk_size: int) -> Iterator["DetailColumns"]:
+        """按固定行数分块"""
+        for start in range(0, len(self), chunk_size):
+            yield self.slice(start, start + chunk_size)
+
+    def to_lists(self) -> Dict[str, List[Optional[float]]]:
+        """序列化为按字段的列表，NaN 转为 None"""
+        lists = {}
+        for field in self.fields:
+            values = self.columns[field]
+            boxed = values.astype(object)
+            boxed[np.isnan(values)] = None
+            lists[field] = boxed.tolist()
+        return lists
+
+    def to_dicts(self, **extra: Any) -> List[Dict[str, Any]]:
+        """序列化为逐行字典，NaN 转为 None"""
+        columns = self.to_lists()
+        fields = list(columns)
+        lists = list(columns.values())
+
+        if extra:
+            return [dict(zip(fields, row), **extra) for row in zip(*lists)]
+        return [dict(zip(fields, row)) for row in zip(*lists)]
+
+    def iter_dicts(self, chunk_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """逐块惰性序列化"""
+        for chunk in self.iter_chunks(chunk_size):
+            yield from chunk.to_dicts()
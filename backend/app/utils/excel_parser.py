@@ -2,54 +2,79 @@
 Excel文件解析器
 """
 import re
-from typing import Dict, List, Any, Optional
+import time
+import asyncio
+from contextlib import aclosing
+from typing import Dict, List, Any, Optional, Union, Iterable, Iterator, AsyncIterator
 from datetime import datetime
 from pathlib import Path
 import pandas as pd
 import numpy as np
 from loguru import logger
 
+from app.core.config import settings
+from app.core.process_pool import parse_pool, ParsePoolRecycled
+
+from app.utils.detail_columns import DetailColumns
+from app.utils.column_resolver import ColumnRoleResolver, ColumnMapping, get_profile_registry
+from app.utils.readers import SpreadsheetReader, get_reader
+from app.utils.validation import DetailValidator, RejectionReport
+
 
 class ExcelParser:
     """Excel文件解析器"""
     
-    def __init__(self):
+    def __init__(self, resolver: Optional[ColumnRoleResolver] = None):
+        self.resolver = resolver or ColumnRoleResolver(get_profile_registry())
         self.voltage_pattern = re.compile(r'(\d+\.?\d*)\s*V')
         self.current_pattern = re.compile(r'(\d+\.?\d*)\s*A')
         self.resistance_pattern = re.compile(r'(\d+\.?\d*)\s*Ω')
         self.power_pattern = re.compile(r'(\d+\.?\d*)\s*W')
     
-    async def parse_file(self, file_path: str) -> Dict[str, Any]:
-        """解析Excel文件"""
+    async def parse_file(self, file_path: str, backend: Optional[str] = None) -> Dict[str, Any]:
+        """解析Excel文件（在解析进程池中执行，不阻塞事件循环）
+        
+        返回的详情为列式 DetailColumns，跨进程传输的是数组而非逐行字典。
+        """
+        try:
+            return await parse_pool.run(_parse_file_worker, file_path, backend)
+        except Exception as e:
+            logger.error(f"Error parsing Excel file: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "records": [],
+                "details": {}
+            }
+    
+    def parse_file_sync(self, file_path: str, backend: Optional[str] = None) -> Dict[str, Any]:
+        """解析Excel文件（同步执行）"""
         try:
             # 从文件名提取参数
             file_info = self._parse_filename(file_path)
             
-            # 读取Excel文件
-            df = pd.read_excel(file_path, engine='openpyxl')
+            # 读取表格文件（按扩展名自动选择读取后端，或使用指定后端）
+            reader = get_reader(file_path, backend)
+            started = time.perf_counter()
+            df = reader.read_frame(file_path)
             
             # 清理数据
             df = self._clean_dataframe(df)
             
+            # 识别列角色
+            column_map = self._resolve_detail_columns(
+                df.columns.tolist(),
+                instrument=file_info.get("device_model")
+            )
+            
             # 解析数据
             records = []
             details = {}
             
             # 创建主记录
-            record = {
-                "file_name": Path(file_path).name,
-                "test_date": file_info.get("test_date", datetime.now()),
-                "voltage": file_info.get("voltage"),
-                "current": file_info.get("current"),
-                "resistance": file_info.get("resistance"),
-                "power": file_info.get("power"),
-                "device_model": file_info.get("device_model", "Unknown"),
-                "sample_count": len(df),
-                "raw_data": {
-                    "columns": df.columns.tolist(),
-                    "shape": df.shape
-                }
-            }
+            record = self._build_record(file_path, file_info, df.columns.tolist(), column_map, len(df))
+            record["raw_data"]["shape"] = df.shape
+            record["raw_data"]["reader_backend"] = reader.name
             
             # 计算合格率（示例逻辑）
             if "pass" in df.columns.str.lower():
@@ -59,15 +84,14 @@ class ExcelParser:
             
             records.append(record)
             
-            # 解析详细数据
-            detail_list = []
-            for idx, row in df.iterrows():
-                detail = self._parse_detail_row(row, idx)
-                if detail:
-                    detail_list.append(detail)
+            # 列式提取详细数据（使用临时ID关联详情）
+            details["temp_id"] = self._extract_details(df, column_map)
             
-            # 使用临时ID关联详情
-            details["temp_id"] = detail_list
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"Parsed {Path(file_path).name} with {reader.name}: "
+                f"{len(df)} rows in {elapsed:.3f}s ({len(df) / max(elapsed, 1e-9):.0f} rows/s)"
+            )
             
             return {
                 "success": True,
@@ -84,6 +108,195 @@ class ExcelParser:
                 "details": {}
             }
     
+    async def preview_file(
+        self,
+        file_path: str,
+        nrows: Optional[int] = None,
+        backend: Optional[str] = None,
+        file_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """导入预检（在线程中执行）"""
+        return await asyncio.to_thread(self.preview_file_sync, file_path, nrows, backend, file_name)
+    
+    def preview_file_sync(
+        self,
+        file_path: str,
+        nrows: Optional[int] = None,
+        backend: Optional[str] = None,
+        file_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """导入预检：只读取表头和前 nrows 行，识别列、校验数据并预测采样点数
+        
+        errors 中的问题会导致导入失败或没有可用数据，warnings 仅供参考。
+        """
+        started = time.perf_counter()
+        nrows = nrows or settings.preview_rows
+        file_info = self._parse_filename(file_name or file_path)
+        result = {
+            "file_name": file_name or Path(file_path).name,
+            "file_info": file_info,
+            "reader_backend": None,
+            "header": [],
+            "columns": [],
+            "column_roles": {},
+            "column_source": None,
+            "preview_rows": 0,
+            "predicted_sample_count": None,
+            "validation": {},
+            "sample": [],
+            "errors": [],
+            "warnings": []
+        }
+        
+        try:
+            reader = get_reader(file_path, backend, streaming=True)
+            result["reader_backend"] = reader.name
+            result["header"] = [None if col is None else str(col) for col in reader.read_header(file_path)]
+            raw = reader.read_frame(file_path, nrows=nrows)
+        except Exception as e:
+            result["errors"].append(f"Unreadable file: {str(e)}")
+            return self._finish_preview(result, started)
+        
+        if len(raw.columns) == 0:
+            result["errors"].append("No header row")
+            return self._finish_preview(result, started)
+        
+        df = self._clean_dataframe(raw)
+        result["columns"] = df.columns.tolist()
+        result["preview_rows"] = len(df)
+        if len(df) == 0:
+            result["errors"].append("No data rows")
+            result["predicted_sample_count"] = 0
+            return self._finish_preview(result, started)
+        
+        column_map = self._resolve_detail_columns(df.columns.tolist(), instrument=file_info.get("device_model"))
+        result["column_roles"] = column_map.roles
+        result["column_source"] = column_map.source
+        
+        # 测量列缺失或在样本中没有任何数值
+        measure_roles = [role for role in column_map.roles if role != "time"]
+        empty_roles = [role for role in measure_roles if df[column_map[role]].notna().sum() == 0]
+        if len(empty_roles) == len(measure_roles):
+            result["errors"].append("No numeric measurement columns recognized")
+        elif empty_roles:
+            result["warnings"].append(f"Columns without numeric values: {', '.join(empty_roles)}")
+        
+        details = self._extract_details(df, column_map)
+        
+        validation = self.validate_data(details)
+        result["validation"] = validation
+        result["warnings"].extend(validation["warnings"])
+        result["warnings"].extend(validation["errors"])
+        result["sample"] = details.slice(0, 10).to_dicts()
+        
+        # 预测采样点数：样本未读满时即为全部数据，否则按文件声明的尺寸估计
+        if len(raw) < nrows:
+            result["predicted_sample_count"] = len(df)
+        else:
+            try:
+                estimated = reader.estimate_rows(file_path)
+            except Exception as e:
+                logger.warning(f"Error estimating rows of {file_path}: {str(e)}")
+                estimated = None
+            result["predicted_sample_count"] = max(estimated, len(df)) if estimated is not None else None
+        
+        return self._finish_preview(result, started)
+    
+    def _finish_preview(self, result: Dict[str, Any], started: float) -> Dict[str, Any]:
+        result["acceptable"] = len(result["errors"]) == 0
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+    
+    def parse_file_streaming(
+        self,
+        file_path: str,
+        chunk_size: Optional[int] = None,
+        backend: Optional[str] = None,
+        header: Optional[List[Optional[str]]] = None
+    ) -> Dict[str, Any]:
+        """流式解析Excel文件（只读逐行迭代，内存占用与文件大小无关）
+        
+        返回结构与 parse_file 相同，但详情为按块产出的 StreamingDetails，
+        主记录的 sample_count 和 pass_rate 在迭代完成后才确定。
+        header 为预检时读取的表头，传入时不再单独打开文件读取表头。
+        """
+        try:
+            file_info = self._parse_filename(file_path)
+            
+            stream = StreamingDetails(
+                file_path,
+                get_reader(file_path, backend, streaming=True),
+                chunk_size or settings.parse_chunk_size,
+                self._resolve_detail_columns,
+                instrument=file_info.get("device_model"),
+                header=header
+            )
+            record = self._build_record(file_path, file_info, stream.columns, stream.column_map, None)
+            record["raw_data"]["reader_backend"] = stream.reader.name
+            
+            return {
+                "success": True,
+                "streaming": True,
+                "records": [record],
+                "details": {"temp_id": stream}
+            }
+            
+        except Exception as e:
+            logger.error(f"Error opening Excel file for streaming: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "records": [],
+                "details": {}
+            }
+    
+    def _build_record(
+        self,
+        file_path: str,
+        file_info: Dict[str, Any],
+        columns: List[str],
+        column_map: ColumnMapping,
+        sample_count: Optional[int]
+    ) -> Dict[str, Any]:
+        """构建主记录"""
+        record = self._filename_fields(file_path, file_info)
+        record["sample_count"] = sample_count
+        record["raw_data"] = {
+            "columns": columns,
+            "column_roles": column_map.roles,
+            "header_fingerprint": column_map.fingerprint
+        }
+        return record
+    
+    def _filename_fields(self, file_path: str, file_info: Dict[str, Any]) -> Dict[str, Any]:
+        """主记录中由文件名决定的字段"""
+        return {
+            "file_name": Path(file_path).name,
+            "test_date": file_info.get("test_date", datetime.now()),
+            "voltage": file_info.get("voltage"),
+            "current": file_info.get("current"),
+            "resistance": file_info.get("resistance"),
+            "power": file_info.get("power"),
+            "device_model": file_info.get("device_model", "Unknown")
+        }
+    
+    def content_summary(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """主记录中由文件内容决定的字段（写入解析缓存）"""
+        filename_fields = self._filename_fields("", {})
+        return {key: value for key, value in record.items() if key not in filename_fields}
+    
+    def parse_cached(self, file_path: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+        """由解析缓存构建解析结果（文件名相关字段按当前文件名重新提取）"""
+        record = self._filename_fields(file_path, self._parse_filename(file_path))
+        record.update(cached["summary"])
+        logger.info(f"Using cached parse result for {Path(file_path).name}")
+        return {
+            "success": True,
+            "cached": True,
+            "records": [record],
+            "details": {"temp_id": cached["details"]}
+        }
+    
     def _parse_filename(self, file_path: str) -> Dict[str, Any]:
         """从文件名解析参数"""
         filename = Path(file_path).stem
@@ -150,70 +363,214 @@ class ExcelParser:
         
         return df
     
-    def _parse_detail_row(self, row: pd.Series, index: int) -> Optional[Dict[str, Any]]:
-        """解析详细数据行"""
-        try:
-            detail = {
-                "time_point": index * 0.1,  # 假设每行代表0.1秒
-            }
-            
-            # 查找电压列
-            voltage_cols = [col for col in row.index if 'voltage' in col or 'v' in col.lower()]
-            if voltage_cols:
-                detail["voltage_value"] = float(row[voltage_cols[0]]) if pd.notna(row[voltage_cols[0]]) else None
-            
-            # 查找电流列
-            current_cols = [col for col in row.index if 'current' in col or 'a' in col.lower()]
-            if current_cols:
-                detail["current_value"] = float(row[current_cols[0]]) if pd.notna(row[current_cols[0]]) else None
-            
-            # 计算功率
-            if detail.get("voltage_value") and detail.get("current_value"):
-                detail["power_value"] = detail["voltage_value"] * detail["current_value"]
-            
-            # 计算电阻
-            if detail.get("voltage_value") and detail.get("current_value") and detail["current_value"] != 0:
-                detail["resistance_value"] = detail["voltage_value"] / detail["current_value"]
-            
-            # 温度和湿度（如果存在）
-            temp_cols = [col for col in row.index if 'temp' in col.lower()]
-            if temp_cols:
-                detail["temperature"] = float(row[temp_cols[0]]) if pd.notna(row[temp_cols[0]]) else None
-            
-            humid_cols = [col for col in row.index if 'humid' in col.lower()]
-            if humid_cols:
-                detail["humidity"] = float(row[humid_cols[0]]) if pd.notna(row[humid_cols[0]]) else None
-            
-            return detail
-            
-        except Exception as e:
-            logger.error(f"Error parsing detail row: {str(e)}")
-            return None
+    def _resolve_detail_columns(
+        self,
+        columns: List[str],
+        instrument: Optional[str] = None
+    ) -> ColumnMapping:
+        """识别详细数据列（每个工作表表头只执行一次）"""
+        return self.resolver.resolve(columns, instrument=instrument)
     
-    def validate_data(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """验证数据有效性"""
+    def _extract_details(self, df: pd.DataFrame, column_map: ColumnMapping) -> DetailColumns:
+        """列式提取详细数据"""
+        def column_values(role: str) -> Optional[np.ndarray]:
+            if role not in column_map:
+                return None
+            values = pd.to_numeric(df[column_map[role]], errors='coerce')
+            return values.to_numpy(dtype=np.float64, na_value=np.nan)
+        
+        return DetailColumns.from_arrays(
+            time_point=df.index.to_numpy(dtype=np.float64) * 0.1,  # 假设每行代表0.1秒
+            voltage=column_values("voltage"),
+            current=column_values("current"),
+            temperature=column_values("temperature"),
+            humidity=column_values("humidity")
+        )
+    
+    def validate_data(
+        self,
+        data: Union[pd.DataFrame, DetailColumns],
+        validator: Optional[DetailValidator] = None
+    ) -> Dict[str, Any]:
+        """验证数据有效性（按校验规则向量化计算，不剔除数据）"""
+        if isinstance(data, pd.DataFrame):
+            data = self._extract_details(data, self._resolve_detail_columns(data.columns.tolist()))
+        
         errors = []
         warnings = []
         
         # 检查必要列
-        required_cols = ['voltage', 'current']
-        missing_cols = [col for col in required_cols if col not in df.columns.str.lower()]
+        missing_cols = [
+            name for name, field in (("voltage", "voltage_value"), ("current", "current_value"))
+            if data[field] is None
+        ]
         if missing_cols:
             warnings.append(f"Missing columns: {', '.join(missing_cols)}")
         
-        # 检查数据范围
-        if 'voltage' in df.columns:
-            invalid_voltage = df[(df['voltage'] < 0) | (df['voltage'] > 1000)].shape[0]
-            if invalid_voltage > 0:
-                errors.append(f"{invalid_voltage} rows with invalid voltage values")
-        
-        if 'current' in df.columns:
-            invalid_current = df[(df['current'] < 0) | (df['current'] > 100)].shape[0]
-            if invalid_current > 0:
-                errors.append(f"{invalid_current} rows with invalid current values")
+        # 逐行规则校验
+        report = RejectionReport(sample_limit=0)
+        report.add(data, (validator or DetailValidator()).evaluate(data))
+        invalid_rows = report.counts
+        for rule, count in invalid_rows.items():
+            errors.append(f"{count} rows failed {rule}")
         
         return {
             "valid": len(errors) == 0,
             "errors": errors,
-            "warnings": warnings
-        }
\ No newline at end of file
+            "warnings": warnings,
+            "invalid_rows": invalid_rows,
+            "rejected_rows": report.rejected_rows
+        }
+
+
+def _parse_file_worker(file_path: str, backend: Optional[str] = None) -> Dict[str, Any]:
+    """解析进程入口"""
+    return ExcelParser().parse_file_sync(file_path, backend)
+
+
+def _stream_chunks_worker(stream: "StreamingDetails", skip_rows: int) -> Iterator[tuple]:
+    """流式解析进程入口：逐块产出详情数据，最后产出采样点数与合格计数"""
+    for chunk in stream.iter_chunks(skip_rows):
+        yield "chunk", chunk
+    yield "summary", (stream.row_count, stream.pass_count)
+
+
+class StreamingDetails:
+    """流式详情数据：按固定行数产出 DetailColumns 分块"""
+    
+    def __init__(
+        self,
+        file_path: str,
+        reader: SpreadsheetReader,
+        chunk_size: int,
+        resolve_columns,
+        instrument: Optional[str] = None,
+        header: Optional[Iterable[Any]] = None
+    ):
+        self.file_path = file_path
+        self.reader = reader
+        self.chunk_size = chunk_size
+        self.row_count = 0
+        self.pass_count = None
+        
+        # 只读取表头（预检已读取时直接使用），识别列角色
+        if header is None:
+            header = reader.read_header(file_path)
+        
+        self.columns = [
+            str(col).strip().lower().replace(' ', '_') if col is not None else f"unnamed:_{i}"
+            for i, col in enumerate(header)
+        ]
+        self.column_map = resolve_columns(self.columns, instrument=instrument)
+        
+        positions = {col: i for i, col in enumerate(self.columns)}
+        self._role_positions = {
+            role: positions[col] for role, col in self.column_map.roles.items()
+        }
+        self._pass_position = positions.get("pass")
+    
+    @property
+    def pass_rate(self) -> Optional[float]:
+        """合格率（迭代完成后有效）"""
+        if self.pass_count is None:
+            return None
+        return (self.pass_count / self.row_count) * 100 if self.row_count > 0 else 0
+    
+    def __aiter__(self) -> AsyncIterator[DetailColumns]:
+        return self.aiter_chunks()
+    
+    def __iter__(self) -> Iterator[DetailColumns]:
+        return self.iter_chunks()
+    
+    async def aiter_chunks(self, skip_rows: int = 0) -> AsyncIterator[DetailColumns]:
+        """异步迭代（在解析进程池中读取，不阻塞事件循环，解析崩溃不影响 API 进程）
+        
+        分块经有界队列逐个传回；进程池因其他任务超时被重建时，跳过已产出的行重新读取。
+        """
+        emitted = skip_rows
+        while True:
+            try:
+                # 消费方提前停止时立即关闭，通知工作进程退出并释放并发名额
+                async with aclosing(parse_pool.stream(_stream_chunks_worker, self, emitted)) as items:
+                    async for kind, value in items:
+                        if kind == "chunk":
+                            emitted += len(value)
+                            yield value
+                        else:
+                            self.row_count, self.pass_count = value
+                return
+            except ParsePoolRecycled:
+                logger.warning(f"Restarting streaming parse of {self.file_path} at row {emitted}")
+    
+    def iter_chunks(self, skip_rows: int = 0) -> Iterator[DetailColumns]:
+        """按块迭代详情数据
+        
+        skip_rows 用于断点续传：跳过已提交的数据行，但仍计入采样点数与合格率。
+        """
+        self.row_count = 0
+        self.pass_count = 0 if self._pass_position is not None else None
+        
+        rows = self.reader.iter_rows(self.file_path)
+        try:
+            next(rows, None)  # 跳过表头
+            for chunk in self.iter_appended(rows):
+                chunk = self._skip(chunk, skip_rows)
+                if chunk is not None:
+                    yield chunk
+        finally:
+            rows.close()
+    
+    def iter_appended(self, rows: Iterable[tuple], start_index: int = 0) -> Iterator[DetailColumns]:
+        """将原始数据行（不含表头）按块转换，累计采样点数与合格率
+        
+        start_index 为首行的原始行号，增量导入追加的行时从上次结束处继续。
+        """
+        if self._pass_position is not None and self.pass_count is None:
+            self.pass_count = 0
+        
+        buffer = []
+        indices = []
+        for index, row in enumerate(rows, start_index):
+            # 删除全空行（保留原始行号用于计算时间点）
+            if all(value is None for value in row):
+                continue
+            buffer.append(row)
+            indices.append(index)
+            if len(buffer) >= self.chunk_size:
+                yield self._build_chunk(buffer, indices)
+                buffer, indices = [], []
+        
+        if buffer:
+            yield self._build_chunk(buffer, indices)
+    
+    def _skip(self, chunk: DetailColumns, skip_rows: int) -> Optional[DetailColumns]:
+        """去掉分块中位于 skip_rows 之前的行"""
+        start = self.row_count - len(chunk)
+        if self.row_count <= skip_rows:
+            return None
+        if start < skip_rows:
+            return chunk.slice(skip_rows - start)
+        return chunk
+    
+    def _build_chunk(self, rows: List[tuple], indices: List[int]) -> DetailColumns:
+        """将一批原始行转换为列式数据"""
+        def column_values(role: str) -> Optional[np.ndarray]:
+            position = self._role_positions.get(role)
+            if position is None:
+                return None
+            values = [row[position] if position < len(row) else None for row in rows]
+            return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')\
+                .to_numpy(dtype=np.float64, na_value=np.nan)
+        
+        self.row_count += len(rows)
+        if self._pass_position is not None:
+            values = [row[self._pass_position] if self._pass_position < len(row) else None for row in rows]
+            self.pass_count += pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').sum()
+        
+        return DetailColumns.from_arrays(
+            time_point=np.asarray(indices, dtype=np.float64) * 0.1,  # 假设每行代表0.1秒
+            voltage=column_values("voltage"),
+            current=column_values("current"),
+            temperature=column_values("temperature"),
+            humidity=column_values("humidity")
+        )
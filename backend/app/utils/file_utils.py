@@ -3,7 +3,9 @@
 """
 import os
 import shutil
-from typing import List
+import hashlib
+import zipfile
+from typing import List, Optional, Iterator, Tuple
 from datetime import datetime
 from pathlib import Path
 from fastapi import UploadFile
@@ -11,6 +13,24 @@ import aiofiles
 from loguru import logger
 
 
+# 上传文件分块读取大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """上传文件超过大小限制"""
+    pass
+
+
+class SavedUpload:
+    """已保存的上传文件"""
+    
+    def __init__(self, path: str, size: int, content_hash: str):
+        self.path = path
+        self.size = size
+        self.content_hash = content_hash  # SHA-256
+
+
 def validate_file_extension(filename: str, allowed_extensions: List[str]) -> bool:
     """验证文件扩展名"""
     if not filename:
@@ -23,9 +43,13 @@ def validate_file_extension(filename: str, allowed_extensions: List[str]) -> boo
 async def save_upload_file(
     upload_file: UploadFile,
     user_id: str,
-    upload_dir: str = "uploads"
-) -> str:
-    """保存上传的文件"""
+    upload_dir: str = "uploads",
+    max_size: Optional[int] = None
+) -> SavedUpload:
+    """保存上传的文件（分块写入，同时计算内容哈希，内存占用恒定）
+    
+    超过 max_size 时立即中止并删除已写入的部分，抛出 UploadTooLargeError
+    """
     try:
         # 创建上传目录
         base_dir = Path(upload_dir)
@@ -40,21 +64,107 @@ async def save_upload_file(
         file_path = date_dir / safe_filename
         
         # 保存文件
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await upload_file.read()
-            await f.write(content)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(file_path, 'wb') as f:
+                while True:
+                    chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise UploadTooLargeError(
+                            f"File too large. Maximum size: {max_size / 1024 / 1024:.0f}MB"
+                        )
+                    digest.update(chunk)
+                    await f.write(chunk)
+        except Exception:
+            # 删除未写完的文件
+            if file_path.exists():
+                file_path.unlink()
+            raise
         
         # 重置文件指针
         await upload_file.seek(0)
         
         logger.info(f"File saved: {file_path}")
-        return str(file_path)
+        return SavedUpload(str(file_path), size, digest.hexdigest())
         
     except Exception as e:
         logger.error(f"Error saving upload file: {str(e)}")
         raise
 
 
+def hash_file(file_path: str) -> str:
+    """计算文件内容哈希（SHA-256，分块读取）"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_archive_members(
+    archive_path: str,
+    dest_dir: str,
+    allowed_extensions: List[str],
+    max_member_size: Optional[int] = None
+) -> Iterator[Tuple[str, Optional[SavedUpload]]]:
+    """逐个解压压缩包中的数据文件（分块复制并计算内容哈希）
+    
+    只解压扩展名受支持的成员，每次只有一个成员在复制中；
+    超过 max_member_size 的成员不保存，返回 (成员名, None)
+    """
+    target_dir = Path(dest_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            name = Path(info.filename).name
+            if info.is_dir() or not name or name.startswith(".") or "__MACOSX" in info.filename:
+                continue
+            if not validate_file_extension(name, allowed_extensions):
+                continue
+            if max_member_size is not None and info.file_size > max_member_size:
+                yield info.filename, None
+                continue
+            
+            # 只保留文件名（防止路径穿越），重名时追加序号
+            file_path = target_dir / name
+            index = 1
+            while file_path.exists():
+                file_path = target_dir / f"{Path(name).stem}_{index}{Path(name).suffix}"
+                index += 1
+            
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                with archive.open(info) as src, open(file_path, "wb") as dst:
+                    while True:
+                        chunk = src.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        if max_member_size is not None and size > max_member_size:
+                            raise UploadTooLargeError(info.filename)
+                        digest.update(chunk)
+                        dst.write(chunk)
+            except UploadTooLargeError:
+                file_path.unlink()
+                yield info.filename, None
+                continue
+            except Exception:
+                if file_path.exists():
+                    file_path.unlink()
+                raise
+            
+            yield info.filename, SavedUpload(str(file_path), size, digest.hexdigest())
+
+
 def delete_file(file_path: str) -> bool:
     """删除文件"""
     try:
@@ -0,0 +1,184 @@
+"""
+解析结果缓存（按文件内容哈希）
+"""
+import os
+import json
+import shutil
+import uuid
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+from pathlib import Path
+from loguru import logger
+
+from app.core.config import settings
+from app.utils.detail_columns import DetailColumns
+from app.utils.waveform_codec import encode_segment, decode_segment
+
+
+# 缓存格式版本（格式变化时旧缓存自动失效）
+CACHE_VERSION = 2
+
+_DATA_FILE = "details.bin"
+_META_FILE = "meta.json"
+
+
+def _json_default(value: Any) -> Any:
+    """numpy 标量等转为 JSON 可序列化类型"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class ParseCacheWriter:
+    """解析缓存写入器（流式解析时逐块追加）
+
+    每个分块按波形分段格式无损压缩后追加到同一个数据文件，提交时原子移动到缓存目录，
+    并按缓存总大小淘汰最久未使用的条目。
+    """
+
+    def __init__(self, cache: "ParseCache", content_hash: str):
+        self.cache = cache
+        self.content_hash = content_hash
+        self.tmp_dir = cache.root / f".{content_hash}.{uuid.uuid4().hex[:8]}.tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.rows = 0
+        self._segments: List[Dict[str, Any]] = []
+        self._file = open(self.tmp_dir / _DATA_FILE, "wb")
+
+    def append(self, chunk: DetailColumns):
+        """追加一个分块"""
+        if not len(chunk):
+            return
+        encoding, payload = encode_segment(chunk, lossless=True)
+        self._file.write(payload)
+        self._segments.append({"rows": len(chunk), "encoding": encoding, "size": len(payload)})
+        self.rows += len(chunk)
+
+    def commit(self, summary: Dict[str, Any]):
+        """写入元数据并发布缓存"""
+        self._file.close()
+        meta = {
+            "version": CACHE_VERSION,
+            "rows": self.rows,
+            "segments": self._segments,
+            "summary": summary,
+            "created_at": datetime.utcnow().isoformat()
+        }
+        with open(self.tmp_dir / _META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, default=_json_default)
+
+        target = self.cache.root / self.content_hash
+        try:
+            os.replace(self.tmp_dir, target)
+        except OSError:
+            # 其他任务已写入相同内容的缓存
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        self.cache.evict(keep=self.content_hash)
+
+    def abort(self):
+        """放弃写入"""
+        self._file.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class ParseCache:
+    """解析结果缓存
+
+    以上传文件的内容哈希为键保存列式详情数据和主记录中由文件内容决定的字段，
+    重试、换文件名重新导入、重新处理时无需再次解析。
+    缓存总大小超过 max_bytes 时按最近使用时间（元数据文件的 mtime，命中时更新）淘汰。
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root or settings.parse_cache_dir)
+        self.max_bytes = settings.parse_cache_max_bytes if max_bytes is None else max_bytes
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，返回 {"details": DetailColumns, "summary": dict}"""
+        path = self.root / content_hash
+        meta_path = path / _META_FILE
+        if not meta_path.exists():
+            return None
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != CACHE_VERSION:
+                self.delete(content_hash)
+                return None
+
+            parts = []
+            with open(path / _DATA_FILE, "rb") as f:
+                for segment in meta["segments"]:
+                    parts.append(decode_segment(segment["encoding"], f.read(segment["size"]), segment["rows"]))
+            details = DetailColumns.concat(parts)
+            if len(details) != meta["rows"]:
+                raise ValueError(f"expected {meta['rows']} rows, found {len(details)}")
+
+            # 记录最近使用时间
+            os.utime(meta_path)
+            return {"details": details, "summary": meta["summary"]}
+
+        except Exception as e:
+            logger.error(f"Error reading parse cache {content_hash}: {str(e)}")
+            return None
+
+    def writer(self, content_hash: str) -> ParseCacheWriter:
+        """创建缓存写入器"""
+        return ParseCacheWriter(self, content_hash)
+
+    def put(self, content_hash: str, details: DetailColumns, summary: Dict[str, Any]):
+        """写入完整的解析结果"""
+        writer = self.writer(content_hash)
+        try:
+            writer.append(details)
+            writer.commit(summary)
+        except Exception as e:
+            writer.abort()
+            logger.error(f"Error writing parse cache {content_hash}: {str(e)}")
+
+    def delete(self, content_hash: str) -> bool:
+        """删除缓存"""
+        path = self.root / content_hash
+        if not path.exists():
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """按最近使用时间淘汰缓存直到总大小不超过 max_bytes，返回淘汰的条目数"""
+        if not self.max_bytes or not self.root.exists():
+            return 0
+
+        entries = []
+        total = 0
+        for path in self.root.iterdir():
+            # 跳过写入中的临时目录
+            if path.name.startswith(".") or not path.is_dir():
+                continue
+            try:
+                size = sum(file.stat().st_size for file in path.iterdir())
+                meta_path = path / _META_FILE
+                used_at = meta_path.stat().st_mtime if meta_path.exists() else 0
+            except OSError:
+                continue
+            entries.append((used_at, path.name, size))
+            total += size
+
+        evicted = 0
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            self.delete(name)
+            total -= size
+            evicted += 1
+
+        if evicted:
+            logger.info(f"Evicted {evicted} parse cache entries, {total} bytes remain")
+        return evicted
+
+
+# 创建全局解析缓存
+parse_cache = ParseCache()
@@ -0,0 +1,297 @@
+"""
+表格文件读取后端
+"""
+import re
+import csv
+import codecs
+import zipfile
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from pathlib import Path
+import pandas as pd
+from openpyxl import load_workbook
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # 可选依赖
+    CalamineWorkbook = None
+
+try:
+    import xlrd
+except ImportError:  # 可选依赖
+    xlrd = None
+
+try:
+    import pyarrow
+except ImportError:  # 可选依赖
+    pyarrow = None
+
+
+def _make_header(raw: Tuple[Any, ...]) -> List[str]:
+    """生成与 pandas 一致的表头（空列名补位、重复列名加后缀）"""
+    header = []
+    seen: Dict[str, int] = {}
+    for i, col in enumerate(raw):
+        name = f"Unnamed: {i}" if col is None or col == "" else str(col)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+
+def _frame_from_rows(rows: Iterator[Tuple[Any, ...]], nrows: Optional[int] = None) -> pd.DataFrame:
+    """由原始行构建数据框（首行为表头）"""
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+
+    data = []
+    for row in rows:
+        if nrows is not None and len(data) >= nrows:
+            break
+        data.append(row)
+
+    width = len(header)
+    data = [tuple(row[:width]) + (None,) * (width - len(row)) for row in data]
+    return pd.DataFrame(data, columns=_make_header(header), dtype=object)
+
+
+# 工作表尺寸声明，如 <dimension ref="A1:C60001"/>
+_DIMENSION_PATTERN = re.compile(rb'<dimension ref="(?:[A-Z]+\d+:)?[A-Z]+(\d+)"')
+
+
+def _xlsx_dimension_rows(file_path: str) -> Optional[int]:
+    """读取 xlsx 首个工作表声明的尺寸（不解析单元格），未声明时统计行标签数"""
+    with zipfile.ZipFile(file_path) as archive:
+        sheets = sorted(
+            (name for name in archive.namelist()
+             if name.startswith("xl/worksheets/sheet") and name.endswith(".xml")),
+            key=lambda name: int(re.sub(r"\D", "", name) or 0)
+        )
+        if not sheets:
+            return None
+        
+        with archive.open(sheets[0]) as f:
+            head = f.read(4096)
+            match = _DIMENSION_PATTERN.search(head)
+            if match and int(match.group(1)) > 1:
+                return int(match.group(1)) - 1
+            
+            count = head.count(b"<row")
+            tail = head[-3:]
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                data = tail + chunk
+                count += data.count(b"<row")
+                tail = data[-3:]  # 跨块的标签在下一块中计数
+    
+    return max(count - 1, 0)
+
+
+class SpreadsheetReader:
+    """表格读取后端基类"""
+
+    name: str = ""
+    extensions: Tuple[str, ...] = ()
+    priority: int = 100  # 数值越小越快
+    lazy: bool = True  # iter_rows 逐行读取，不预先加载整个工作表
+
+    def is_available(self) -> bool:
+        return True
+
+    def supports(self, file_path: str) -> bool:
+        return Path(file_path).suffix.lower() in self.extensions
+
+    def read_frame(self, file_path: str, nrows: Optional[int] = None) -> pd.DataFrame:
+        """读取首个工作表为数据框"""
+        return _frame_from_rows(self.iter_rows(file_path), nrows)
+
+    def iter_rows(self, file_path: str) -> Iterator[Tuple[Any, ...]]:
+        """逐行读取首个工作表（含表头行），空单元格为 None"""
+        raise NotImplementedError
+
+    def read_header(self, file_path: str) -> Tuple[Any, ...]:
+        """只读取表头行（逐行读取的后端不解析其余数据）"""
+        rows = self.iter_rows(file_path)
+        try:
+            return tuple(next(rows, ()))
+        finally:
+            rows.close()
+    
+    def estimate_rows(self, file_path: str) -> Optional[int]:
+        """不读取全部数据估计数据行数（不含表头），无法估计时返回 None"""
+        return None
+
+
+class OpenpyxlReader(SpreadsheetReader):
+    """openpyxl 读取后端"""
+
+    name = "openpyxl"
+    extensions = (".xlsx", ".xlsm")
+    priority = 50
+
+    def read_frame(self, file_path: str, nrows: Optional[int] = None) -> pd.DataFrame:
+        return pd.read_excel(file_path, engine='openpyxl', nrows=nrows)
+
+    def iter_rows(self, file_path: str) -> Iterator[Tuple[Any, ...]]:
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    
+    def estimate_rows(self, file_path: str) -> Optional[int]:
+        return _xlsx_dimension_rows(file_path)
+
+
+class CalamineReader(SpreadsheetReader):
+    """calamine（Rust实现）读取后端"""
+
+    name = "calamine"
+    extensions = (".xlsx", ".xlsm", ".xls", ".xlsb", ".ods")
+    priority = 10
+    lazy = False  # 打开工作表时即解析全部单元格
+
+    def is_available(self) -> bool:
+        return CalamineWorkbook is not None
+
+    def iter_rows(self, file_path: str) -> Iterator[Tuple[Any, ...]]:
+        workbook = CalamineWorkbook.from_path(file_path)
+        sheet = workbook.get_sheet_by_index(0)
+        for row in sheet.iter_rows():
+            yield tuple(None if value == "" else value for value in row)
+    
+    def estimate_rows(self, file_path: str) -> Optional[int]:
+        if Path(file_path).suffix.lower() in (".xlsx", ".xlsm"):
+            return _xlsx_dimension_rows(file_path)
+        return None
+
+
+class XlrdReader(SpreadsheetReader):
+    """xlrd 读取后端（旧版 .xls）"""
+
+    name = "xlrd"
+    extensions = (".xls",)
+    priority = 60
+    lazy = False
+
+    def is_available(self) -> bool:
+        return xlrd is not None
+
+    def read_frame(self, file_path: str, nrows: Optional[int] = None) -> pd.DataFrame:
+        return pd.read_excel(file_path, engine='xlrd', nrows=nrows)
+
+    def iter_rows(self, file_path: str) -> Iterator[Tuple[Any, ...]]:
+        workbook = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            sheet = workbook.sheet_by_index(0)
+            for i in range(sheet.nrows):
+                yield tuple(None if value == "" else value for value in sheet.row_values(i))
+        finally:
+            workbook.release_resources()
+    
+    def estimate_rows(self, file_path: str) -> Optional[int]:
+        workbook = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            return max(workbook.sheet_by_index(0).nrows - 1, 0)
+        finally:
+            workbook.release_resources()
+
+
+class CsvReader(SpreadsheetReader):
+    """CSV 读取后端（有 pyarrow 时使用多线程解析）"""
+
+    name = "csv"
+    extensions = (".csv",)
+    priority = 10
+
+    def detect_encoding(self, file_path: str) -> str:
+        """检测文本编码（UTF-8 或 GB18030）"""
+        with open(file_path, "rb") as f:
+            sample = f.read(65536)
+        try:
+            codecs.getincrementaldecoder("utf-8-sig")().decode(sample, final=False)
+            return "utf-8-sig"
+        except UnicodeDecodeError:
+            return "gb18030"
+
+    def read_frame(self, file_path: str, nrows: Optional[int] = None) -> pd.DataFrame:
+        encoding = self.detect_encoding(file_path)
+        if pyarrow is not None and nrows is None:
+            return pd.read_csv(file_path, engine='pyarrow', encoding=encoding)
+        return pd.read_csv(file_path, encoding=encoding, nrows=nrows)
+
+    def iter_rows(self, file_path: str) -> Iterator[Tuple[Any, ...]]:
+        encoding = self.detect_encoding(file_path)
+        with open(file_path, "r", encoding=encoding, newline="") as f:
+            for row in csv.reader(f):
+                yield tuple(None if value == "" else value for value in row)
+    
+    def estimate_rows(self, file_path: str) -> Optional[int]:
+        """按换行符计数（分块读取，不解析）"""
+        lines = 0
+        last = b""
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                lines += chunk.count(b"\n")
+                last = chunk
+        if last and not last.endswith(b"\n"):
+            lines += 1
+        return max(lines - 1, 0)
+
+
+# 已注册的读取后端
+READERS: Dict[str, SpreadsheetReader] = {
+    reader.name: reader
+    for reader in (CalamineReader(), CsvReader(), OpenpyxlReader(), XlrdReader())
+}
+
+
+def available_backends() -> Dict[str, List[str]]:
+    """可用后端及其支持的扩展名"""
+    return {
+        name: list(reader.extensions)
+        for name, reader in READERS.items()
+        if reader.is_available()
+    }
+
+
+def get_reader(
+    file_path: str,
+    backend: Optional[str] = None,
+    streaming: bool = False
+) -> SpreadsheetReader:
+    """选择读取后端：指定后端优先，否则按扩展名选择最快的可用后端
+
+    streaming=True 用于逐行读取（流式解析、预检）：优先选择逐行读取的后端，
+    整表读取更快但需先加载整个工作表的后端只用于 read_frame 全量读取。
+    """
+    if backend:
+        reader = READERS.get(backend)
+        if reader is None:
+            raise ValueError(f"Unknown reader backend: {backend}")
+        if not reader.is_available():
+            raise ValueError(f"Reader backend not installed: {backend}")
+        if not reader.supports(file_path):
+            raise ValueError(
+                f"Reader backend {backend} does not support {Path(file_path).suffix} files"
+            )
+        return reader
+
+    candidates = [
+        reader for reader in READERS.values()
+        if reader.supports(file_path) and reader.is_available()
+    ]
+    if not candidates:
+        raise ValueError(f"No reader backend available for {Path(file_path).suffix} files")
+
+    if streaming:
+        candidates = [reader for reader in candidates if reader.lazy] or candidates
+    return min(candidates, key=lambda reader: reader.priority)
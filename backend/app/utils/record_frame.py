@@ -0,0 +1,170 @@
+"""
+测试记录列式数据（统计分析用）
+"""
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+
+# 可统计的记录级指标（与 test_records 表列一致）
+RECORD_METRICS = ("pass_rate", "voltage", "current", "power", "resistance")
+
+
+class RecordFrame:
+    """测试记录列式容器
+
+    查询结果只在构建时遍历一次：test_date 转为 datetime64 数组，device_model 编码为整数
+    （-1 表示缺失或空，型号见 device_models），各指标为 float64 数组、缺失值为 NaN。
+    统计方法在数组上按掩码和 bincount 一次完成分组计算。
+    """
+
+    def __init__(
+        self,
+        test_date: np.ndarray,
+        device_codes: np.ndarray,
+        device_models: List[str],
+        metrics: Dict[str, np.ndarray]
+    ):
+        self.test_date = test_date
+        self.device_codes = device_codes
+        self.device_models = device_models
+        self.metrics = metrics
+
+    def __len__(self) -> int:
+        return len(self.device_codes)
+
+    def __getitem__(self, metric: str) -> np.ndarray:
+        return self.metrics[metric]
+
+    @classmethod
+    def from_records(
+        cls,
+        records: List[Dict[str, Any]],
+        metrics: Sequence[str] = ()
+    ) -> "RecordFrame":
+        """由查询结果构建（缺少的列视为全部缺失）"""
+        count = len(records)
+
+        test_date = np.full(count, np.datetime64("NaT"), dtype="datetime64[us]")
+        if count and "test_date" in records[0]:
+            # ISO8601 解析兼容带与不带小数秒的混合格式
+            parsed = pd.to_datetime([record["test_date"] for record in records], format="ISO8601")
+            if parsed.tz is not None:
+                parsed = parsed.tz_localize(None)
+            test_date = parsed.values.astype("datetime64[us]")
+
+        device_codes = np.full(count, -1, dtype=np.int64)
+        device_models: List[str] = []
+        if count and "device_model" in records[0]:
+            codes, uniques = pd.factorize(
+                np.array([record["device_model"] or None for record in records], dtype=object)
+            )
+            device_codes = codes.astype(np.int64)
+            device_models = [str(model) for model in uniques]
+
+        columns = {}
+        for metric in metrics:
+            columns[metric] = np.fromiter(
+                (np.nan if record.get(metric) is None else record[metric] for record in records),
+                dtype=np.float64,
+                count=count
+            )
+
+        return cls(test_date, device_codes, device_models, columns)
+
+    @property
+    def day(self) -> np.ndarray:
+        """测试日期（datetime64[D]）"""
+        return self.test_date.astype("datetime64[D]")
+
+    def floor(self, period: str) -> np.ndarray:
+        """按周期取整的测试时间（hour/day/week/month，周从周一开始）"""
+        if period == "hour":
+            return self.test_date.astype("datetime64[h]")
+        day = self.day
+        if period == "day":
+            return day
+        if period == "week":
+            # 1970-01-01 为周四，加 3 后按 7 取模得到周一为 0 的星期序号
+            weekday = (day.astype(np.int64) + 3) % 7
+            return day - weekday.astype("timedelta64[D]")
+        if period == "month":
+            return day.astype("datetime64[M]").astype("datetime64[D]")
+        raise ValueError(f"Unknown period: {period}")
+
+    def device_index(self, device_model: str) -> int:
+        """型号编码（不存在时为 -1）"""
+        try:
+            return self.device_models.index(device_model)
+        except ValueError:
+            return -1
+
+    def device_counts(self) -> Dict[str, int]:
+        """各型号记录数（按首次出现的顺序，不含缺失型号）"""
+        present = self.device_codes[self.device_codes >= 0]
+        counts = np.bincount(present, minlength=len(self.device_models))
+        return {
+            model: int(count)
+            for model, count in zip(self.device_models, counts)
+            if count
+        }
+
+    def mean(self, metric: str, mask: Optional[np.ndarray] = None) -> Optional[float]:
+        """指标平均值（可只统计掩码内的记录，没有非空值时返回 None）"""
+        values = self.metrics[metric] if mask is None else self.metrics[metric][mask]
+        values = values[~np.isnan(values)]
+        return float(values.mean()) if len(values) else None
+
+    def group(self, keys: np.ndarray, metric: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """按键分组，返回 (键, 记录数, 指标非空数, 指标和)"""
+        uniques, inverse = np.unique(keys, return_inverse=True)
+        size = len(uniques)
+        counts = np.bincount(inverse, minlength=size)
+
+        values = self.metrics[metric]
+        valid = ~np.isnan(values)
+        value_counts = np.bincount(inverse[valid], minlength=size)
+        sums = np.bincount(inverse[valid], weights=values[valid], minlength=size)
+        return uniques, counts, value_counts, sums
+
+
+class MetricAccumulator:
+    """跨页累加单个指标的非空数与和"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.total += float(values.sum())
+
+    @property
+    def mean(self) -> Optional[float]:
+        """平均值（没有非空值时返回 None）"""
+        return self.total / self.count if self.count else None
+
+
+class GroupAccumulator:
+    """跨页累加分组统计（记录数、指标非空数与和）"""
+
+    def __init__(self):
+        self.groups: Dict[Any, List[float]] = {}
+
+    def add(self, frame: RecordFrame, keys: np.ndarray, metric: str):
+        uniques, counts, value_counts, sums = frame.group(keys, metric)
+        for key, count, value_count, total in zip(
+            uniques.tolist(), counts.tolist(), value_counts.tolist(), sums.tolist()
+        ):
+            group = self.groups.setdefault(key, [0, 0, 0.0])
+            group[0] += count
+            group[1] += value_count
+            group[2] += total
+
+    def items(self) -> List[Tuple[Any, int, Optional[float]]]:
+        """按键排序返回 (键, 记录数, 指标平均值)，平均值在组内没有非空值时为 None"""
+        return [
+            (key, count, total / value_count if value_count else None)
+            for key, (count, value_count, total) in sorted(self.groups.items())
+        ]
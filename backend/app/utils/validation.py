@@ -0,0 +1,182 @@
+"""
+详细数据校验规则引擎
+"""
+import math
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+from app.core.config import settings
+from app.utils.detail_columns import DetailColumns
+
+
+# 规则错误位（每行一个位掩码，可同时命中多条规则）
+NON_FINITE = 1 << 0
+MISSING_VALUE = 1 << 1
+VOLTAGE_RANGE = 1 << 2
+CURRENT_RANGE = 1 << 3
+TEMPERATURE_RANGE = 1 << 4
+HUMIDITY_RANGE = 1 << 5
+TIME_NOT_MONOTONIC = 1 << 6
+OVER_RATED_VOLTAGE = 1 << 7
+OVER_RATED_CURRENT = 1 << 8
+
+RULES: Dict[str, int] = {
+    "non_finite": NON_FINITE,
+    "missing_value": MISSING_VALUE,
+    "voltage_range": VOLTAGE_RANGE,
+    "current_range": CURRENT_RANGE,
+    "temperature_range": TEMPERATURE_RANGE,
+    "humidity_range": HUMIDITY_RANGE,
+    "time_not_monotonic": TIME_NOT_MONOTONIC,
+    "over_rated_voltage": OVER_RATED_VOLTAGE,
+    "over_rated_current": OVER_RATED_CURRENT,
+}
+
+# 范围规则：字段 → 错误位
+_RANGE_RULES = (
+    ("voltage_value", VOLTAGE_RANGE),
+    ("current_value", CURRENT_RANGE),
+    ("temperature", TEMPERATURE_RANGE),
+    ("humidity", HUMIDITY_RANGE),
+)
+
+# 必填测量字段（缺失值的行无法参与判定）
+_REQUIRED_FIELDS = ("voltage_value", "current_value")
+
+
+def describe(mask: int) -> List[str]:
+    """错误位掩码转为规则名称列表"""
+    return [name for name, bit in RULES.items() if mask & bit]
+
+
+class DetailValidator:
+    """详细数据校验器
+
+    对每个列式分块一次性计算逐行错误位掩码，不逐行循环；
+    时间单调性跨分块检查，因此同一数据流应使用同一个校验器实例。
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, List[float]]] = None,
+        rated_voltage: Optional[float] = None,
+        rated_current: Optional[float] = None,
+        rated_margin: Optional[float] = None
+    ):
+        self.limits = settings.validation_limits if limits is None else limits
+        self.rated_voltage = rated_voltage
+        self.rated_current = rated_current
+        self.rated_margin = settings.validation_rated_margin if rated_margin is None else rated_margin
+        self._last_time: Optional[float] = None
+
+    @classmethod
+    def for_device(cls, device: Optional[Dict[str, Any]]) -> "DetailValidator":
+        """按设备额定值创建校验器（规格中的 max_voltage/max_current 优先）"""
+        if not device:
+            return cls()
+        specifications = device.get("specifications") or {}
+        return cls(
+            rated_voltage=specifications.get("max_voltage") or device.get("rated_voltage"),
+            rated_current=specifications.get("max_current") or device.get("rated_current")
+        )
+
+    def evaluate(self, chunk: DetailColumns) -> np.ndarray:
+        """计算分块的逐行错误位掩码（0 表示该行有效）"""
+        mask = np.zeros(len(chunk), dtype=np.uint16)
+        if len(chunk) == 0:
+            return mask
+
+        for values in chunk.columns.values():
+            if values is not None:
+                mask[np.isinf(values)] |= NON_FINITE
+
+        for field in _REQUIRED_FIELDS:
+            values = chunk[field]
+            if values is not None:
+                mask[np.isnan(values)] |= MISSING_VALUE
+
+        # NaN 比较结果为 False，缺失值不会重复计入范围规则
+        for field, bit in _RANGE_RULES:
+            values = chunk[field]
+            limit = self.limits.get(field)
+            if values is None or not limit:
+                continue
+            low, high = limit
+            mask[(values < low) | (values > high)] |= bit
+
+        # 时间点必须严格递增（与此前的最大时间点比较）
+        time_points = chunk["time_point"]
+        previous = np.empty_like(time_points)
+        previous[0] = -np.inf if self._last_time is None else self._last_time
+        previous[1:] = time_points[:-1]
+        np.maximum.accumulate(previous, out=previous)
+        mask[~(time_points > previous)] |= TIME_NOT_MONOTONIC
+        self._last_time = float(max(previous[-1], time_points[-1]))
+
+        # 超出设备额定值（按额定值的 rated_margin 倍判定）
+        for field, rated, bit in (
+            ("voltage_value", self.rated_voltage, OVER_RATED_VOLTAGE),
+            ("current_value", self.rated_current, OVER_RATED_CURRENT),
+        ):
+            values = chunk[field]
+            if values is None or not rated:
+                continue
+            mask[np.abs(values) > float(rated) * self.rated_margin] |= bit
+
+        return mask
+
+    def apply(self, chunk: DetailColumns, report: Optional["RejectionReport"] = None) -> DetailColumns:
+        """批量剔除无效行，返回有效行组成的分块"""
+        mask = self.evaluate(chunk)
+        if report is not None:
+            report.add(chunk, mask)
+        if not mask.any():
+            return chunk
+        return chunk.take(mask == 0)
+
+
+class RejectionReport:
+    """被剔除行的汇总报告：各规则命中行数与少量样本行"""
+
+    def __init__(self, sample_limit: Optional[int] = None):
+        self.sample_limit = settings.rejected_sample_limit if sample_limit is None else sample_limit
+        self.checked_rows = 0
+        self.rejected_rows = 0
+        self.rule_counts: Dict[str, int] = {name: 0 for name in RULES}
+        self.samples: List[Dict[str, Any]] = []
+
+    def add(self, chunk: DetailColumns, mask: np.ndarray):
+        """累计一个分块的校验结果"""
+        self.checked_rows += len(mask)
+        rejected = np.flatnonzero(mask)
+        if len(rejected) == 0:
+            return
+
+        self.rejected_rows += len(rejected)
+        for name, bit in RULES.items():
+            self.rule_counts[name] += int(np.count_nonzero(mask & bit))
+
+        room = self.sample_limit - len(self.samples)
+        if room > 0:
+            picked = rejected[:room]
+            for row, row_mask in zip(chunk.take(picked).to_dicts(), mask[picked]):
+                # inf 无法写入 JSON，置为 None（规则中已记录 non_finite）
+                sample = {
+                    key: None if isinstance(value, float) and not math.isfinite(value) else value
+                    for key, value in row.items()
+                }
+                sample["rules"] = describe(int(row_mask))
+                self.samples.append(sample)
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        """命中的规则计数（省略为 0 的规则）"""
+        return {name: count for name, count in self.rule_counts.items() if count}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "checked_rows": self.checked_rows,
+            "rejected_rows": self.rejected_rows,
+            "rules": self.counts,
+            "samples": self.samples
+        }
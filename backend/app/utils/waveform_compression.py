@@ -0,0 +1,133 @@
+"""
+入库前的有损波形压缩
+"""
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+from app.core.config import settings
+from app.utils.detail_columns import DetailColumns
+
+
+def swinging_door(
+    time_points: np.ndarray,
+    channels: List[np.ndarray],
+    tolerances: List[float]
+) -> np.ndarray:
+    """旋转门压缩，返回需要保留的行掩码
+
+    从锚点出发，为每个通道维护可行斜率区间（使区间内所有采样点与直线的偏差不超过容差）；
+    新采样点与锚点连线的斜率落在任一通道的区间之外时，门关闭：上一点存档并作为新锚点。
+    所有通道同时关门，保证每个通道在相邻保留点之间线性重建的误差都不超过各自容差。
+    含缺失值的行及其后一行总是保留。
+    """
+    n = len(time_points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+
+    missing = np.zeros(n, dtype=bool)
+    for values in channels:
+        missing |= np.isnan(values)
+    keep |= missing
+
+    t = time_points.tolist()
+    columns = [values.tolist() for values in channels]
+    missing_rows = missing.tolist()
+    count = len(columns)
+    lower = [float("-inf")] * count
+    upper = [float("inf")] * count
+
+    anchor = 0
+    i = 1
+    while i < n:
+        dt = t[i] - t[anchor]
+        if missing_rows[i] or missing_rows[anchor] or dt <= 0:
+            keep[i] = True
+            anchor = i
+            lower = [float("-inf")] * count
+            upper = [float("inf")] * count
+            i += 1
+            continue
+
+        closed = False
+        for k in range(count):
+            slope = (columns[k][i] - columns[k][anchor]) / dt
+            if slope < lower[k] or slope > upper[k]:
+                closed = True
+                break
+
+        if closed:
+            # 上一点存档并作为新锚点，当前点相对新锚点重新判定
+            anchor = i - 1
+            keep[anchor] = True
+            lower = [float("-inf")] * count
+            upper = [float("inf")] * count
+            continue
+
+        for k in range(count):
+            origin = columns[k][anchor]
+            value = columns[k][i]
+            tolerance = tolerances[k]
+            lower[k] = max(lower[k], (value - tolerance - origin) / dt)
+            upper[k] = min(upper[k], (value + tolerance - origin) / dt)
+        i += 1
+
+    return keep
+
+
+class WaveformCompressor:
+    """波形压缩器
+
+    按通道容差只保留线性重建所需的采样点；每个分块独立压缩并保留首尾行，
+    断点续传时已提交的数据与后续数据之间无需额外处理。
+    """
+
+    method = "swinging_door"
+
+    def __init__(self, tolerances: Dict[str, float]):
+        self.tolerances = {
+            field: float(tolerance)
+            for field, tolerance in tolerances.items()
+            if tolerance is not None and float(tolerance) > 0
+        }
+        self.input_rows = 0
+        self.kept_rows = 0
+
+    @classmethod
+    def for_device(cls, device: Optional[Dict[str, Any]] = None) -> "WaveformCompressor":
+        """按设备规格中的 compression_tolerances 覆盖默认容差"""
+        tolerances = dict(settings.compression_tolerances)
+        specifications = (device or {}).get("specifications") or {}
+        tolerances.update(specifications.get("compression_tolerances") or {})
+        return cls(tolerances)
+
+    def apply(self, chunk: DetailColumns) -> DetailColumns:
+        """压缩一个分块"""
+        self.input_rows += len(chunk)
+        fields = [field for field in self.tolerances if chunk[field] is not None]
+        if not fields or len(chunk) <= 2:
+            self.kept_rows += len(chunk)
+            return chunk
+
+        keep = swinging_door(
+            chunk["time_point"],
+            [chunk[field] for field in fields],
+            [self.tolerances[field] for field in fields]
+        )
+        self.kept_rows += int(np.count_nonzero(keep))
+        return chunk.take(keep)
+
+    @property
+    def ratio(self) -> float:
+        """压缩比（输入行数 / 保留行数）"""
+        return round(self.input_rows / self.kept_rows, 2) if self.kept_rows else 1.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "tolerances": self.tolerances,
+            "input_rows": self.input_rows,
+            "kept_rows": self.kept_rows,
+            "ratio": self.ratio
+        }
@@ -1,16 +1,18 @@
 """
 WebSocket连接管理
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set
 import json
 from datetime import datetime
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, status
 from loguru import logger
+from supabase import Client
 import asyncio
 
-from app.core.auth import get_current_user
+from app.core.auth import get_current_user, authenticate_websocket
 from app.services.statistics_service import StatisticsService
 from app.core.database import get_db
+from app.core.progress_store import progress_store
 
 router = APIRouter()
 
@@ -21,6 +23,7 @@ class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.user_connections: Dict[str, WebSocket] = {}
+        self.import_subscribers: Dict[str, Set[WebSocket]] = {}
     
     async def connect(self, websocket: WebSocket, user_id: str = None):
         """建立连接"""
@@ -51,6 +54,27 @@ class ConnectionManager:
             except Exception as e:
                 logger.error(f"Error broadcasting message: {str(e)}")
     
+    def subscribe_import(self, websocket: WebSocket, import_id: str):
+        """订阅导入任务进度"""
+        self.import_subscribers.setdefault(import_id, set()).add(websocket)
+    
+    def unsubscribe_import(self, websocket: WebSocket, import_id: str):
+        """取消订阅导入任务进度"""
+        subscribers = self.import_subscribers.get(import_id)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.import_subscribers[import_id]
+    
+    async def send_to_import_subscribers(self, message: dict, import_id: str):
+        """只向订阅了该导入任务的连接发送消息"""
+        for connection in list(self.import_subscribers.get(import_id, ())):
+            try:
+                await connection.send_json(message)
+            except Exception as e:
+                logger.error(f"Error sending import progress: {str(e)}")
+                self.unsubscribe_import(connection, import_id)
+    
     async def broadcast_to_group(self, message: dict, group: str):
         """向特定组广播消息"""
         # 这里可以实现更复杂的分组逻辑
@@ -134,14 +158,58 @@ async def websocket_notifications(websocket: WebSocket, user_id: str):
         manager.disconnect(websocket, user_id)
 
 
+@router.websocket("/ws/imports/{import_id}")
+async def websocket_import_progress(
+    websocket: WebSocket,
+    import_id: str,
+    db: Client = Depends(get_db)
+):
+    """
+    导入进度WebSocket连接
+    
+    连接前校验访问令牌（token 查询参数或 Authorization 头），
+    连接后先发送当前进度，之后推送该导入任务的进度更新
+    """
+    user = await authenticate_websocket(websocket, db)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await manager.connect(websocket)
+    manager.subscribe_import(websocket, import_id)
+    
+    try:
+        progress = await progress_store.get(import_id)
+        if progress is not None:
+            await websocket.send_json({
+                "type": "import_progress",
+                "import_id": import_id,
+                "data": progress
+            })
+        
+        while True:
+            # 处理心跳
+            data = await websocket.receive_text()
+            if data == "ping":
+                await websocket.send_text("pong")
+    
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"WebSocket error for import {import_id}: {str(e)}")
+    finally:
+        manager.unsubscribe_import(websocket, import_id)
+        manager.disconnect(websocket)
+
+
 async def send_import_progress(import_id: str, progress: dict):
-    """发送导入进度更新"""
+    """发送导入进度更新（只发送给订阅了该导入任务的客户端）"""
     message = {
         "type": "import_progress",
         "import_id": import_id,
         "data": progress
     }
-    await manager.broadcast(message)
+    await manager.send_to_import_subscribers(message, import_id)
 
 
 async def send_alert(alert_type: str, message: str, severity: str = "info"):
@@ -153,4 +221,10 @@ async def send_alert(alert_type: str, message: str, severity: str = "info"):
         "severity": severity,
         "timestamp": datetime.now().isoformat()
     }
-    await manager.broadcast(alert)
\ No newline at end of file
+    await manager.broadcast(alert)
+
+
+# 进度写入后推送给订阅的客户端
+progress_store.add_listener(send_import_progress)
+
+websocket_router = router
@@ -0,0 +1,21 @@
+"""
+测试公共配置
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 应用配置的必填项（测试不连接数据库）
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+# 配置档案、解析缓存和任务队列写入临时目录，不污染工作目录
+_STATE_DIR = tempfile.mkdtemp(prefix="pv-tests-")
+os.environ.setdefault("INSTRUMENT_PROFILE_PATH", os.path.join(_STATE_DIR, "instrument_profiles.json"))
+os.environ.setdefault("PARSE_CACHE_DIR", os.path.join(_STATE_DIR, "parsed"))
+os.environ.setdefault("IMPORT_QUEUE_PATH", os.path.join(_STATE_DIR, "import_jobs.db"))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,114 @@
+"""
+列角色识别测试
+"""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app.utils.column_resolver import (
+    ColumnRoleResolver,
+    InstrumentProfileRegistry,
+    header_fingerprint,
+)
+
+
+# 现场数据文件的表头
+DETAIL_HEADER = ["序号", "电流 (A)", "电压 (V)", "功率 (W)", "时间戳", "设备地址", "设备类型"]
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return InstrumentProfileRegistry(str(tmp_path / "profiles.json"))
+
+
+def test_infer_detail_header():
+    mapping = ColumnRoleResolver().resolve(DETAIL_HEADER)
+
+    assert mapping.source == "inferred"
+    assert mapping.roles == {
+        "current": "电流 (A)",
+        "voltage": "电压 (V)",
+        "power": "功率 (W)",
+        "time": "时间戳",
+    }
+
+
+@pytest.mark.parametrize("header, expected", [
+    (["时间(s)", "电压(V)", "电流(A)", "温度(℃)", "湿度(%RH)"],
+     {"time": "时间(s)", "voltage": "电压(V)", "current": "电流(A)",
+      "temperature": "温度(℃)", "humidity": "湿度(%RH)"}),
+    (["测试时间（ms）", "输出电压【mV】", "负载电流（mA）"],
+     {"time": "测试时间（ms）", "voltage": "输出电压【mV】", "current": "负载电流（mA）"}),
+    (["Time", "Voltage (V)", "Current (A)", "Power (W)"],
+     {"time": "Time", "voltage": "Voltage (V)", "current": "Current (A)", "power": "Power (W)"}),
+])
+def test_infer_header_variants(header, expected):
+    assert ColumnRoleResolver().resolve(header).roles == expected
+
+
+def test_unit_only_header():
+    # 没有关键词时按单位识别
+    roles = ColumnRoleResolver().resolve(["t", "U (V)", "I (A)"]).roles
+    assert roles == {"voltage": "U (V)", "current": "I (A)"}
+
+
+@pytest.mark.skipif(not DATA_DIR.exists(), reason="sample data not available")
+def test_sample_files():
+    for path in sorted(DATA_DIR.glob("*.xlsx")):
+        header = pd.read_excel(path, nrows=0).columns.tolist()
+        roles = ColumnRoleResolver().resolve(header).roles
+        assert {"voltage", "current", "time"} <= set(roles), path.name
+
+
+def test_inferred_mapping_cached_by_fingerprint(registry):
+    resolver = ColumnRoleResolver(registry)
+    first = resolver.resolve(DETAIL_HEADER)
+    second = resolver.resolve(DETAIL_HEADER)
+
+    assert first.source == "inferred"
+    assert second.source == "cached"
+    assert second.roles == first.roles
+    assert second.fingerprint == header_fingerprint(DETAIL_HEADER)
+
+
+def test_pinned_mapping_wins(registry):
+    registry.pin_instrument("PV-SD-2000", {"voltage": "功率 (W)", "current": "电流 (A)"})
+    resolver = ColumnRoleResolver(registry)
+
+    mapping = resolver.resolve(DETAIL_HEADER, instrument="PV-SD-2000")
+
+    assert mapping.source == "pinned"
+    assert mapping.roles == {"voltage": "功率 (W)", "current": "电流 (A)"}
+    # 其他型号不受影响
+    assert resolver.resolve(DETAIL_HEADER, instrument="PV-SD-3000").source == "inferred"
+
+
+def test_pinned_mapping_ignored_when_columns_missing(registry):
+    registry.pin_instrument("PV-SD-2000", {"voltage": "输出电压"})
+    mapping = ColumnRoleResolver(registry).resolve(DETAIL_HEADER, instrument="PV-SD-2000")
+    assert mapping.source == "inferred"
+
+
+def test_pin_rejects_unknown_role(registry):
+    with pytest.raises(ValueError):
+        registry.pin_instrument("PV-SD-2000", {"frequency": "频率 (Hz)"})
+
+
+def test_pin_visible_to_other_registry_instances(registry, tmp_path):
+    # 命令行固定的映射对已运行的进程生效，且不会被其他进程保存档案时覆盖
+    other = InstrumentProfileRegistry(str(tmp_path / "profiles.json"))
+    other.get_pinned("PV-SD-2000")
+
+    registry.pin_instrument("PV-SD-2000", {"voltage": "电压 (V)"})
+    other.save_profile("abc", ["a"], {})
+
+    assert other.get_pinned("PV-SD-2000") == {"voltage": "电压_(v)"}
+    assert InstrumentProfileRegistry(str(tmp_path / "profiles.json")).list_pinned() == {
+        "PV-SD-2000": {"voltage": "电压_(v)"}
+    }
+
+    assert registry.unpin_instrument("PV-SD-2000")
+    assert other.get_pinned("PV-SD-2000") is None
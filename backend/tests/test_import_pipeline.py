@@ -0,0 +1,120 @@
+"""
+导入流水线断点测试
+"""
+import asyncio
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.services.import_pipeline import ImportPipeline
+from app.utils.detail_columns import DetailColumns
+from app.utils.validation import DetailValidator
+
+
+ROWS = 10
+
+
+class FakeRecordService:
+    """按分块设定写入耗时，使写入任务乱序完成"""
+
+    def __init__(self, delays, failed=()):
+        self.delays = delays
+        self.failed = set(failed)
+        self.completed = []
+
+    async def create_details_bulk(self, record_id, chunk):
+        if len(chunk) == 0:
+            return {"inserted_rows": 0, "failed_rows": 0, "chunks": 0, "failed_chunks": 0, "write_seconds": 0.0}
+        index = int(chunk["time_point"][0]) // ROWS
+        await asyncio.sleep(self.delays[index])
+        self.completed.append(index)
+        ok = index not in self.failed
+        return {
+            "inserted_rows": len(chunk) if ok else 0,
+            "failed_rows": 0 if ok else len(chunk),
+            "chunks": 1,
+            "failed_chunks": 0 if ok else 1,
+            "write_seconds": self.delays[index]
+        }
+
+
+async def _chunks(count):
+    for index in range(count):
+        time_points = np.arange(index * ROWS, (index + 1) * ROWS, dtype=np.float64)
+        yield DetailColumns.from_arrays(time_points, np.full(ROWS, 100.0), np.full(ROWS, 1.0))
+
+
+async def _run(service, count, base_rows=0):
+    checkpoints = []
+
+    async def on_checkpoint(rows, last_time_point):
+        # 断点只能覆盖已全部写入的连续分块
+        done = set(service.completed)
+        assert all(index in done for index in range((rows - base_rows) // ROWS))
+        checkpoints.append((rows, last_time_point))
+
+    pipeline = ImportPipeline(
+        service,
+        uuid4(),
+        validator=DetailValidator(limits={}),
+        writers=count,
+        on_checkpoint=on_checkpoint,
+        base_rows=base_rows
+    )
+    stats = await pipeline.run(_chunks(count))
+    return pipeline, stats, checkpoints
+
+
+@pytest.mark.asyncio
+async def test_watermark_waits_for_earlier_chunks():
+    service = FakeRecordService([0.08, 0.01, 0.04, 0.0])
+
+    pipeline, stats, checkpoints = await _run(service, 4)
+
+    assert service.completed[0] != 0
+    # 分块 0 最后完成，之前完成的分块不推进断点
+    assert checkpoints == [(40, 39.0)]
+    assert pipeline.committed_rows == 40
+    assert stats["inserted_rows"] == 40
+
+
+@pytest.mark.asyncio
+async def test_watermark_advances_in_order():
+    service = FakeRecordService([0.0, 0.06, 0.02, 0.04])
+
+    _, _, checkpoints = await _run(service, 4, base_rows=100)
+
+    assert checkpoints == [(110, 9.0), (140, 39.0)]
+    assert [rows for rows, _ in checkpoints] == sorted(rows for rows, _ in checkpoints)
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_stops_watermark():
+    service = FakeRecordService([0.02, 0.0, 0.01, 0.0], failed={1})
+
+    pipeline, stats, checkpoints = await _run(service, 4)
+
+    # 分块 1 写入失败，之后的分块即使已写入也不计入断点
+    assert checkpoints == [(10, 9.0)]
+    assert pipeline.committed_rows == 10
+    assert pipeline.last_time_point == 9.0
+    assert stats["failed_chunks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_watermark_counts_rejected_rows():
+    service = FakeRecordService([0.0, 0.0])
+    pipeline = ImportPipeline(
+        service,
+        uuid4(),
+        validator=DetailValidator(limits={"voltage_value": [0, 50]}),
+        writers=1
+    )
+
+    stats = await pipeline.run(_chunks(2))
+
+    # 全部行被剔除时断点仍按原始行数推进
+    assert stats["rejected_rows"] == 20
+    assert pipeline.committed_rows == 20
+    assert pipeline.last_time_point == 19.0
@@ -0,0 +1,172 @@
+"""
+导入状态测试（状态值需满足建表脚本中的 CHECK 约束）
+"""
+import copy
+import re
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from app.core.process_pool import ParsePool
+from app.services.import_service import ImportService
+from app.utils import excel_parser
+
+
+SCHEMA = Path(__file__).resolve().parents[2] / "database" / "create_tables.sql"
+
+
+def _allowed_statuses():
+    """从建表脚本的 import_records 定义中读取允许的状态"""
+    match = re.search(r"import_status VARCHAR\(50\)[^,]*CHECK \(import_status IN \(([^)]*)\)\)", SCHEMA.read_text())
+    return set(re.findall(r"'(\w+)'", match.group(1)))
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+class FakeQuery:
+    """只实现 eq / in_ 过滤，其余链式调用原样返回"""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.filters = []
+        self.one = False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    @property
+    def not_(self):
+        return self
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, **kwargs):
+        return self.insert(payload)
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, key, value):
+        self.filters.append(lambda row: str(row.get(key)) == str(value))
+        return self
+
+    def in_(self, key, values):
+        values = {str(value) for value in values}
+        self.filters.append(lambda row: str(row.get(key)) in values)
+        return self
+
+    def single(self):
+        self.one = True
+        return self
+
+    maybe_single = single
+
+    def _check(self, row):
+        status = row.get("import_status")
+        if self.table == "import_records" and status is not None and status not in self.db.statuses:
+            raise RuntimeError(f'new row for relation "import_records" violates check constraint ({status})')
+
+    def execute(self):
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.op == "insert":
+            if self.table in self.db.failing:
+                raise RuntimeError("insert failed")
+            items = self.payload if isinstance(self.payload, list) else [self.payload]
+            out = []
+            for item in items:
+                row = {"id": str(uuid.uuid4()), "created_at": datetime.utcnow().isoformat()}
+                row.update(item)
+                self._check(row)
+                rows.append(row)
+                out.append(copy.deepcopy(row))
+            return FakeResponse(out)
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.op == "update":
+            for row in matched:
+                self._check({**row, **self.payload})
+            for row in matched:
+                row.update(self.payload)
+        elif self.op == "delete":
+            self.db.tables[self.table] = [row for row in rows if row not in matched]
+        matched = copy.deepcopy(matched)
+        if self.one:
+            return FakeResponse(matched[0] if matched else None)
+        return FakeResponse(matched)
+
+
+class FakeClient:
+    def __init__(self, failing=()):
+        self.tables = {}
+        self.failing = set(failing)
+        self.statuses = _allowed_statuses()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeQuery(self, f"rpc:{name}")
+
+
+def _status(db, import_id):
+    return next(row for row in db.tables["import_records"] if row["id"] == str(import_id))["import_status"]
+
+
+def test_schema_allows_partial():
+    assert _allowed_statuses() == {"pending", "processing", "completed", "partial", "failed"}
+    # 已有数据库通过 ALTER 重建约束
+    assert "DROP CONSTRAINT IF EXISTS import_records_import_status_check" in SCHEMA.read_text()
+
+
+@pytest.mark.asyncio
+async def test_partial_import_reaches_terminal_status(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_parser, "parse_pool", ParsePool(max_workers=0))
+    path = tmp_path / "c20 20.0V 5.0A data_detail_1_2025-06-01.csv"
+    path.write_text("time,voltage,current\n" + "".join(f"{i * 0.1:.1f},{20 - i * 0.01:.3f},5.0\n" for i in range(50)))
+
+    # 明细写入失败，主记录写入成功：部分成功
+    db = FakeClient(failing={"test_details"})
+    service = ImportService(db)
+    record = await service.create_import_record(path.name, path.stat().st_size, str(path), str(uuid.uuid4()))
+    await service.process_import(record.id, str(path))
+
+    assert _status(db, record.id) == "partial"
+    assert db.tables["import_records"][0]["completed_at"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("children, expected", [
+    (["completed", "partial"], "partial"),
+    (["failed", "partial"], "failed"),
+    (["completed", "completed"], "completed"),
+])
+async def test_archive_parent_reaches_terminal_status(children, expected):
+    db = FakeClient()
+    service = ImportService(db)
+    parent = await service.create_import_record("batch.zip", 1, "batch.zip", str(uuid.uuid4()))
+    await service.update_import_status(parent.id, "processing", import_stats={"extracted": True})
+    for index, status in enumerate(children):
+        child = await service.create_import_record(f"{index}.csv", 1, f"{index}.csv", None, parent_id=parent.id)
+        await service.update_import_status(child.id, status)
+
+    await service.refresh_archive_progress(parent.id)
+
+    assert _status(db, parent.id) == expected
@@ -0,0 +1,86 @@
+"""
+导入任务队列测试
+"""
+import asyncio
+
+import pytest
+
+from app.core.job_queue import ImportJobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = ImportJobQueue(path=str(tmp_path / "import_jobs.db"), workers=1)
+    queue.max_attempts = 3
+    return queue
+
+
+def _crash(queue):
+    """领取任务后进程崩溃：租约不再续期，立即过期"""
+    job = queue._claim()
+    conn = queue._connect()
+    try:
+        conn.execute("UPDATE import_jobs SET lease_expires = 0 WHERE id = ?", (job["id"],))
+    finally:
+        conn.close()
+    return job
+
+
+def _status(queue, job_id):
+    conn = queue._connect()
+    try:
+        return dict(conn.execute("SELECT * FROM import_jobs WHERE id = ?", (job_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def test_expired_job_fails_after_max_attempts(queue):
+    job_id = queue._enqueue("import-1", "a.csv", 0, None)
+
+    for attempt in (1, 2):
+        assert _crash(queue)["attempts"] == attempt
+        assert queue._recover() == (1, [])
+        assert _status(queue, job_id)["status"] == "queued"
+
+    _crash(queue)
+    recovered, abandoned = queue._recover()
+    assert recovered == 0
+    assert [job["id"] for job in abandoned] == [job_id]
+    assert abandoned[0]["error"]
+    assert _status(queue, job_id)["status"] == "failed"
+    assert queue._claim() is None
+
+
+def test_release_does_not_count_attempt(queue):
+    job_id = queue._enqueue("import-1", "a.csv", 0, None)
+    for _ in range(queue.max_attempts + 1):
+        queue._claim()
+        queue._release()
+    assert _status(queue, job_id)["attempts"] == 0
+    assert _status(queue, job_id)["status"] == "queued"
+
+
+@pytest.mark.asyncio
+async def test_start_reports_abandoned_jobs(queue):
+    job_id = queue._enqueue("import-1", "a.csv", 0, None)
+    for _ in range(queue.max_attempts):
+        _crash(queue)
+        if _status(queue, job_id)["attempts"] < queue.max_attempts:
+            queue._recover()
+
+    abandoned = []
+
+    async def on_abandon(job):
+        abandoned.append(job["import_id"])
+
+    handled = []
+
+    async def handler(job):
+        handled.append(job["import_id"])
+
+    await queue.start(handler, on_abandon)
+    await asyncio.sleep(0.1)
+    await queue.stop()
+
+    assert abandoned == ["import-1"]
+    assert handled == []
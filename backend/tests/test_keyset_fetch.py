@@ -0,0 +1,163 @@
+"""
+键集分页读取测试
+"""
+import re
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.core.keyset_fetch import KeysetFetcher, RowBudgetExceeded
+
+
+_CURSOR = re.compile(r'^test_date\.gt\."([^"]+)",and\(test_date\.eq\."([^"]+)",id\.gt\.([0-9a-f-]+)\)$')
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """模拟 PostgREST 查询（只支持键集分页用到的过滤与排序）"""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = []
+        self.orders = []
+        self.row_limit = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row[column] < value)
+        return self
+
+    def or_(self, expression):
+        match = _CURSOR.match(expression)
+        assert match, expression
+        after, same, record_id = match.groups()
+        self.filters.append(
+            lambda row: row["test_date"] > after or (row["test_date"] == same and row["id"] > record_id)
+        )
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        rows = [row for row in self.db.rows if all(check(row) for check in self.filters)]
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        # 服务端 max-rows 截断
+        limit = min(self.row_limit or len(rows), self.db.max_rows)
+        self.db.requests += 1
+        return FakeResponse([dict(row) for row in rows[:limit]])
+
+
+class FakeDB:
+    def __init__(self, rows, max_rows=1000):
+        self.rows = rows
+        self.max_rows = max_rows
+        self.requests = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def _records(dates):
+    """每个 (日期, 条数) 生成同一 test_date 的多条记录"""
+    rows = []
+    for day, count in dates:
+        for _ in range(count):
+            rows.append({"id": str(uuid4()), "test_date": day.isoformat(), "device_model": "A"})
+    return rows
+
+
+async def _collect(fetcher):
+    rows = []
+    async for page in fetcher.pages():
+        rows.extend(page)
+    return rows
+
+
+BASE = datetime(2025, 1, 1, 8, 0, 0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("page_size", [1, 3, 7, 50])
+async def test_repeated_test_date_read_exactly_once(page_size):
+    rows = _records([(BASE, 10), (BASE + timedelta(hours=1), 1), (BASE + timedelta(hours=2), 9)])
+    fetcher = KeysetFetcher(FakeDB(rows), "id", page_size=page_size, partitions=1, max_rows=1000)
+
+    fetched = await _collect(fetcher)
+
+    assert sorted(row["id"] for row in fetched) == sorted(row["id"] for row in rows)
+    assert fetcher.fetched_rows == len(rows)
+
+
+@pytest.mark.asyncio
+async def test_server_row_cap_does_not_drop_rows():
+    rows = _records([(BASE, 12), (BASE + timedelta(days=1), 5)])
+    fetcher = KeysetFetcher(FakeDB(rows, max_rows=4), "id", page_size=100, partitions=1, max_rows=1000)
+
+    fetched = await _collect(fetcher)
+
+    assert len(fetched) == len(rows)
+    assert len({row["id"] for row in fetched}) == len(rows)
+
+
+@pytest.mark.asyncio
+async def test_partitions_cover_all_rows():
+    rows = _records([(BASE + timedelta(hours=hour), 3) for hour in range(10)])
+    fetcher = KeysetFetcher(FakeDB(rows), "id", page_size=2, partitions=4, max_rows=1000)
+
+    fetched = await _collect(fetcher)
+
+    assert sorted(row["id"] for row in fetched) == sorted(row["id"] for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_where_filter_applies_to_every_page():
+    rows = _records([(BASE, 6)])
+    for row in rows[::2]:
+        row["device_model"] = "B"
+    fetcher = KeysetFetcher(
+        FakeDB(rows), "id, device_model",
+        where=lambda query: query.eq("device_model", "B"),
+        page_size=1, partitions=1, max_rows=1000
+    )
+
+    fetched = await _collect(fetcher)
+
+    assert len(fetched) == 3
+    assert all(row["device_model"] == "B" for row in fetched)
+
+
+@pytest.mark.asyncio
+async def test_row_budget_exceeded():
+    rows = _records([(BASE, 30)])
+    fetcher = KeysetFetcher(FakeDB(rows), "id", page_size=10, partitions=1, max_rows=15)
+
+    with pytest.raises(RowBudgetExceeded):
+        await _collect(fetcher)
+
+
+def test_cursor_columns_always_selected():
+    fetcher = KeysetFetcher(FakeDB([]), "pass_rate", page_size=10, partitions=1, max_rows=10)
+    assert fetcher.columns == "pass_rate, test_date, id"
@@ -0,0 +1,159 @@
+"""
+解析进程池测试
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.process_pool import ParsePool, ParseTimeoutError
+from app.utils import excel_parser
+from app.utils.excel_parser import ExcelParser
+
+
+def _sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def pool():
+    pool = ParsePool(max_workers=1, max_concurrency=8, timeout=30)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_result(pool):
+    assert await pool.run(_sleep, 0) == 0
+
+
+@pytest.mark.asyncio
+async def test_timeout_reruns_other_jobs(pool):
+    # 预热，避免进程启动时间计入超时
+    await pool.run(_sleep, 0)
+
+    slow = asyncio.create_task(pool.run(_sleep, 30, timeout=1))
+    await asyncio.sleep(0.1)
+    # 单个工作进程被占用：前两个任务进入调用队列，工作进程终止时失败；其余在进程池中排队，被取消
+    values = [0.01, 0.02, 0.03, 0.04, 0.05]
+    others = [asyncio.create_task(pool.run(_sleep, value)) for value in values]
+
+    with pytest.raises(ParseTimeoutError):
+        await slow
+    assert await asyncio.gather(*others) == values
+
+
+@pytest.mark.asyncio
+async def test_caller_cancellation_is_not_retried(pool):
+    await pool.run(_sleep, 0)
+
+    task = asyncio.create_task(pool.run(_sleep, 0.5))
+    await asyncio.sleep(0.1)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+@pytest.mark.asyncio
+async def test_thread_mode():
+    pool = ParsePool(max_workers=0, max_concurrency=2, timeout=5)
+    assert await pool.run(_sleep, 0.01) == 0.01
+
+
+def _count(total: int, delay: float = 0.0):
+    for value in range(total):
+        if delay:
+            time.sleep(delay)
+        yield value
+
+
+def _fail_after(count: int):
+    yield from range(count)
+    raise ValueError("bad row")
+
+
+@pytest.mark.asyncio
+async def test_stream_items(pool):
+    assert [item async for item in pool.stream(_count, 25)] == list(range(25))
+
+
+@pytest.mark.asyncio
+async def test_stream_error_propagates(pool):
+    items = []
+    with pytest.raises(ValueError, match="bad row"):
+        async for item in pool.stream(_fail_after, 3):
+            items.append(item)
+    assert items == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_stream_idle_timeout(pool):
+    with pytest.raises(ParseTimeoutError):
+        async for _ in pool.stream(_count, 2, 30, timeout=2):
+            pass
+    # 进程池已重建，后续任务正常执行
+    assert await pool.run(_sleep, 0) == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_closed_early_releases_worker(pool):
+    stream = pool.stream(_count, 1000000)
+    assert await stream.__anext__() == 0
+    await stream.aclose()
+    # 唯一的工作进程已退出流式任务，可以执行新任务
+    assert await pool.run(_sleep, 0, timeout=10) == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_thread_mode():
+    pool = ParsePool(max_workers=0, max_concurrency=2, timeout=5)
+    assert [item async for item in pool.stream(_count, 5)] == list(range(5))
+
+
+def _write_csv(path, rows: int) -> str:
+    lines = ["序号,电压 (V),电流 (A),pass"] + [f"{i},220.5,1.5,{i % 2}" for i in range(rows)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_streaming_parse_runs_in_pool(pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_parser, "parse_pool", pool)
+    path = _write_csv(tmp_path / "detail.csv", 1000)
+    stream = ExcelParser().parse_file_streaming(path, chunk_size=300)["details"]["temp_id"]
+
+    chunks = [chunk async for chunk in stream.aiter_chunks(skip_rows=100)]
+
+    assert [len(chunk) for chunk in chunks] == [200, 300, 300, 100]
+    assert chunks[0]["time_point"][0] == pytest.approx(10.0)
+    # 采样点数与合格率由工作进程回传
+    assert stream.row_count == 1000
+    assert stream.pass_rate == 50.0
+
+
+@pytest.mark.asyncio
+async def test_streaming_parse_resumes_after_pool_recycle(pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_parser, "parse_pool", pool)
+    path = _write_csv(tmp_path / "detail.csv", 2000)
+    stream = ExcelParser().parse_file_streaming(path, chunk_size=50)["details"]["temp_id"]
+    await pool.run(_sleep, 0)
+
+    async def timed_out_job():
+        # 唯一的工作进程被流式任务占用，该任务排队直到超时，进程池随之重建
+        with pytest.raises(ParseTimeoutError):
+            await pool.run(_sleep, 30, timeout=1)
+
+    other = None
+    time_points = []
+    async for chunk in stream.aiter_chunks():
+        if other is None:
+            other = asyncio.create_task(timed_out_job())
+        time_points.extend(chunk["time_point"].tolist())
+        await asyncio.sleep(0.05)
+    await other
+
+    assert len(time_points) == 2000
+    assert time_points == sorted(set(time_points))
+    assert stream.row_count == 2000
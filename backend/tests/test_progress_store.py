@@ -0,0 +1,46 @@
+"""
+导入进度存储节流测试
+"""
+import asyncio
+
+import pytest
+
+from app.core.progress_store import ProgressStore
+
+
+@pytest.fixture
+def store():
+    return ProgressStore(redis_url="", ttl=60, min_interval=0.2)
+
+
+@pytest.mark.asyncio
+async def test_latest_throttled_update_is_flushed(store):
+    queue = store.subscribe("import-1")
+    for percent in (10, 20, 30):
+        await store.set("import-1", {"status": "processing", "progress": percent})
+
+    assert [queue.get_nowait()["progress"]] == [10]
+    assert (await store.get("import-1"))["progress"] == 10
+
+    # 间隔结束后写入间隔内的最后一条进度
+    progress = await asyncio.wait_for(queue.get(), timeout=1)
+    assert progress["progress"] == 30
+    assert (await store.get("import-1"))["progress"] == 30
+    assert queue.empty()
+    await store.stop()
+
+
+@pytest.mark.asyncio
+async def test_final_update_is_published_immediately(store):
+    queue = store.subscribe("import-1")
+    await store.set("import-1", {"status": "processing", "progress": 10})
+    await store.set("import-1", {"status": "processing", "progress": 50})
+    await store.set("import-1", {"status": "completed", "progress": 100})
+
+    assert [queue.get_nowait()["status"], queue.get_nowait()["status"]] == ["processing", "completed"]
+
+    # 暂存的中间进度不会在终态之后写入
+    await asyncio.sleep(0.3)
+    assert queue.empty()
+    assert (await store.get("import-1"))["status"] == "completed"
+    await store.stop()
@@ -0,0 +1,115 @@
+"""
+表格读取后端测试
+"""
+import re
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+
+from app.utils.readers import READERS, get_reader
+from app.utils.excel_parser import ExcelParser
+
+
+HEADER = ["时间", "电压 (V)", "电流 (A)"]
+
+
+def _write_xlsx(path, rows: int, truncated: bool = False):
+    """生成大工作表；truncated=True 时工作表 XML 在末尾被截断，只有逐行读取的后端能读出前几行"""
+    workbook = Workbook()
+    workbook.active.append(HEADER)
+    workbook.save(path)
+
+    with zipfile.ZipFile(path) as archive:
+        parts = {name: archive.read(name) for name in archive.namelist()}
+
+    sheet = parts["xl/worksheets/sheet1.xml"].decode("utf-8")
+    start = sheet.index("<sheetData>") + len("<sheetData>")
+    end = sheet.index("</sheetData>")
+    body = [sheet[start:end]] + [
+        f'<row r="{i}"><c r="A{i}"><v>{i}</v></c><c r="B{i}"><v>220.5</v></c><c r="C{i}"><v>1.5</v></c></row>'
+        for i in range(2, rows + 2)
+    ]
+    sheet = sheet[:start] + "".join(body) + ("" if truncated else sheet[end:])
+    sheet = re.sub(r'<dimension ref="[^"]*" ?/>', f'<dimension ref="A1:C{rows + 1}"/>', sheet)
+    parts["xl/worksheets/sheet1.xml"] = sheet.encode("utf-8")
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in parts.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def truncated_sheet(tmp_path_factory):
+    return _write_xlsx(tmp_path_factory.mktemp("readers") / "large.xlsx", 100000, truncated=True)
+
+
+def test_streaming_prefers_lazy_reader():
+    reader = get_reader("data.xlsx", streaming=True)
+    assert reader.lazy
+    assert get_reader("data.csv", streaming=True).lazy
+    # 指定后端时不替换
+    if READERS["calamine"].is_available():
+        assert get_reader("data.xlsx").name == "calamine"
+        assert get_reader("data.xlsx", "calamine", streaming=True).name == "calamine"
+
+
+def test_streaming_iter_rows_is_lazy(truncated_sheet):
+    rows = get_reader(truncated_sheet, streaming=True).iter_rows(truncated_sheet)
+    try:
+        # 只解析到第二行，不会读到被截断的末尾
+        assert next(rows) == tuple(HEADER)
+        assert next(rows) == (2, 220.5, 1.5)
+    finally:
+        rows.close()
+
+
+@pytest.mark.skipif(not READERS["calamine"].is_available(), reason="calamine not installed")
+def test_calamine_loads_whole_sheet(truncated_sheet):
+    with pytest.raises(Exception):
+        next(READERS["calamine"].iter_rows(truncated_sheet))
+
+
+def test_preview_reads_only_leading_rows(truncated_sheet):
+    preview = ExcelParser().preview_file_sync(truncated_sheet, nrows=50, file_name="large.xlsx")
+
+    assert preview["errors"] == []
+    assert preview["preview_rows"] == 50
+    assert preview["predicted_sample_count"] == 100000
+
+
+def test_streaming_parse_opens_with_lazy_reader(truncated_sheet):
+    parsed = ExcelParser().parse_file_streaming(truncated_sheet, chunk_size=100)
+
+    assert parsed["success"]
+    stream = parsed["details"]["temp_id"]
+    assert stream.reader.lazy
+    assert stream.columns == ["时间", "电压_(v)", "电流_(a)"]
+
+
+def test_whole_file_read_matches_streaming(tmp_path):
+    path = _write_xlsx(tmp_path / "small.xlsx", 500)
+    frame = get_reader(path).read_frame(path)
+    rows = list(get_reader(path, streaming=True).iter_rows(path))
+
+    assert frame.columns.tolist() == HEADER
+    assert len(frame) == len(rows) - 1 == 500
+
+
+def test_streaming_reuses_preview_header(tmp_path, monkeypatch):
+    path = _write_xlsx(tmp_path / "header.xlsx", 20)
+    parser = ExcelParser()
+    preview = parser.preview_file_sync(path, file_name="header.xlsx")
+    assert preview["header"] == HEADER
+
+    def read_header(self, file_path):
+        raise AssertionError("header should come from the preview")
+
+    monkeypatch.setattr(type(get_reader(path, streaming=True)), "read_header", read_header)
+    parsed = parser.parse_file_streaming(path, chunk_size=8, header=preview["header"])
+
+    assert parsed["success"]
+    stream = parsed["details"]["temp_id"]
+    assert stream.column_map.roles == {"time": "时间", "voltage": "电压_(v)", "current": "电流_(a)"}
+    assert sum(len(chunk) for chunk in stream) == 20
@@ -0,0 +1,138 @@
+"""
+统计结果缓存测试（进程内模式）
+"""
+import asyncio
+
+import pytest
+
+from app.core.stats_cache import StatsCache
+
+
+class Counter:
+    """每次计算返回递增的结果"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        value = self.calls
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return value
+
+
+def _cache(ttl=60.0, stale_ttl=60.0, max_entries=16):
+    return StatsCache(redis_url="", ttl=ttl, stale_ttl=stale_ttl, max_entries=max_entries)
+
+
+@pytest.mark.asyncio
+async def test_hit_within_ttl():
+    cache, compute = _cache(), Counter()
+
+    assert await cache.get_or_compute("k", compute) == 1
+    assert await cache.get_or_compute("k", compute) == 1
+    assert compute.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_recomputes_synchronously():
+    cache, compute = _cache(), Counter()
+    await cache.get_or_compute("k", compute)
+
+    await cache.invalidate()
+
+    # 失效后的第一次读取即返回新结果，不返回旧值
+    assert await cache.get_or_compute("k", compute) == 2
+    assert await cache.get_or_compute("k", compute) == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidated_entry_in_stale_window_is_not_served():
+    cache, compute = _cache(ttl=0.01, stale_ttl=60.0), Counter()
+    await cache.get_or_compute("k", compute)
+    await asyncio.sleep(0.02)
+
+    await cache.invalidate()
+
+    assert await cache.get_or_compute("k", compute) == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_served_while_revalidating():
+    cache, compute = _cache(ttl=0.01, stale_ttl=60.0), Counter()
+    await cache.get_or_compute("k", compute)
+    await asyncio.sleep(0.02)
+
+    # 超过 ttl、代数未变：返回旧值并在后台刷新
+    assert await cache.get_or_compute("k", compute) == 1
+    await asyncio.gather(*cache._background)
+    assert compute.calls == 2
+    assert await cache.get_or_compute("k", compute) == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_recomputed():
+    cache, compute = _cache(ttl=0.01, stale_ttl=0.01), Counter()
+    await cache.get_or_compute("k", compute)
+    await asyncio.sleep(0.03)
+
+    assert await cache.get_or_compute("k", compute) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_computation():
+    cache, compute = _cache(), Counter(delay=0.02)
+
+    results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    assert results == [1] * 5
+    assert compute.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_computation_started_before_invalidate_is_not_reused():
+    cache, compute = _cache(), Counter(delay=0.05)
+
+    first = asyncio.create_task(cache.get_or_compute("k", compute))
+    await asyncio.sleep(0.01)
+    await cache.invalidate()
+    second = await cache.get_or_compute("k", compute)
+
+    assert await first == 1
+    assert second == 2
+    assert await cache.get_or_compute("k", compute) == 2
+
+
+@pytest.mark.asyncio
+async def test_local_lru_eviction():
+    cache = _cache(max_entries=2)
+    for key in ("a", "b", "c"):
+        await cache.get_or_compute(key, Counter())
+
+    assert list(cache._local) == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_cached_decorator_keys_by_arguments():
+    cache = _cache()
+
+    class Service:
+        def __init__(self):
+            self.calls = []
+
+        @cache.cached()
+        async def total(self, device_model=None, days: int = 30):
+            self.calls.append((device_model, days))
+            return len(self.calls)
+
+    service = Service()
+    assert await service.total("A") == 1
+    assert await service.total(device_model="A", days=30) == 1
+    assert await service.total("B") == 2
+    assert service.calls == [("A", 30), ("B", 30)]
+
+    await cache.invalidate()
+    assert await service.total("A") == 3
+    await cache.stop()
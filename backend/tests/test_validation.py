@@ -0,0 +1,124 @@
+"""
+详细数据校验测试
+"""
+import numpy as np
+
+from app.utils.detail_columns import DetailColumns
+from app.utils.validation import (
+    DetailValidator,
+    RejectionReport,
+    describe,
+    NON_FINITE,
+    MISSING_VALUE,
+    VOLTAGE_RANGE,
+    CURRENT_RANGE,
+    TEMPERATURE_RANGE,
+    TIME_NOT_MONOTONIC,
+    OVER_RATED_VOLTAGE,
+    OVER_RATED_CURRENT,
+)
+
+
+LIMITS = {
+    "voltage_value": [0, 1000],
+    "current_value": [0, 100],
+    "temperature": [-40, 125],
+}
+
+
+def _chunk(time_points, voltage, current, temperature=None):
+    return DetailColumns.from_arrays(
+        np.asarray(time_points, dtype=np.float64),
+        np.asarray(voltage, dtype=np.float64),
+        np.asarray(current, dtype=np.float64),
+        temperature=None if temperature is None else np.asarray(temperature, dtype=np.float64)
+    )
+
+
+def test_rule_bits():
+    validator = DetailValidator(limits=LIMITS, rated_voltage=500, rated_current=10, rated_margin=1.1)
+    chunk = _chunk(
+        [0, 1, 2, 3, 4, 5, 6, 7],
+        [100, np.inf, np.nan, 1200, 100, 600, 100, -5],
+        [1, 1, 1, 1, 200, 1, 12, 1],
+        [25, 25, 25, 25, 25, 25, 25, 200]
+    )
+
+    mask = validator.evaluate(chunk)
+
+    assert mask[0] == 0
+    assert mask[1] & NON_FINITE
+    assert mask[2] == MISSING_VALUE
+    assert mask[3] == VOLTAGE_RANGE | OVER_RATED_VOLTAGE
+    assert mask[4] == CURRENT_RANGE | OVER_RATED_CURRENT
+    assert mask[5] == OVER_RATED_VOLTAGE
+    assert mask[6] == OVER_RATED_CURRENT
+    assert mask[7] == VOLTAGE_RANGE | TEMPERATURE_RANGE
+
+
+def test_missing_value_not_counted_as_range_violation():
+    validator = DetailValidator(limits=LIMITS)
+    mask = validator.evaluate(_chunk([0], [np.nan], [np.nan]))
+    assert describe(int(mask[0])) == ["missing_value"]
+
+
+def test_time_monotonic_within_chunk():
+    validator = DetailValidator(limits=LIMITS)
+    mask = validator.evaluate(_chunk([0, 1, 1, 0.5, 2, 3], [1] * 6, [1] * 6))
+    assert (mask == TIME_NOT_MONOTONIC).tolist() == [False, False, True, True, False, False]
+
+
+def test_time_monotonic_across_chunks():
+    validator = DetailValidator(limits=LIMITS)
+
+    first = validator.evaluate(_chunk([0, 1, 5], [1] * 3, [1] * 3))
+    # 第二个分块需要与上一分块的最大时间点比较
+    second = validator.evaluate(_chunk([4, 5, 6, 3, 7], [1] * 5, [1] * 5))
+    third = validator.evaluate(_chunk([7, 8], [1] * 2, [1] * 2))
+
+    assert not first.any()
+    assert (second == TIME_NOT_MONOTONIC).tolist() == [True, True, False, True, False]
+    assert (third == TIME_NOT_MONOTONIC).tolist() == [True, False]
+
+
+def test_rejected_row_does_not_reset_time_watermark():
+    validator = DetailValidator(limits=LIMITS)
+    validator.evaluate(_chunk([0, 10], [1, 1], [1, 1]))
+    mask = validator.evaluate(_chunk([9], [1], [1]))
+    assert mask[0] == TIME_NOT_MONOTONIC
+    mask = validator.evaluate(_chunk([9.5, 11], [1, 1], [1, 1]))
+    assert mask.tolist() == [TIME_NOT_MONOTONIC, 0]
+
+
+def test_apply_and_report():
+    validator = DetailValidator(limits=LIMITS)
+    report = RejectionReport(sample_limit=1)
+    chunk = _chunk([0, 1, 2, 3], [100, np.inf, 2000, 100], [1, 1, 1, np.nan])
+
+    valid = validator.apply(chunk, report)
+
+    assert valid["time_point"].tolist() == [0]
+    result = report.to_dict()
+    assert result["checked_rows"] == 4
+    assert result["rejected_rows"] == 3
+    # +inf 同时超出电压范围
+    assert result["rules"] == {"non_finite": 1, "missing_value": 1, "voltage_range": 2}
+    # inf 在样本中写为 None
+    assert result["samples"] == [{
+        "time_point": 1.0,
+        "voltage_value": None,
+        "current_value": 1.0,
+        "power_value": None,
+        "resistance_value": None,
+        "rules": ["non_finite", "voltage_range"]
+    }]
+
+
+def test_for_device_prefers_specifications():
+    validator = DetailValidator.for_device({
+        "rated_voltage": 300,
+        "rated_current": 5,
+        "specifications": {"max_voltage": 600}
+    })
+    assert validator.rated_voltage == 600
+    assert validator.rated_current == 5
@@ -0,0 +1,125 @@
+"""
+波形分段编码测试
+"""
+import numpy as np
+import pytest
+
+from app.utils.detail_columns import DetailColumns
+from app.utils.waveform_codec import (
+    FIELD_SCALES,
+    encode_column,
+    decode_column,
+    encode_segment,
+    decode_segment,
+    to_bytea,
+    from_bytea,
+)
+
+
+def _round_trip(values: np.ndarray, scale: int, lossless: bool = False):
+    codec, data = encode_column(values, scale, lossless)
+    return codec, decode_column(codec, data, len(values), scale)
+
+
+def test_delta_round_trip_at_field_precision():
+    values = np.round(np.random.default_rng(0).normal(220, 5, 1000), 4)
+    codec, decoded = _round_trip(values, 4)
+    assert codec == "delta"
+    np.testing.assert_allclose(decoded, values, rtol=0, atol=1e-9)
+
+
+def test_nan_is_preserved():
+    values = np.array([np.nan, 1.5, np.nan, np.nan, 2.25, np.nan])
+    codec, decoded = _round_trip(values, 4)
+    assert codec == "delta"
+    np.testing.assert_array_equal(np.isnan(decoded), np.isnan(values))
+    np.testing.assert_array_equal(decoded[~np.isnan(values)], [1.5, 2.25])
+
+
+def test_all_nan_column():
+    values = np.full(5, np.nan)
+    _, decoded = _round_trip(values, 2)
+    assert np.isnan(decoded).all()
+
+
+@pytest.mark.parametrize("special", [np.inf, -np.inf])
+def test_infinity_falls_back_to_xor(special):
+    values = np.array([1.0, special, np.nan, 3.5])
+    codec, decoded = _round_trip(values, 4)
+    assert codec == "xor"
+    np.testing.assert_array_equal(decoded, values)
+
+
+def test_values_beyond_delta_range_fall_back_to_xor():
+    # 放大到定点整数后超过 2**52，无法精确表示
+    values = np.array([0.0, 1e12, -1e12, 123.4567])
+    codec, decoded = _round_trip(values, 4)
+    assert codec == "xor"
+    np.testing.assert_array_equal(decoded, values)
+
+
+def test_values_at_edge_of_delta_range():
+    # 定点整数接近 2**52 时仍使用 delta 编码
+    limit = 2 ** 52 / 10 ** 4 - 1
+    values = np.array([-limit, limit, -limit, 0.0])
+    codec, decoded = _round_trip(values, 4)
+    assert codec == "delta"
+    np.testing.assert_allclose(decoded, values, rtol=0, atol=1e-4)
+
+
+def test_lossless_rejects_extra_precision():
+    values = np.array([1.23456789, 2.5])
+    codec, decoded = _round_trip(values, 4)
+    assert codec == "delta"
+    assert decoded[0] == pytest.approx(1.2346)
+
+    codec, decoded = _round_trip(values, 4, lossless=True)
+    assert codec == "xor"
+    np.testing.assert_array_equal(decoded, values)
+
+
+def test_lossless_keeps_delta_when_exact():
+    values = np.array([0.001, 0.002, np.nan, 10.5])
+    codec, decoded = _round_trip(values, 3, lossless=True)
+    assert codec == "delta"
+    np.testing.assert_array_equal(decoded, values)
+
+
+def test_segment_round_trip():
+    time_points = np.arange(200) * 0.001
+    voltage = np.round(np.linspace(0, 600, 200), 4)
+    current = np.round(np.linspace(0, 8, 200), 4)
+    current[10] = np.nan
+    details = DetailColumns.from_arrays(time_points, voltage, current, temperature=np.full(200, 25.5))
+
+    encoding, payload = encode_segment(details)
+    decoded = decode_segment(encoding, payload, len(details))
+
+    assert decoded.fields == details.fields
+    for field in details.fields:
+        expected = np.round(details[field], FIELD_SCALES[field])
+        np.testing.assert_allclose(decoded[field], expected, rtol=0, atol=1e-9, equal_nan=True)
+
+
+def test_segment_lossless_round_trip():
+    rng = np.random.default_rng(1)
+    details = DetailColumns.from_arrays(np.cumsum(rng.random(100)), rng.normal(0, 1, 100), rng.normal(0, 1, 100))
+
+    encoding, payload = encode_segment(details, lossless=True)
+    decoded = decode_segment(encoding, payload, len(details))
+
+    for field in details.fields:
+        np.testing.assert_array_equal(decoded[field], details[field])
+
+
+def test_unsupported_version():
+    encoding, payload = encode_segment(DetailColumns(np.arange(3.0)))
+    encoding["version"] = 99
+    with pytest.raises(ValueError):
+        decode_segment(encoding, payload, 3)
+
+
+def test_bytea_round_trip():
+    data = bytes(range(256))
+    assert from_bytea(to_bytea(data)) == data
+    assert from_bytea(data) == data
@@ -0,0 +1,76 @@
+"""
+旋转门压缩测试
+"""
+import numpy as np
+import pytest
+
+from app.utils.detail_columns import DetailColumns
+from app.utils.waveform_compression import swinging_door, WaveformCompressor
+
+
+def _max_error(time_points, values, keep):
+    """保留点之间线性重建的最大误差"""
+    rebuilt = np.interp(time_points, time_points[keep], values[keep])
+    return np.abs(rebuilt - values).max()
+
+
+@pytest.mark.parametrize("tolerance", [0.01, 0.1, 1.0])
+def test_error_within_tolerance(tolerance):
+    rng = np.random.default_rng(42)
+    t = np.arange(5000) * 0.01
+    values = 10 * np.sin(t) + rng.normal(0, 0.2, len(t))
+
+    keep = swinging_door(t, [values], [tolerance])
+
+    assert keep[0] and keep[-1]
+    assert keep.sum() < len(t)
+    assert _max_error(t, values, keep) <= tolerance + 1e-9
+
+
+def test_each_channel_within_its_own_tolerance():
+    rng = np.random.default_rng(7)
+    t = np.cumsum(rng.uniform(0.5, 1.5, 3000))
+    voltage = 600 + np.cumsum(rng.normal(0, 0.05, len(t)))
+    current = 8 + np.cumsum(rng.normal(0, 0.001, len(t)))
+    tolerances = [0.05, 0.005]
+
+    keep = swinging_door(t, [voltage, current], tolerances)
+
+    assert _max_error(t, voltage, keep) <= tolerances[0] + 1e-9
+    assert _max_error(t, current, keep) <= tolerances[1] + 1e-9
+
+
+def test_linear_signal_keeps_endpoints_only():
+    t = np.arange(100, dtype=np.float64)
+    keep = swinging_door(t, [2 * t + 1], [0.001])
+    assert np.flatnonzero(keep).tolist() == [0, 99]
+
+
+def test_missing_values_and_following_row_are_kept():
+    t = np.arange(20, dtype=np.float64)
+    values = np.zeros(20)
+    values[5] = np.nan
+
+    keep = swinging_door(t, [values], [0.1])
+
+    assert keep[5] and keep[6]
+
+
+def test_empty_input():
+    assert len(swinging_door(np.empty(0), [np.empty(0)], [0.1])) == 0
+
+
+def test_compressor_summary():
+    t = np.arange(1000) * 0.001
+    chunk = DetailColumns.from_arrays(t, np.full(1000, 220.0), np.full(1000, 5.0))
+    compressor = WaveformCompressor({"voltage_value": 0.05, "current_value": 0.005, "temperature": 0})
+
+    compressed = compressor.apply(chunk)
+    summary = compressor.summary()
+
+    assert len(compressed) == 2
+    assert summary["input_rows"] == 1000
+    assert summary["kept_rows"] == 2
+    assert summary["ratio"] == 500.0
+    # 容差为 0 的字段不参与压缩
+    assert "temperature" not in summary["tolerances"]
@@ -0,0 +1,59 @@
+"""
+导入进度WebSocket鉴权测试
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.auth import create_access_token
+from app.core.database import get_db
+from app.websocket import websocket_router
+
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+class FakeAdmin:
+    def get_user_by_id(self, user_id):
+        if user_id != USER_ID:
+            return SimpleNamespace(user=None)
+        return SimpleNamespace(user=SimpleNamespace(
+            id=USER_ID,
+            email="user@example.com",
+            user_metadata={},
+            banned=False,
+            created_at=datetime.utcnow()
+        ))
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(websocket_router)
+    db = SimpleNamespace(auth=SimpleNamespace(admin=FakeAdmin()))
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("query", ["", "?token=invalid", "?token=" + create_access_token({"sub": "unknown"})])
+def test_rejects_missing_or_invalid_token(client, query):
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/ws/imports/import-1" + query) as websocket:
+            websocket.receive_text()
+    assert exc.value.code == 1008
+
+
+def test_accepts_valid_token(client):
+    token = create_access_token({"sub": USER_ID, "email": "user@example.com"})
+    with client.websocket_connect(f"/ws/imports/import-2?token={token}") as websocket:
+        websocket.send_text("ping")
+        assert websocket.receive_text() == "pong"
+
+    headers = {"Authorization": f"Bearer {token}"}
+    with client.websocket_connect("/ws/imports/import-2", headers=headers) as websocket:
+        websocket.send_text("ping")
+        assert websocket.receive_text() == "pong"
@@ -25,9 +25,14 @@ CREATE TABLE IF NOT EXISTS import_records (
     file_path VARCHAR(1000),
     file_size BIGINT,
     records_count INTEGER DEFAULT 0,
-    import_status VARCHAR(50) DEFAULT 'pending' CHECK (import_status IN ('pending', 'processing', 'completed', 'failed')),
+    import_status VARCHAR(50) DEFAULT 'pending' CHECK (import_status IN ('pending', 'processing', 'completed', 'partial', 'failed')),
     error_message TEXT,
     imported_by VARCHAR(255),
+    content_hash VARCHAR(64), -- 文件内容哈希（重复导入检测、解析缓存键）
+    parent_id UUID REFERENCES import_records(id) ON DELETE CASCADE, -- 压缩包导入的父记录
+    import_stats JSONB, -- 导入统计（行数、耗时、压缩率等）
+    checkpoint JSONB, -- 断点续传进度
+    rejection_report JSONB, -- 校验未通过的行
     created_at TIMESTAMPTZ DEFAULT NOW(),
     completed_at TIMESTAMPTZ
 );
@@ -78,6 +83,60 @@ CREATE TABLE IF NOT EXISTS users (
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- 6. 创建波形压缩分段表（detail_storage_mode=segments 时存放测试详情）
+CREATE TABLE IF NOT EXISTS test_waveform_segments (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    test_record_id UUID NOT NULL REFERENCES test_records(id) ON DELETE CASCADE,
+    start_time DOUBLE PRECISION NOT NULL,
+    end_time DOUBLE PRECISION NOT NULL,
+    row_count INTEGER NOT NULL,
+    encoding JSONB NOT NULL,
+    payload BYTEA NOT NULL,
+    statuses JSONB,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 7. 创建每日统计汇总表（按日期 × 设备型号 × 批次号增量维护）
+CREATE TABLE IF NOT EXISTS test_record_rollups (
+    test_day DATE NOT NULL,
+    device_model VARCHAR(100) NOT NULL DEFAULT '',
+    batch_number VARCHAR(100) NOT NULL DEFAULT '',
+    record_count INTEGER NOT NULL DEFAULT 0,
+    pass_count INTEGER NOT NULL DEFAULT 0,
+    fail_count INTEGER NOT NULL DEFAULT 0,
+    pass_rate_count INTEGER NOT NULL DEFAULT 0,
+    pass_rate_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    pass_rate_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+    voltage_count INTEGER NOT NULL DEFAULT 0,
+    voltage_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    voltage_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+    current_count INTEGER NOT NULL DEFAULT 0,
+    current_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    current_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+    power_count INTEGER NOT NULL DEFAULT 0,
+    power_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    power_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+    last_test_date TIMESTAMP,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (test_day, device_model, batch_number)
+);
+
+-- 已有表补充新增列
+ALTER TABLE import_records ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE import_records ADD COLUMN IF NOT EXISTS parent_id UUID REFERENCES import_records(id) ON DELETE CASCADE;
+ALTER TABLE import_records ADD COLUMN IF NOT EXISTS import_stats JSONB;
+ALTER TABLE import_records ADD COLUMN IF NOT EXISTS checkpoint JSONB;
+ALTER TABLE import_records ADD COLUMN IF NOT EXISTS rejection_report JSONB;
+-- 部分成功的导入使用 partial 状态
+ALTER TABLE import_records DROP CONSTRAINT IF EXISTS import_records_import_status_check;
+ALTER TABLE import_records ADD CONSTRAINT import_records_import_status_check
+    CHECK (import_status IN ('pending', 'processing', 'completed', 'partial', 'failed'));
+-- 统计汇总使用的测试记录列
+ALTER TABLE test_records ADD COLUMN IF NOT EXISTS device_model VARCHAR(100);
+ALTER TABLE test_records ADD COLUMN IF NOT EXISTS batch_number VARCHAR(100);
+ALTER TABLE test_records ADD COLUMN IF NOT EXISTS pass_rate DECIMAL(5,2);
+ALTER TABLE test_records ADD COLUMN IF NOT EXISTS is_deleted BOOLEAN DEFAULT FALSE;
+
 -- 创建索引以提高查询性能
 CREATE INDEX idx_devices_serial_number ON devices(serial_number);
 CREATE INDEX idx_devices_status ON devices(status);
@@ -86,6 +145,14 @@ CREATE INDEX idx_test_records_test_date ON test_records(test_date);
 CREATE INDEX idx_test_details_test_record_id ON test_details(test_record_id);
 CREATE INDEX idx_test_details_timestamp ON test_details(timestamp);
 CREATE INDEX idx_import_records_status ON import_records(import_status);
+CREATE INDEX IF NOT EXISTS idx_import_records_content_hash ON import_records(content_hash);
+CREATE INDEX IF NOT EXISTS idx_import_records_parent_id ON import_records(parent_id);
+CREATE INDEX IF NOT EXISTS idx_waveform_segments_record_time ON test_waveform_segments(test_record_id, start_time);
+CREATE INDEX IF NOT EXISTS idx_test_record_rollups_model ON test_record_rollups(device_model, test_day);
+-- 统计摘要只需要的列，未删除记录可走仅索引扫描
+CREATE INDEX IF NOT EXISTS idx_test_records_summary
+    ON test_records(test_date) INCLUDE (device_model, pass_rate)
+    WHERE is_deleted = FALSE;
 
 -- 创建更新时间触发器函数
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -106,12 +173,156 @@ CREATE TRIGGER update_test_records_updated_at BEFORE UPDATE ON test_records
 CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- 按日期重算汇总（p_days 为空时全量重建），返回写入的汇总行数
+CREATE OR REPLACE FUNCTION refresh_test_record_rollups(p_days DATE[] DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    IF p_days IS NULL THEN
+        -- 全量重建与增量刷新互斥
+        PERFORM pg_advisory_xact_lock(hashtext('test_record_rollups'));
+        DELETE FROM test_record_rollups;
+        SELECT array_agg(DISTINCT test_date::date) INTO p_days
+        FROM test_records WHERE is_deleted = FALSE;
+    ELSE
+        -- 同一天的刷新串行执行，后执行的刷新总能看到先提交的记录
+        PERFORM pg_advisory_xact_lock_shared(hashtext('test_record_rollups'));
+        PERFORM pg_advisory_xact_lock(hashtext('test_record_rollups:' || d::text))
+        FROM (SELECT DISTINCT unnest(p_days) AS d ORDER BY 1) days;
+        DELETE FROM test_record_rollups WHERE test_day = ANY(p_days);
+    END IF;
+
+    INSERT INTO test_record_rollups (
+        test_day, device_model, batch_number,
+        record_count, pass_count, fail_count,
+        pass_rate_count, pass_rate_sum, pass_rate_sum_sq,
+        voltage_count, voltage_sum, voltage_sum_sq,
+        current_count, current_sum, current_sum_sq,
+        power_count, power_sum, power_sum_sq,
+        last_test_date, updated_at
+    )
+    SELECT
+        r.test_date::date,
+        COALESCE(r.device_model, ''),
+        COALESCE(r.batch_number, ''),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE r.pass_rate >= 95),
+        COUNT(*) FILTER (WHERE r.pass_rate < 95),
+        COUNT(r.pass_rate),
+        COALESCE(SUM(r.pass_rate), 0)::float8,
+        COALESCE(SUM(r.pass_rate * r.pass_rate), 0)::float8,
+        COUNT(r.voltage),
+        COALESCE(SUM(r.voltage), 0)::float8,
+        COALESCE(SUM(r.voltage * r.voltage), 0)::float8,
+        COUNT(r.current),
+        COALESCE(SUM(r.current), 0)::float8,
+        COALESCE(SUM(r.current * r.current), 0)::float8,
+        COUNT(r.power),
+        COALESCE(SUM(r.power), 0)::float8,
+        COALESCE(SUM(r.power * r.power), 0)::float8,
+        MAX(r.test_date),
+        NOW()
+    FROM test_records r
+    JOIN (SELECT DISTINCT unnest(p_days) AS day) days
+      ON r.test_date >= days.day AND r.test_date < days.day + 1
+    WHERE r.is_deleted = FALSE
+    GROUP BY 1, 2, 3;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$;
+
+-- 用已有记录初始化汇总表
+SELECT refresh_test_record_rollups()
+WHERE NOT EXISTS (SELECT 1 FROM test_record_rollups);
+
+-- 统计摘要聚合函数（按分组集一次聚合）
+-- grouping_set: total 为汇总行，device 为设备型号分布，day 为 p_today - p_trend_days 起的日趋势
+CREATE OR REPLACE FUNCTION test_record_summary(
+    p_start_date DATE DEFAULT NULL,
+    p_end_date DATE DEFAULT NULL,
+    p_device_model TEXT DEFAULT NULL,
+    p_today DATE DEFAULT CURRENT_DATE,
+    p_trend_days INTEGER DEFAULT 30
+)
+RETURNS TABLE (
+    grouping_set TEXT,
+    device_model TEXT,
+    test_day DATE,
+    record_count BIGINT,
+    today_count BIGINT,
+    week_count BIGINT,
+    month_count BIGINT,
+    pass_count BIGINT,
+    fail_count BIGINT,
+    average_pass_rate DOUBLE PRECISION,
+    trend_count BIGINT,
+    trend_pass_rate DOUBLE PRECISION
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH filtered AS (
+        SELECT
+            r.test_date::date AS test_day,
+            r.device_model,
+            r.pass_rate,
+            (p_start_date IS NULL OR r.test_date >= p_start_date)
+                AND (p_end_date IS NULL OR r.test_date <= p_end_date) AS in_range,
+            r.test_date >= p_today - p_trend_days AS in_trend
+        FROM test_records r
+        WHERE r.is_deleted = FALSE
+          AND (p_device_model IS NULL OR r.device_model = p_device_model)
+          AND (
+              ((p_start_date IS NULL OR r.test_date >= p_start_date)
+                  AND (p_end_date IS NULL OR r.test_date <= p_end_date))
+              OR r.test_date >= p_today - p_trend_days
+          )
+    ),
+    keyed AS (
+        SELECT
+            f.*,
+            CASE WHEN f.in_range AND f.device_model <> '' THEN f.device_model END AS device_key,
+            CASE WHEN f.in_trend THEN f.test_day END AS trend_day
+        FROM filtered f
+    )
+    SELECT
+        CASE
+            WHEN GROUPING(device_key) = 0 THEN 'device'
+            WHEN GROUPING(trend_day) = 0 THEN 'day'
+            ELSE 'total'
+        END,
+        device_key::text,
+        trend_day,
+        COUNT(*) FILTER (WHERE in_range),
+        COUNT(*) FILTER (WHERE in_range AND test_day = p_today),
+        COUNT(*) FILTER (WHERE in_range AND test_day >= p_today - EXTRACT(ISODOW FROM p_today)::int + 1),
+        COUNT(*) FILTER (WHERE in_range AND test_day >= date_trunc('month', p_today::timestamp)::date),
+        COUNT(*) FILTER (WHERE in_range AND pass_rate >= 95),
+        COUNT(*) FILTER (WHERE in_range AND pass_rate < 95),
+        (AVG(pass_rate) FILTER (WHERE in_range))::float8,
+        COUNT(*) FILTER (WHERE in_trend),
+        (AVG(pass_rate) FILTER (WHERE in_trend))::float8
+    FROM keyed
+    GROUP BY GROUPING SETS ((), (device_key), (trend_day))
+    HAVING (GROUPING(device_key) = 1 OR device_key IS NOT NULL)
+       AND (GROUPING(trend_day) = 1 OR trend_day IS NOT NULL)
+    ORDER BY 1, 2, 3
+$$;
+
 -- 启用RLS (Row Level Security) - 可选
 ALTER TABLE devices ENABLE ROW LEVEL SECURITY;
 ALTER TABLE import_records ENABLE ROW LEVEL SECURITY;
 ALTER TABLE test_records ENABLE ROW LEVEL SECURITY;
 ALTER TABLE test_details ENABLE ROW LEVEL SECURITY;
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
+ALTER TABLE test_waveform_segments ENABLE ROW LEVEL SECURITY;
+ALTER TABLE test_record_rollups ENABLE ROW LEVEL SECURITY;
 
 -- 创建RLS策略（暂时允许所有操作）
 CREATE POLICY "Enable all operations for authenticated users" ON devices
@@ -129,6 +340,12 @@ CREATE POLICY "Enable all operations for authenticated users" ON test_details
 CREATE POLICY "Enable all operations for authenticated users" ON users
     FOR ALL TO authenticated USING (true) WITH CHECK (true);
 
+CREATE POLICY "Enable all operations for authenticated users" ON test_waveform_segments
+    FOR ALL TO authenticated USING (true) WITH CHECK (true);
+
+CREATE POLICY "Enable all operations for authenticated users" ON test_record_rollups
+    FOR ALL TO authenticated USING (true) WITH CHECK (true);
+
 -- 插入测试数据（可选）
 -- INSERT INTO devices (device_name, device_model, manufacturer, serial_number, status) VALUES
 -- ('光伏关断器-001', 'PV-SD-2000', '阳光电源', 'SN202501001', 'active'),